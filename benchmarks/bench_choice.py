@@ -0,0 +1,58 @@
+"""
+Benchmark lookups in choices with many options, nested a few levels
+deep, with and without the literal key tables of dict-like nodes.
+
+Run as a script, e.g. `python benchmarks/bench_choice.py`.
+"""
+from __future__ import print_function
+import timeit
+
+from searchspaces.partialplus import (choice, evaluate, variable,
+                                      depth_first_traversal)
+from searchspaces.plan import compile
+
+
+def nested_choices(options, depth):
+    """`depth` levels of choices with `options` options each."""
+    node = variable('x0', value_type=float)
+    for level in xrange(depth):
+        var = variable('c%d' % level, value_type=int)
+        node = choice(var, *[(i, node if i == options - 1 else i)
+                             for i in xrange(options)])
+    return node
+
+
+def without_key_tables(root):
+    for node in depth_first_traversal(root):
+        if getattr(node, '_key_index', None) is not None:
+            node._key_index = None
+
+
+def bench(options, depth, number=200):
+    root = nested_choices(options, depth)
+    # Select the last option at every level: the worst case for a scan.
+    kwargs = dict(('c%d' % level, options - 1) for level in xrange(depth))
+    kwargs['x0'] = 1.
+    plan = compile(root)
+    timings = []
+    for f in (lambda: evaluate(root, **kwargs), lambda: plan(**kwargs)):
+        timings.append(min(timeit.repeat(f, number=number, repeat=3)))
+    without_key_tables(root)
+    plan = compile(root)
+    for f in (lambda: evaluate(root, **kwargs), lambda: plan(**kwargs)):
+        timings.append(min(timeit.repeat(f, number=number, repeat=3)))
+    new_eval, new_plan, old_eval, old_plan = [1e6 * t / number
+                                              for t in timings]
+    print('%4d options x %d levels   evaluate %8.1f -> %6.1f us   '
+          'plan %8.1f -> %6.1f us' % (options, depth, old_eval, new_eval,
+                                      old_plan, new_plan))
+
+
+def main():
+    for options in (10, 100, 1000):
+        for depth in (1, 4):
+            bench(options, depth)
+
+
+if __name__ == "__main__":
+    main()
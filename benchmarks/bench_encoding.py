@@ -0,0 +1,42 @@
+"""
+Benchmark encoding configurations of a conditional search space as
+arrays, and decoding them back.
+
+Run as a script, e.g. `python benchmarks/bench_encoding.py`.
+"""
+from __future__ import print_function
+import time
+
+from searchspaces.encoding import Codec
+from searchspaces.sampling import sample
+
+from bench_sample import space
+
+
+def timed(f):
+    start = time.time()
+    result = f()
+    return 1e3 * (time.time() - start), result
+
+
+def bench(models, n):
+    root = space(models)
+    codec = Codec(root)
+    samples = sample(codec.index, n, rng=0)
+    assignments = samples.assignments()
+    from_samples, (X, mask) = timed(lambda: codec.encode(samples))
+    from_dicts, _ = timed(lambda: codec.encode(assignments))
+    decode, _ = timed(lambda: codec.decode(X, mask))
+    print('%3d models  %7d configurations   encode samples %7.1f ms   '
+          'encode dicts %7.1f ms   decode %7.1f ms'
+          % (models, n, from_samples, from_dicts, decode))
+
+
+def main():
+    for models in (2, 20):
+        for n in (1000, 100000):
+            bench(models, n)
+
+
+if __name__ == "__main__":
+    main()
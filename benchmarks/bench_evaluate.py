@@ -0,0 +1,108 @@
+"""
+Benchmark `evaluate` against the original recursive evaluator.
+
+Run as a script, e.g. `python benchmarks/bench_evaluate.py`.
+"""
+from __future__ import print_function
+from functools import partial as _partial
+import operator
+import sys
+import timeit
+
+from searchspaces.partialplus import (partial, as_partialplus, evaluate,
+                                      variable, is_indexable,
+                                      is_sequence_node, is_variable_node,
+                                      Literal)
+
+
+def _recursive_handle_indexing(p, instantiate_call, bindings, recurse):
+    obj, index = p.args
+    index_val = recurse(index)
+    if is_sequence_node(obj):
+        elem_val = obj.args[index_val]
+        if isinstance(index_val, slice):
+            elem_val = instantiate_call(obj.func,
+                                        *[recurse(e) for e in elem_val])
+        else:
+            elem_val = recurse(elem_val)
+        bindings[p] = elem_val
+    else:
+        keys, values = zip(*(node.args for node in obj.args[1:]))
+        keys = [recurse(k) for k in keys]
+        try:
+            ind = keys.index(index_val)
+        except ValueError:
+            raise KeyError(index_val)
+        bindings[p] = recurse(values[ind])
+    return bindings[p]
+
+
+def recursive_evaluate(p, instantiate_call=None, bindings=None):
+    """The recursive evaluator that `_evaluate` replaced, as a baseline."""
+    instantiate_call = ((lambda f, *args, **kwargs: f(*args, **kwargs))
+                        if instantiate_call is None else instantiate_call)
+    bindings = {} if bindings is None else bindings
+    if p in bindings:
+        return bindings[p]
+    if isinstance(p, Literal):
+        bindings[p] = p.value
+        return bindings[p]
+    recurse = _partial(recursive_evaluate, instantiate_call=instantiate_call,
+                       bindings=bindings)
+    if p.func == operator.getitem and is_indexable(p):
+        return _recursive_handle_indexing(p, instantiate_call, bindings,
+                                          recurse)
+    args = [recurse(arg) for arg in p.args]
+    kw = (dict((kw, recurse(val)) for kw, val in p.keywords.iteritems())
+          if p.keywords else {})
+    if is_variable_node(p):
+        return bindings[kw['name']]
+    bindings[p] = instantiate_call(p.func, *args, **kw)
+    return bindings[p]
+
+
+def deep_chain(depth):
+    p = variable('x', value_type=int)
+    for i in xrange(depth):
+        p = p + 1
+    return p
+
+
+def wide_fan_out(width):
+    x = variable('x', value_type=int)
+    return as_partialplus([partial(operator.add, x, i) for i in xrange(width)])
+
+
+def choice_chain(depth):
+    p = variable('x', value_type=int)
+    for i in xrange(depth):
+        p = as_partialplus({0: p + 1, 1: p})[variable('y', value_type=int)]
+    return p
+
+
+def bench(label, graph, number, recursive=True):
+    new = min(timeit.repeat(lambda: evaluate(graph, x=0, y=0),
+                            number=number, repeat=3)) / number
+    if recursive:
+        old = min(timeit.repeat(
+            lambda: recursive_evaluate(graph, bindings={'x': 0, 'y': 0}),
+            number=number, repeat=3)) / number
+        print('%-28s recursive %9.3f ms   iterative %9.3f ms   (%.2fx)' %
+              (label, old * 1e3, new * 1e3, old / new))
+    else:
+        print('%-28s recursive %12s   iterative %9.3f ms' %
+              (label, 'n/a', new * 1e3))
+
+
+def main():
+    # The recursive evaluator uses several Python frames per graph level.
+    sys.setrecursionlimit(10000)
+    bench('deep chain (1000)', deep_chain(1000), 20)
+    bench('deep chain (100000)', deep_chain(100000), 1, recursive=False)
+    bench('wide fan-out (10000)', wide_fan_out(10000), 5)
+    bench('wide fan-out (100000)', wide_fan_out(100000), 1)
+    bench('choice chain (500)', choice_chain(500), 20)
+
+
+if __name__ == "__main__":
+    main()
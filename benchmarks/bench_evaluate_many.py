@@ -0,0 +1,53 @@
+"""
+Benchmark `evaluate_many` against mapping `evaluate` over a process pool
+with the graph pickled into every task.
+
+Run as a script, e.g. `python benchmarks/bench_evaluate_many.py`.
+"""
+from __future__ import print_function
+import multiprocessing
+import operator
+import time
+
+from searchspaces.partialplus import (partial, evaluate, variable,
+                                      as_partialplus)
+from searchspaces.parallel import evaluate_many
+
+
+def search_space(width):
+    lr = variable('lr', value_type=float)
+    return as_partialplus([{'dim': partial(operator.mul, lr, i),
+                            'name': 'layer%d' % i} for i in xrange(width)])
+
+
+def evaluate_task(task):
+    graph, assignment = task
+    return evaluate(graph, **assignment)
+
+
+def main():
+    processes = max(2, multiprocessing.cpu_count())
+    trials = 400
+    assignments = [{'lr': 0.001 * i} for i in xrange(trials)]
+    for width in (10, 100, 1000):
+        graph = search_space(width)
+        pool = multiprocessing.Pool(processes)
+        start = time.time()
+        pool.map(evaluate_task, [(graph, a) for a in assignments],
+                 chunksize=8)
+        per_task = time.time() - start
+        pool.close()
+        pool.join()
+        start = time.time()
+        for _ in evaluate_many(graph, assignments, processes=processes,
+                               chunksize=8):
+            pass
+        shipped_once = time.time() - start
+        print('width %-5d %d trials  graph per task %7.3f s   '
+              'evaluate_many %7.3f s   (%.2fx)' %
+              (width, trials, per_task, shipped_once,
+               per_task / shipped_once))
+
+
+if __name__ == "__main__":
+    main()
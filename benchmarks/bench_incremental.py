@@ -0,0 +1,61 @@
+"""
+Benchmark an `IncrementalEvaluator` against `evaluate` on a sequence of
+assignments that each change one variable, as in local search.
+
+Run as a script, e.g. `python benchmarks/bench_incremental.py`.
+"""
+from __future__ import print_function
+import operator
+import random
+import timeit
+
+from searchspaces.partialplus import (partial, evaluate, variable,
+                                      as_partialplus)
+from searchspaces.incremental import IncrementalEvaluator
+
+
+def search_space(width, n_vars=10):
+    """`width` layers, each using one of `n_vars` variables."""
+    xs = [variable('x%d' % j, value_type=float) for j in xrange(n_vars)]
+    return as_partialplus(
+        [{'dim': partial(operator.mul, xs[i % n_vars], i),
+          'name': 'layer%d' % i} for i in xrange(width)])
+
+
+def local_search(n_vars, number):
+    """Assignments changing one variable at a time."""
+    rng = random.Random(0)
+    current = dict(('x%d' % j, 1.) for j in xrange(n_vars))
+    assignments = []
+    for _ in xrange(number):
+        current = dict(current)
+        current['x%d' % rng.randrange(n_vars)] = rng.random()
+        assignments.append(current)
+    return assignments
+
+
+def bench(width, number=50):
+    graph = search_space(width)
+    assignments = local_search(10, number)
+
+    def run_evaluate():
+        for kwargs in assignments:
+            evaluate(graph, **kwargs)
+
+    def run_incremental():
+        ev = IncrementalEvaluator(graph)
+        for kwargs in assignments:
+            ev(**kwargs)
+    old = min(timeit.repeat(run_evaluate, number=1, repeat=3)) / number
+    new = min(timeit.repeat(run_incremental, number=1, repeat=3)) / number
+    print('width %-6d evaluate %8.3f ms   incremental %8.3f ms   (%.2fx)' %
+          (width, old * 1e3, new * 1e3, old / new))
+
+
+def main():
+    for width in (10, 100, 1000):
+        bench(width)
+
+
+if __name__ == "__main__":
+    main()
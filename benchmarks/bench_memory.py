@@ -0,0 +1,101 @@
+"""
+Benchmark the memory taken up by graph nodes, comparing the current
+slotted `PartialPlus`/`Literal` classes with the `functools.partial`
+based ones they replaced.
+
+Run as a script, e.g. `python benchmarks/bench_memory.py`.
+"""
+from __future__ import print_function
+from functools import partial as _partial
+import sys
+
+from searchspaces.partialplus import (Literal, PartialPlus, make_tuple,
+                                      call_with_list_of_pos_args)
+
+
+class LegacyLiteral(object):
+    """`Literal` as it was: a plain object with an instance `__dict__`."""
+    def __init__(self, value):
+        self._value = value
+
+
+class LegacyPartialPlus(_partial):
+    """`PartialPlus` as it was, storing its arguments twice."""
+    def __init__(self, f, *args, **kwargs):
+        super(LegacyPartialPlus, self).__init__(self, f, *args, **kwargs)
+        self._keywords = kwargs
+        self._args = args
+
+
+class Layer(object):
+    def __init__(self, layer_name, dim, irange, init_bias=0.):
+        pass
+
+
+def build(partialplus, literal, n):
+    """A list of dicts like those in a pylearn2 YAML file, ~`n` nodes."""
+    layers = []
+    count = 0
+    while count < n:
+        i = len(layers)
+        layer = partialplus(Layer, layer_name=literal('h%d' % i),
+                            dim=literal(100 + i), irange=literal(0.05))
+        pairs = [partialplus(make_tuple, literal(k), v)
+                 for k, v in (('layer', layer), ('index', literal(i)))]
+        layers.append(partialplus(call_with_list_of_pos_args, literal(dict),
+                                  *pairs))
+        count += 11
+    return layers
+
+
+def footprint(nodes):
+    """Bytes used by nodes and the containers they own."""
+    seen = set()
+    total = 0
+    for node in nodes:
+        parts = [node, getattr(node, '__dict__', None)]
+        if isinstance(node, _partial):
+            parts.extend([_partial.args.__get__(node),
+                          _partial.keywords.__get__(node)])
+        parts.extend([getattr(node, '_args', None),
+                      getattr(node, '_keywords', None)])
+        for part in parts:
+            if part is not None and id(part) not in seen:
+                seen.add(id(part))
+                total += sys.getsizeof(part)
+    return total
+
+
+def all_nodes(roots, partialplus):
+    """Every node reachable from `roots`."""
+    seen = {}
+    to_visit = list(roots)
+    while to_visit:
+        node = to_visit.pop()
+        if id(node) in seen:
+            continue
+        seen[id(node)] = node
+        if isinstance(node, partialplus):
+            to_visit.extend(node._args)
+            to_visit.extend(node._keywords.values())
+    return seen.values()
+
+
+def main():
+    n = 500000
+    for label, partialplus, literal in (
+            ('functools.partial based', LegacyPartialPlus, LegacyLiteral),
+            ('slotted', PartialPlus, Literal)):
+        nodes = all_nodes(build(partialplus, literal, n), partialplus)
+        literals = [node for node in nodes if isinstance(node, literal)]
+        others = [node for node in nodes if not isinstance(node, literal)]
+        print('%-24s %7d nodes  %6.1f MB  %5.1f bytes/node  '
+              '(Literal %5.1f, PartialPlus %5.1f)' %
+              (label, len(nodes), footprint(nodes) / 2. ** 20,
+               footprint(nodes) / float(len(nodes)),
+               footprint(literals) / float(len(literals)),
+               footprint(others) / float(len(others))))
+
+
+if __name__ == "__main__":
+    main()
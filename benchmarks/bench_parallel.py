@@ -0,0 +1,58 @@
+"""
+Benchmark `evaluate` with and without a thread pool executor on a graph
+whose leaves simulate I/O latency (e.g. loading datasets).
+
+Run as a script, e.g. `python benchmarks/bench_parallel.py`.
+"""
+from __future__ import print_function
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from searchspaces.partialplus import (partial, choice, evaluate, variable,
+                                      as_partialplus)
+
+
+def load(name, latency):
+    """A leaf that waits on (simulated) I/O, releasing the GIL."""
+    time.sleep(latency)
+    return name
+
+
+def combine(*parts):
+    return len(parts)
+
+
+def search_space(width, latency):
+    """`width` models, each using two datasets; only one is selected."""
+    models = [partial(combine, partial(load, 'train%d' % i, latency),
+                      partial(load, 'valid%d' % i, latency))
+              for i in xrange(width)]
+    monitors = [partial(load, 'monitor%d' % i, latency)
+                for i in xrange(width)]
+    return as_partialplus({
+        'model': choice(variable('model', value_type=['a', 'b']),
+                        ('a', models), ('b', models[:1])),
+        'monitors': monitors})
+
+
+def main():
+    latency = 0.02
+    for width in (4, 16, 64):
+        graph = search_space(width, latency)
+        start = time.time()
+        evaluate(graph, model='a')
+        sequential = time.time() - start
+        for workers in (4, 16):
+            with ThreadPoolExecutor(workers) as executor:
+                start = time.time()
+                evaluate(graph, executor=executor, model='a')
+                parallel = time.time() - start
+            print('width %-3d %3d leaves  sequential %7.3f s   '
+                  '%2d threads %7.3f s   (%.1fx)' %
+                  (width, 3 * width, sequential, workers, parallel,
+                   sequential / parallel))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark repeated evaluation of one graph with `evaluate` and with a
+compiled `EvaluationPlan`.
+
+Run as a script, e.g. `python benchmarks/bench_plan.py`.
+"""
+from __future__ import print_function
+import operator
+import timeit
+
+from searchspaces.partialplus import partial, choice, evaluate, variable
+from searchspaces.plan import compile
+
+
+def search_space(width):
+    """A dict of `width` small expressions behind a choice."""
+    lr = variable('lr', value_type=float, minimum=1e-4, maximum=1.)
+    n = variable('n', value_type=int, minimum=1, maximum=100)
+    layers = [{'dim': partial(operator.mul, n, i), 'lr': lr / (i + 1),
+               'name': 'layer%d' % i} for i in xrange(width)]
+    return {'model': choice(variable('model', value_type=['a', 'b']),
+                            ('a', layers),
+                            ('b', layers[:width // 2])),
+            'lr': lr, 'n': n}
+
+
+def bench(label, graph, number):
+    assignments = [dict(lr=0.1 * i, n=i, model='ab'[i % 2])
+                   for i in xrange(number)]
+
+    def run_evaluate():
+        for kwargs in assignments:
+            evaluate(graph, **kwargs)
+
+    plan = compile(graph)
+
+    def run_plan():
+        for kwargs in assignments:
+            plan(**kwargs)
+    old = min(timeit.repeat(run_evaluate, number=1, repeat=3)) / number
+    new = min(timeit.repeat(run_plan, number=1, repeat=3)) / number
+    compile_time = min(timeit.repeat(lambda: compile(graph), number=1,
+                                     repeat=3))
+    print('%-20s evaluate %8.3f ms   plan %8.3f ms   (%.2fx)   '
+          'compile %8.3f ms' % (label, old * 1e3, new * 1e3, old / new,
+                                compile_time * 1e3))
+
+
+def main():
+    from searchspaces.partialplus import as_partialplus
+    for width in (10, 100, 1000):
+        bench('width %d' % width, as_partialplus(search_space(width)), 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark drawing random configurations of a conditional search space
+column by column, against drawing them one at a time.
+
+Run as a script, e.g. `python benchmarks/bench_sample.py`.
+"""
+from __future__ import print_function
+import random
+import timeit
+
+from searchspaces.partialplus import choice, variable
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.conditional import ConditionalIndex
+from searchspaces.sampling import sample
+
+
+def space(models):
+    """A choice between `models` models with three variables each."""
+    branches = []
+    for m in xrange(models):
+        branches.append((m, {
+            'a': variable('a%d' % m, value_type=float, minimum=1e-4,
+                          maximum=1., log_scale=True),
+            'b': variable('b%d' % m, value_type=int, minimum=1, maximum=64),
+            'c': variable('c%d' % m, value_type=['x', 'y', 'z'])}))
+    return as_pp({'model': choice(variable('model', value_type=range(models)),
+                                  *branches),
+                  'lr': variable('lr', value_type=float, minimum=0.,
+                                 maximum=1.)})
+
+
+def one_at_a_time(infos, n, rng):
+    """Draw each configuration by walking the variables in Python."""
+    rows = []
+    for _ in xrange(n):
+        row = {}
+        for info in infos:
+            if not info.is_active(row):
+                continue
+            if isinstance(info.value_type, list):
+                row[info.name] = rng.choice(info.value_type)
+            elif info.value_type is int:
+                row[info.name] = rng.randint(info.minimum, info.maximum)
+            else:
+                row[info.name] = rng.uniform(info.minimum, info.maximum)
+        rows.append(row)
+    return rows
+
+
+def bench(models, n, number=3):
+    index = ConditionalIndex(space(models))
+    # Selectors first, so that conditions can be checked as we go.
+    infos = sorted(index, key=lambda info: info.name not in index.selectors)
+    rng = random.Random(0)
+    slow = min(timeit.repeat(lambda: one_at_a_time(infos, n, rng),
+                             number=number, repeat=3)) / number
+    fast = min(timeit.repeat(lambda: sample(index, n, rng=0),
+                             number=number, repeat=3)) / number
+    print('%3d models  %7d samples   one at a time %8.1f ms   '
+          'columns %6.1f ms' % (models, n, 1e3 * slow, 1e3 * fast))
+
+
+def main():
+    for models in (2, 20):
+        for n in (1000, 10000, 100000):
+            bench(models, n)
+
+
+if __name__ == "__main__":
+    main()
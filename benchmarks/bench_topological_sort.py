@@ -0,0 +1,92 @@
+"""
+Benchmark `topological_sort` on large graphs, to check that it scales
+linearly in the number of nodes and edges.
+
+Run as a script, e.g. `python benchmarks/bench_topological_sort.py`.
+Pass `--legacy` to also time the quadratic sort it replaced (only on
+the smaller graphs).
+"""
+from __future__ import print_function
+from collections import deque
+import gc
+import operator
+import sys
+import time
+
+from searchspaces.partialplus import (Literal, PartialPlus,
+                                      depth_first_traversal, topological_sort)
+
+
+def legacy_topological_sort(root):
+    """The retry-queue sort that `topological_sort` replaced."""
+    candidates = deque(depth_first_traversal(root))
+    dependencies = dict((n, set()) for n in candidates)
+    for node in candidates:
+        for c in node.inputs():
+            dependencies[c].add(node)
+    visited = set()
+    while candidates:
+        proposed = candidates.popleft()
+        if dependencies[proposed].difference(visited):
+            candidates.append(proposed)
+        else:
+            visited.add(proposed)
+            yield proposed
+
+
+def chain_with_shortcuts(n):
+    """A chain of `n` nodes, each also depending on a node halfway back."""
+    nodes = [Literal(0)]
+    for i in xrange(n - 1):
+        nodes.append(PartialPlus(operator.add, nodes[-1], nodes[i // 2]))
+    return nodes[-1]
+
+
+def layered(n, width=100):
+    """`n` nodes in layers of `width`, each using two nodes below it."""
+    layer = [Literal(i) for i in xrange(width)]
+    count = width
+    while count < n:
+        layer = [PartialPlus(operator.add, layer[i], layer[(i + 1) % width])
+                 for i in xrange(width)]
+        count += width
+    return PartialPlus(sum, PartialPlus(tuple, *layer))
+
+
+def diamonds(n):
+    """A chain of diamonds: each level uses the previous one twice."""
+    node = Literal(0)
+    for i in xrange(n // 2):
+        node = PartialPlus(operator.add, PartialPlus(operator.neg, node),
+                           node)
+    return node
+
+
+def bench(label, make, sizes, sort=topological_sort):
+    for n in sizes:
+        root = make(n)
+        # Like timeit, keep the cyclic garbage collector out of the timings.
+        gc.collect()
+        gc.disable()
+        start = time.time()
+        count = sum(1 for _ in sort(root))
+        elapsed = time.time() - start
+        gc.enable()
+        print('%-28s %8d nodes %9.3f s  %7.3f us/node' %
+              (label, count, elapsed, 1e6 * elapsed / count))
+        del root
+
+
+def main():
+    sizes = (10 ** 4, 10 ** 5, 10 ** 6)
+    bench('chain with shortcuts', chain_with_shortcuts, sizes)
+    bench('layered', layered, sizes)
+    bench('diamonds', diamonds, sizes)
+    if '--legacy' in sys.argv:
+        for make in (chain_with_shortcuts, layered, diamonds):
+            bench('%s (legacy)' % make.__name__, make, (1000, 3000, 10000),
+                  legacy_topological_sort)
+
+
+if __name__ == "__main__":
+    main()
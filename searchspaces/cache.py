@@ -0,0 +1,534 @@
+"""
+Memoization of the results of expensive nodes across evaluations.
+
+Functions whose results are worth keeping, such as ones loading or
+preprocessing datasets, are marked with `cacheable`. A cache passed to
+`evaluate` through its `cache` argument then stores the results of
+nodes applying them, keyed by the node and the values of just the
+variables it depends on that are active, and later evaluations of the
+same subgraph with the same values of those variables reuse them.
+
+`LRUCache` keeps results in memory, for reuse within one process.
+`DiskCache` identifies nodes by their `fingerprint` and keeps results
+in a directory, for reuse across processes and runs.
+"""
+from collections import OrderedDict
+import cPickle as pickle
+import errno
+import hashlib
+import os
+import sys
+import tempfile
+
+from .conditional import ConditionalIndex
+from .fingerprint import fingerprint, encode_literal, _sized
+from .frozen import FrozenGraph
+
+
+# Functions whose results caches may store.
+_CACHEABLE_FUNCTIONS = set()
+
+
+def cacheable(f):
+    """
+    Mark a function's results as worth caching.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    f : callable
+        The same callable, so that this can be used as a decorator.
+
+    Notes
+    -----
+    A cached result is reused whenever the same function is applied to
+    the same inputs again, so `f` should be free of side effects, and
+    should return a fresh object that callers don't modify.
+    """
+    _CACHEABLE_FUNCTIONS.add(f)
+    return f
+
+
+def uncacheable(f):
+    """
+    Undo a previous call to `cacheable`.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    f : callable
+        The same callable, so that this can be used as a decorator.
+    """
+    _CACHEABLE_FUNCTIONS.discard(f)
+    return f
+
+
+def is_cacheable(f):
+    """
+    Check whether a function has been marked as cacheable.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    cacheable : bool
+    """
+    try:
+        return f in _CACHEABLE_FUNCTIONS
+    except TypeError:  # Unhashable callable.
+        return False
+
+
+def is_cacheable_node(node):
+    """
+    Check whether a node applies a function marked as cacheable.
+
+    Parameters
+    ----------
+    node : Node
+
+    Returns
+    -------
+    cacheable : bool
+    """
+    return is_cacheable(getattr(node, 'func', None))
+
+
+def _cacheable_nodes(root, predicate):
+    """
+    Find the nodes of a graph whose results may be cached.
+
+    Parameters
+    ----------
+    root : Node
+    predicate : callable
+        Called with each node, returns whether it may be cached.
+
+    Returns
+    -------
+    nodes : list
+        Pairs of the nodes for which `predicate` is true, and the
+        sorted names of the variables they depend on. Empty if some
+        variable's name is not a `Literal`.
+    index : ConditionalIndex or None
+        Tells which of those variables are active under an assignment.
+        `None` if the graph can't be analysed, in which case they all
+        count.
+    """
+    graph = FrozenGraph(root)
+    nodes = []
+    for i, node in enumerate(graph.nodes):
+        if predicate(node):
+            try:
+                nodes.append((node, sorted(graph.dependencies(i))))
+            except ValueError:
+                return [], None
+    try:
+        index = ConditionalIndex(graph)
+    except ValueError:
+        index = None
+    return nodes, index
+
+
+def _active(index, names, bindings):
+    """
+    The names among `names` of the variables active under `bindings`.
+
+    A node above a `choice` depends on the variables of every branch,
+    but its value only on those of the selected one, so the others are
+    left out of its key, and need not be bound at all.
+    """
+    if index is None:
+        return names
+    return [name for name in names if index[name].is_active(bindings)]
+
+
+class DiskCache(object):
+    """
+    A cache of node results in a local directory, which can be shared
+    by several processes.
+
+    Parameters
+    ----------
+    directory : str
+        Created if it doesn't exist.
+    max_bytes : int, optional
+        If given, the least recently used results are removed after
+        storing a new one, until the results take up at most this many
+        bytes.
+    literal_hasher : callable, optional
+        Used for `fingerprint`s, and to encode the values of variables
+        in keys. See `searchspaces.fingerprint.encode_literal`.
+
+    Notes
+    -----
+    Results are pickled, one file per key, and written to a temporary
+    file that is renamed into place, so that readers never see partial
+    results. Reading a result updates its modification time, which is
+    what eviction goes by.
+
+    Nodes whose results are cached, or the variable values they depend
+    on, must have fingerprints; those that don't are evaluated as
+    usual.
+    """
+    suffix = '.pkl'
+
+    def __init__(self, directory, max_bytes=None, literal_hasher=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.literal_hasher = literal_hasher
+        self.hits = 0
+        self.misses = 0
+        self._prepared = None
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def prepare(self, root, bindings):
+        """
+        Compute the keys for the cacheable nodes of a graph.
+
+        Parameters
+        ----------
+        root : Node
+        bindings : dict
+            Values of the variables, by name. Those of variables that
+            are inactive under the others may be left out.
+
+        Returns
+        -------
+        keys : dict
+            Maps the `id()` of the cacheable nodes under `root` to
+            their keys, which only depend on the values of the active
+            variables. Nodes depending on an active variable that is
+            not bound are left out.
+        """
+        if self._prepared is None or self._prepared[0] is not root:
+            memo = {}
+            nodes = []
+            cacheable, index = _cacheable_nodes(root, is_cacheable_node)
+            for node, names in cacheable:
+                try:
+                    fp = fingerprint(node, self.literal_hasher, memo)
+                except (TypeError, ValueError):
+                    continue
+                nodes.append((node, fp, names))
+            self._prepared = root, nodes, index
+        _, nodes, index = self._prepared
+        keys = {}
+        for node, fp, names in nodes:
+            content = [fp]
+            try:
+                for name in _active(index, names, bindings):
+                    content.append(_sized('', name))
+                    content.append(encode_literal(bindings[name],
+                                                  self.literal_hasher))
+            except (KeyError, TypeError):
+                continue
+            keys[id(node)] = hashlib.sha1(''.join(content)).hexdigest()
+        return keys
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """
+        Look up a result.
+
+        Parameters
+        ----------
+        key : str
+
+        Returns
+        -------
+        found : bool
+        value : object
+            The result, if `found`, else `None`.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except IOError:
+            self.misses += 1
+            return False, None
+        except Exception:
+            # Unreadable: treat as a miss, and let it be rewritten.
+            self.misses += 1
+            self._remove(path)
+            return False, None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return True, value
+
+    def set(self, key, value):
+        """
+        Store a result.
+
+        Parameters
+        ----------
+        key : str
+        value : object
+            Results that can't be pickled are not stored.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, self._path(key))
+        except (pickle.PicklingError, TypeError, AttributeError):
+            self._remove(tmp)
+            return
+        except BaseException:
+            self._remove(tmp)
+            raise
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:  # Removed by another process.
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size(self):
+        """The number of bytes taken up by stored results."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_bytes):
+        """
+        Remove the least recently used results until the rest take up
+        at most `max_bytes` bytes.
+
+        Parameters
+        ----------
+        max_bytes : int
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        """Remove all stored results."""
+        self.evict(0)
+
+
+def estimate_size(value):
+    """
+    Estimate the memory taken up by an object and the containers
+    inside it.
+
+    Parameters
+    ----------
+    value : object
+
+    Returns
+    -------
+    size : int
+        In bytes. Objects referenced more than once are counted once,
+        and only the contents of lists, tuples, sets and dicts are
+        counted besides `value` itself.
+    """
+    seen = set()
+    total = 0
+    to_visit = [value]
+    while to_visit:
+        obj = to_visit.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            to_visit.extend(obj.iterkeys())
+            to_visit.extend(obj.itervalues())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            to_visit.extend(obj)
+    return total
+
+
+class LRUCache(object):
+    """
+    A bounded in-memory cache of node results, for reuse across
+    `evaluate` calls in one process.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of results kept.
+    max_bytes : int, optional
+        Maximum total estimated size of the results kept.
+    predicate : callable, optional
+        Called with a node, returns whether its results may be
+        cached. Defaults to `is_cacheable_node`, so that only the
+        results of functions marked with `cacheable`, which are pure
+        and return values nobody modifies, are shared between
+        evaluations.
+    sizeof : callable, optional
+        Estimates the size of a result in bytes. Defaults to
+        `estimate_size`.
+
+    Notes
+    -----
+    Results are keyed by the node itself and the values of the
+    variables it depends on, so they are only reused when evaluating
+    the same graph again. The least recently used results are evicted
+    when either bound is exceeded. A single result larger than
+    `max_bytes` is not stored at all.
+
+    The results themselves are kept, not copies, so whoever evaluates
+    the graph must not modify them.
+
+    With the default predicate, nothing is cached unless functions are
+    marked with `cacheable`, or a predicate is passed.
+
+    Examples
+    --------
+    >>> def load(n):
+    ...     return range(n)
+    >>> p = partial(load, variable('n', value_type=int))
+    >>> cache = LRUCache(max_entries=100)
+    >>> evaluate(p, cache=cache, n=3)
+    [0, 1, 2]
+    >>> len(cache)
+    0
+    >>> cache = LRUCache(max_entries=100, predicate=lambda node:
+    ...                  getattr(node, 'func', None) is load)
+    >>> evaluate(p, cache=cache, n=3)
+    [0, 1, 2]
+    >>> len(cache)
+    1
+    """
+    def __init__(self, max_entries=None, max_bytes=None, predicate=None,
+                 sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.predicate = is_cacheable_node if predicate is None else predicate
+        self.sizeof = estimate_size if sizeof is None else sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        # Maps keys to (value, size), least recently used first.
+        self._entries = OrderedDict()
+        self._prepared = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def prepare(self, root, bindings):
+        """
+        Compute the keys for the cacheable nodes of a graph.
+
+        Parameters
+        ----------
+        root : Node
+        bindings : dict
+            Values of the variables, by name. Those of variables that
+            are inactive under the others may be left out.
+
+        Returns
+        -------
+        keys : dict
+            Maps the `id()` of the cacheable nodes under `root` to
+            their keys, which only depend on the values of the active
+            variables. Nodes depending on an active variable that is
+            not bound are left out.
+        """
+        if self._prepared is None or self._prepared[0] is not root:
+            self._prepared = (root,) + _cacheable_nodes(root, self.predicate)
+        _, nodes, index = self._prepared
+        keys = {}
+        for node, names in nodes:
+            try:
+                # Types are part of the key, so 1, 1.0 and True differ.
+                key = (node, tuple((name, type(bindings[name]),
+                                    bindings[name])
+                                   for name in _active(index, names,
+                                                       bindings)))
+                hash(key)
+            except (KeyError, TypeError):
+                continue
+            keys[id(node)] = key
+        return keys
+
+    def get(self, key):
+        """
+        Look up a result.
+
+        Parameters
+        ----------
+        key : tuple
+
+        Returns
+        -------
+        found : bool
+        value : object
+            The result, if `found`, else `None`.
+        """
+        try:
+            entry = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self._entries[key] = entry
+        self.hits += 1
+        return True, entry[0]
+
+    def set(self, key, value):
+        """
+        Store a result, evicting others as needed.
+
+        Parameters
+        ----------
+        key : tuple
+        value : object
+        """
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while ((self.max_entries is not None and
+                len(self._entries) > self.max_entries) or
+               (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all stored results."""
+        self._entries.clear()
+        self.nbytes = 0
+        self._prepared = None
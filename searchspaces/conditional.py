@@ -0,0 +1,334 @@
+"""
+The conditional structure of search spaces.
+
+A variable that only appears in some branches of a `choice` (or in some
+elements of a list indexed by another variable) only matters when those
+branches are selected. `ConditionalIndex` works out, once per graph,
+under which selections each variable is used, so that optimizers can
+tell which variables are active for a given assignment without
+traversing the graph.
+"""
+import operator
+from collections import defaultdict
+
+from .frozen import FrozenGraph, variable_name
+from .partialplus import (Literal, is_variable_node, is_indexable,
+                          is_sequence_node, _evaluate)
+
+_MISSING = object()
+
+# Conditions are in disjunctive normal form: a frozenset of terms, each
+# a frozenset of `(selector, key)` pairs that must all hold.
+ALWAYS = frozenset([frozenset()])
+NEVER = frozenset()
+
+# The keyword arguments of `variable()` kept as attributes of
+# `VariableInfo`, rather than in its `kwargs`.
+_METADATA = ('value_type', 'minimum', 'maximum', 'default', 'log_scale',
+             'distribution')
+
+
+def _simplify(terms):
+    """Remove duplicate terms, and terms implied by others."""
+    kept = []
+    for term in sorted(set(terms), key=len):
+        if not any(other <= term for other in kept):
+            kept.append(term)
+    return frozenset(kept)
+
+
+def _conjoin(condition, selector, key):
+    """
+    The conjunction of a condition with `selector == key`.
+
+    Terms already requiring `selector` to have another value are
+    dropped, as they can't hold together with it.
+    """
+    terms = []
+    for term in condition:
+        if not any(name == selector and other != key
+                   for name, other in term):
+            terms.append(term | frozenset([(selector, key)]))
+    return _simplify(terms)
+
+
+def _holds(term, assignment):
+    for name, key in term:
+        value = assignment.get(name, _MISSING)
+        if value is _MISSING or value != key:
+            return False
+    return True
+
+
+class VariableInfo(object):
+    """
+    What a `ConditionalIndex` knows about a variable.
+
+    Attributes
+    ----------
+    name : str
+    value_type, minimum, maximum, default, log_scale, distribution
+        The (evaluated) arguments `variable()` was called with.
+    kwargs : dict
+        Any other keyword arguments given to `variable()`.
+    conditions : frozenset
+        The selections under which the variable is used, in disjunctive
+        normal form: the variable is active if, for any of the terms
+        (frozensets of `(selector, key)` pairs), every variable named
+        `selector` has the value `key`. `ALWAYS` for unconditional
+        variables, `NEVER` for those in branches never selected.
+    """
+    __slots__ = ('name', 'kwargs', 'conditions') + _METADATA
+
+    def __init__(self, name, conditions=NEVER, kwargs=None, **metadata):
+        self.name = name
+        self.conditions = conditions
+        self.kwargs = {} if kwargs is None else kwargs
+        for attr in _METADATA:
+            setattr(self, attr, metadata.get(attr))
+
+    @property
+    def conditional(self):
+        """Whether the variable is only used under some selections."""
+        return self.conditions != ALWAYS
+
+    @property
+    def selectors(self):
+        """The names of the variables the activity of this one depends
+        on."""
+        return frozenset(name for term in self.conditions
+                         for name, _ in term)
+
+    def is_active(self, assignment):
+        """
+        Check whether the variable is used under an assignment.
+
+        Parameters
+        ----------
+        assignment : dict
+            Values of (some of) the variables, by name.
+
+        Returns
+        -------
+        active : bool
+            `True` if a term of `conditions` holds. Terms involving
+            selectors missing from `assignment` don't hold.
+        """
+        return any(_holds(term, assignment) for term in self.conditions)
+
+    def __repr__(self):
+        return 'VariableInfo(%r, value_type=%r)' % (self.name,
+                                                    self.value_type)
+
+
+class ConditionalIndex(object):
+    """
+    Variables of a graph, their metadata, and the selections under
+    which they are used.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle, a variable's name is not
+        a `Literal`, or its metadata depends on other variables.
+
+    Notes
+    -----
+    Selections are the indexing of a `choice` (or other dict with
+    `Literal` keys) or of a list or tuple by a variable, in which case
+    only the branch whose key equals the value of the variable is used,
+    and indexing them by a `Literal`, in which case only one branch is
+    ever used. An element of a sequence is selected by its position
+    and by its negative alias, if the variable's `value_type` is `int`
+    or a list of integers. Branches selected in any other way, for
+    instance by an expression of a variable or by a variable that may
+    be a slice, are conservatively taken to be used whenever the
+    selecting node is.
+
+    Conditions are propagated from the root down to the inputs of each
+    node in one pass over the graph in topological order; a node with
+    several parents is used under the disjunction of their conditions.
+    """
+    def __init__(self, root):
+        graph = root if isinstance(root, FrozenGraph) else FrozenGraph(root)
+        self.graph = graph
+        nodes = graph.nodes
+        id_of = graph.id_of
+        incoming = defaultdict(list)
+        incoming[graph.root_id].append(ALWAYS)
+        variables = {}
+        selectors = set()
+        for i in graph.topological_order():
+            if i not in incoming:
+                continue
+            condition = _simplify(term for c in incoming.pop(i)
+                                  for term in c)
+            if not condition:
+                continue
+            node = nodes[i]
+            if is_variable_node(node):
+                name = variable_name(node)
+                if name in variables:
+                    info = variables[name]
+                    info.conditions = _simplify(info.conditions | condition)
+                else:
+                    variables[name] = self._describe(node, name, condition)
+            routes = None
+            if (getattr(node, 'func', None) is operator.getitem and
+                    is_indexable(node)):
+                routes = self._routes(node, condition)
+            if routes is None:
+                for c in graph.children(i):
+                    incoming[c].append(condition)
+                continue
+            for child, child_condition in routes:
+                if child_condition:
+                    if is_variable_node(node._args[1]):
+                        selectors.add(variable_name(node._args[1]))
+                    incoming[id_of(child)].append(child_condition)
+        # Variables in branches that are never selected.
+        for node in nodes:
+            if is_variable_node(node):
+                name = variable_name(node)
+                if name not in variables:
+                    variables[name] = self._describe(node, name, NEVER)
+        self.variables = variables
+        self.names = sorted(variables)
+        self.selectors = sorted(selectors)
+
+    @classmethod
+    def of(cls, space):
+        """
+        The index of a search space.
+
+        Parameters
+        ----------
+        space : Node, FrozenGraph or ConditionalIndex
+
+        Returns
+        -------
+        index : ConditionalIndex
+            `space` itself if it is already an index, otherwise a new
+            index of it.
+        """
+        return space if isinstance(space, cls) else cls(space)
+
+    def _describe(self, node, name, condition):
+        """Build the `VariableInfo` of a variable node."""
+        metadata = {}
+        kwargs = {}
+        for key, value in node._keywords.iteritems():
+            if key == 'name':
+                continue
+            if not isinstance(value, Literal):
+                if self.graph.dependencies(self.graph.id_of(value)):
+                    raise ValueError("metadata of variable '%s' depends "
+                                     "on other variables" % name)
+                value = _evaluate(value)
+            else:
+                value = value.value
+            if key in _METADATA:
+                metadata[key] = value
+            elif key != 'kwargs':
+                kwargs[key] = value
+        return VariableInfo(name, condition, kwargs, **metadata)
+
+    def _routes(self, node, condition):
+        """
+        The inputs of an indexing node that get used, and under which
+        conditions, or `None` if they can't be told apart.
+        """
+        obj, index = node._args
+        if isinstance(index, Literal):
+            selector = None
+        elif is_variable_node(index):
+            selector = variable_name(index)
+        else:
+            return None
+        if is_sequence_node(obj):
+            if selector is not None:
+                keys = self._positions(index, selector, len(obj._args))
+                if keys is None:
+                    return None
+                branches = zip(keys, obj._args)
+        elif obj._key_index is not None:
+            branches = [((key,), obj._args[position + 1]._args[1])
+                        for key, position in obj._key_index.iteritems()]
+        else:
+            return None
+        routes = [(index, condition)]
+        if selector is not None:
+            routes.extend((branch,
+                           _simplify(term for key in keys
+                                     for term in _conjoin(condition,
+                                                          selector, key)))
+                          for keys, branch in branches)
+        elif is_sequence_node(obj):
+            try:
+                selected = obj._args[index.value]
+            except (IndexError, TypeError):
+                return routes
+            if not isinstance(selected, tuple):
+                selected = (selected,)
+            routes.extend((branch, condition) for branch in selected)
+        else:
+            try:
+                position = obj._key_index.get(index.value)
+            except TypeError:
+                return None
+            if position is not None:
+                routes.append((obj._args[position + 1]._args[1], condition))
+        return routes
+
+    def _positions(self, index, selector, length):
+        """
+        The values of a variable selecting each element of a sequence
+        of `length`, or `None` if it may take others, such as slices.
+
+        Elements are selected by their position and its negative alias,
+        restricted to the values listed in the variable's `value_type`
+        if it is a list, and by any integer if it is `int`.
+        """
+        value_type = self._describe(index, selector, NEVER).value_type
+        aliases = [(k, k - length) for k in xrange(length)]
+        if value_type in (int, long):
+            return aliases
+        if (not isinstance(value_type, (list, tuple)) or
+                not all(isinstance(v, (int, long)) for v in value_type)):
+            return None
+        domain = set(value_type)
+        return [[k for k in keys if k in domain] for keys in aliases]
+
+    def __iter__(self):
+        return (self.variables[name] for name in self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        return self.variables[name]
+
+    def active(self, assignment):
+        """
+        Find the variables used under a (partial) assignment.
+
+        Parameters
+        ----------
+        assignment : dict
+            Values of (some of) the variables, by name.
+
+        Returns
+        -------
+        names : list
+            The sorted names of the variables that are active, i.e.
+            those with a term in their conditions that holds. Variables
+            whose activity depends on selectors missing from
+            `assignment` are left out.
+        """
+        variables = self.variables
+        return [name for name in self.names
+                if variables[name].is_active(assignment)]
@@ -0,0 +1,266 @@
+"""
+Conversion between configurations and fixed-width numeric arrays.
+
+Surrogate models used by sequential model-based optimizers work on
+vectors of numbers, while `evaluate` takes the values of the variables
+by name, with those in unselected branches left out. A `Codec` maps
+between the two, one column per variable, for whole batches of
+configurations at a time.
+"""
+from .conditional import ConditionalIndex
+from .sampling import (Samples, is_categorical, categories, _category_array,
+                       _activity)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Kinds of columns.
+_FLOAT = 0
+_INT = 1
+_CATEGORICAL = 2
+
+
+class Codec(object):
+    """
+    Encodes configurations of a search space as rows of a matrix.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+
+    Attributes
+    ----------
+    names : list
+        The names of the variables, in the order of the columns.
+    bounds : ndarray
+        The lowest and highest encoded value of each column, as a
+        `(len(names), 2)` array, with `nan` where unknown.
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not available.
+    ValueError
+        If a variable is neither categorical (with a sequence of values,
+        or `bool`, as `value_type`) nor an `int` or `float`.
+
+    Notes
+    -----
+    Each `float` or `int` variable is encoded as its value, or its
+    logarithm if `log_scale`. Each categorical variable is encoded as
+    the position of its value among its values. Columns of variables
+    that are not active in a configuration are 0 and masked out.
+    """
+    def __init__(self, space):
+        if numpy is None:
+            raise ImportError("numpy is required for encoding")
+        index = ConditionalIndex.of(space)
+        self.index = index
+        self.names = index.names
+        self._columns = []
+        bounds = []
+        for info in index:
+            if is_categorical(info):
+                values = categories(info)
+                lookup = {}
+                try:
+                    for position, value in enumerate(values):
+                        lookup.setdefault(value, position)
+                except TypeError:  # Unhashable values.
+                    lookup = None
+                self._columns.append((_CATEGORICAL, values, lookup,
+                                      _category_array(values)))
+                bounds.append((0, len(values) - 1))
+                continue
+            if info.value_type is float:
+                kind = _FLOAT
+            elif info.value_type in (int, long):
+                kind = _INT
+            else:
+                raise ValueError("don't know how to encode variable '%s' of "
+                                 "type %r" % (info.name, info.value_type))
+            self._columns.append((kind, info.log_scale, None, None))
+            bound = [numpy.nan if b is None else b
+                     for b in (info.minimum, info.maximum)]
+            bounds.append(numpy.log(bound) if info.log_scale else bound)
+        self.bounds = numpy.array(bounds, dtype=float).reshape(-1, 2)
+
+    def _codes(self, column, values):
+        """The positions of values among the values of a categorical
+        variable."""
+        _, categories_, lookup, _ = self._columns[column]
+        try:
+            if lookup is not None:
+                return numpy.array([lookup[v] for v in values],
+                                   dtype=numpy.int64)
+        except (KeyError, TypeError):
+            pass
+        codes = numpy.empty(len(values), dtype=numpy.int64)
+        for i, value in enumerate(values):
+            try:
+                codes[i] = categories_.index(value)
+            except ValueError:
+                raise ValueError("%r is not a value of variable '%s'" %
+                                 (value, self.names[column]))
+        return codes
+
+    def _sample_columns(self, samples):
+        """The values and codes of the columns of `Samples`."""
+        codes = dict(samples.codes)
+        for j, name in enumerate(self.names):
+            if self._columns[j][0] == _CATEGORICAL and name not in codes:
+                codes[name] = self._codes(j, samples.values[name].tolist())
+        return samples.values, codes, {}
+
+    def _columns_of(self, assignments):
+        """
+        Gather the values of each variable in a list of assignments.
+
+        Returns
+        -------
+        values : dict
+            Arrays of values, by name.
+        codes : dict
+            Arrays of the positions of the values of categorical
+            variables, by name.
+        missing : dict
+            Boolean arrays, true where a variable has no value, by name,
+            for variables missing from some assignments. Their values
+            are filled in with the first value of categorical
+            variables, or 0.
+        """
+        # Transpose, touching only the values present.
+        positions = dict((name, []) for name in self.names)
+        present = dict((name, []) for name in self.names)
+        for i, assignment in enumerate(assignments):
+            for name, value in assignment.iteritems():
+                if name in positions:
+                    positions[name].append(i)
+                    present[name].append(value)
+        n = len(assignments)
+        values = {}
+        codes = {}
+        missing = {}
+        for j, name in enumerate(self.names):
+            kind, _, _, array = self._columns[j]
+            if len(positions[name]) < n:
+                missing[name] = numpy.ones(n, dtype=bool)
+                missing[name][positions[name]] = False
+            if kind == _CATEGORICAL:
+                codes[name] = numpy.zeros(n, dtype=numpy.int64)
+                codes[name][positions[name]] = self._codes(j, present[name])
+                values[name] = array[codes[name]]
+            else:
+                column = numpy.array(present[name])
+                values[name] = numpy.zeros(n, dtype=column.dtype)
+                values[name][positions[name]] = column
+        return values, codes, missing
+
+    def encode(self, assignments):
+        """
+        Encode a batch of configurations.
+
+        Parameters
+        ----------
+        assignments : list or Samples
+            Dicts of the values of the variables, by name, or columns
+            of values from `sample`.
+
+        Returns
+        -------
+        X : ndarray
+            A `(len(assignments), len(names))` array of floats.
+        mask : ndarray
+            A boolean array of the same shape, true where a variable
+            is active.
+
+        Raises
+        ------
+        ValueError
+            If a variable that is active in a configuration has no
+            value in it, or a categorical variable has a value that
+            is not one of its values.
+
+        Notes
+        -----
+        Which variables are active is worked out from the values of
+        the selectors; the values of inactive variables are ignored,
+        and may be missing.
+        """
+        n = len(assignments)
+        if isinstance(assignments, Samples):
+            values, codes, missing = self._sample_columns(assignments)
+        else:
+            values, codes, missing = self._columns_of(assignments)
+        active = _activity(self.index, n, values, codes)
+        # Filled column by column, so column-major until the end.
+        X = numpy.zeros((n, len(self.names)), order='F')
+        mask = numpy.zeros((n, len(self.names)), dtype=bool, order='F')
+        for j, name in enumerate(self.names):
+            if name in missing and (missing[name] & active[name]).any():
+                raise ValueError("variable '%s' is active but has no value"
+                                 % name)
+            kind, log_scale = self._columns[j][:2]
+            if kind == _CATEGORICAL:
+                column = codes[name]
+            elif log_scale:
+                with numpy.errstate(divide='ignore', invalid='ignore'):
+                    column = numpy.log(numpy.where(active[name],
+                                                   values[name], 1.))
+            else:
+                column = values[name]
+            X[:, j] = numpy.where(active[name], column, 0.)
+            mask[:, j] = active[name]
+        return numpy.ascontiguousarray(X), numpy.ascontiguousarray(mask)
+
+    def decode(self, X, mask=None):
+        """
+        Decode a batch of configurations.
+
+        Parameters
+        ----------
+        X : ndarray
+            A `(n, len(names))` array, e.g. from `encode`.
+        mask : ndarray, optional
+            A boolean array of the same shape, true where a variable
+            is active. By default, this is worked out from the decoded
+            values of the selectors.
+
+        Returns
+        -------
+        assignments : list
+            Dicts of the values of the active variables, by name, as
+            Python objects.
+
+        Notes
+        -----
+        Columns of categorical variables are rounded to the nearest
+        position, and clipped to the positions of their values. Columns
+        of `int` variables are rounded to the nearest integer.
+        """
+        X = numpy.asarray(X, dtype=float)
+        n = len(X)
+        values = {}
+        codes = {}
+        for j, name in enumerate(self.names):
+            kind, log_scale, _, array = self._columns[j]
+            column = X[:, j]
+            if kind == _CATEGORICAL:
+                codes[name] = numpy.clip(numpy.rint(column), 0,
+                                         len(array) - 1).astype(numpy.int64)
+                values[name] = array[codes[name]]
+                continue
+            if log_scale:
+                column = numpy.exp(column)
+            if kind == _INT:
+                column = numpy.rint(column).astype(numpy.int64)
+            values[name] = column
+        if mask is None:
+            active = _activity(self.index, n, values, codes)
+        else:
+            mask = numpy.asarray(mask, dtype=bool)
+            active = dict((name, mask[:, j])
+                          for j, name in enumerate(self.names))
+        return Samples(n, self.names, values, active, codes).assignments()
@@ -0,0 +1,204 @@
+"""
+Content fingerprints of `PartialPlus` graphs.
+
+A node's fingerprint is a SHA-1 digest computed from its function's
+importable name (or its pickle), its `Literal` values and its inputs'
+fingerprints, so two structurally identical subgraphs get the same
+fingerprint in any process, and changing anything below a node changes
+its fingerprint.
+"""
+import hashlib
+import sys
+
+from .frozen import FrozenGraph
+from .partialplus import Literal, is_pos_args_node
+from .serialize import qualified_name, function_reference
+
+
+def default_literal_hasher(value):
+    """
+    Encode literal values that have no built-in encoding.
+
+    Handles NumPy arrays, by dtype, shape and contents.
+
+    Parameters
+    ----------
+    value : object
+
+    Returns
+    -------
+    encoding : str or None
+        `None` if `value` is not supported.
+    """
+    numpy = sys.modules.get('numpy')
+    if (numpy is not None and isinstance(value, numpy.ndarray) and
+            not value.dtype.hasobject):
+        value = numpy.ascontiguousarray(value)
+        return 'ndarray:%s:%r:%s' % (value.dtype.str, value.shape,
+                                     hashlib.sha1(value.tostring())
+                                     .hexdigest())
+    return None
+
+
+def _sized(tag, s):
+    return '%s%d:%s' % (tag, len(s), s)
+
+
+def encode_literal(value, literal_hasher=None):
+    """
+    A deterministic, process-independent encoding of a literal value.
+
+    Parameters
+    ----------
+    value : object
+    literal_hasher : callable, optional
+        Called with values of types without a built-in encoding, and
+        should return a string or `None`. Defaults to
+        `default_literal_hasher`.
+
+    Returns
+    -------
+    encoding : str
+        Equal for two values exactly when they are of the same type and
+        compare equal (with `-0.0` told apart from `0.0`).
+
+    Raises
+    ------
+    TypeError
+        If `value` (or something inside it) can't be encoded.
+    """
+    if literal_hasher is None:
+        literal_hasher = default_literal_hasher
+    t = type(value)
+    if value is None:
+        return 'N'
+    elif t is bool:
+        return 'T' if value else 'F'
+    elif t in (int, long):
+        return 'i%d;' % value
+    elif t in (float, complex):
+        return '%s%r;' % ('f' if t is float else 'c', value)
+    elif t is str:
+        return _sized('s', value)
+    elif t is unicode:
+        return _sized('u', value.encode('utf-8'))
+    elif t in (tuple, list):
+        return _sized('t' if t is tuple else 'l',
+                      ''.join(encode_literal(v, literal_hasher)
+                              for v in value))
+    elif t in (set, frozenset):
+        return _sized('S' if t is set else 'R',
+                      ''.join(sorted(encode_literal(v, literal_hasher)
+                                     for v in value)))
+    elif t is dict:
+        return _sized('d', ''.join(sorted(
+            encode_literal(k, literal_hasher) +
+            encode_literal(v, literal_hasher)
+            for k, v in value.iteritems())))
+    encoding = literal_hasher(value)
+    if encoding is not None:
+        return _sized('h', encoding)
+    try:
+        return _sized('q', qualified_name(value))
+    except ValueError:
+        raise TypeError("can't fingerprint literal %r of type %s" %
+                        (value, t.__name__))
+
+
+def graph_fingerprints(graph, literal_hasher=None, memo=None):
+    """
+    Fingerprint every node of a graph, in time linear in its size.
+
+    Parameters
+    ----------
+    graph : FrozenGraph or Node
+    literal_hasher : callable, optional
+        See `encode_literal`.
+    memo : dict, optional
+        Fingerprints computed before, as kept by `fingerprint`. Nodes
+        found in it are not recomputed, and new ones are added.
+
+    Returns
+    -------
+    fingerprints : list of str
+        Hexadecimal fingerprints, indexed by node ID.
+
+    Raises
+    ------
+    TypeError
+        If a literal value can't be encoded.
+    ValueError
+        If a function can neither be found by its name nor pickled.
+    """
+    if not isinstance(graph, FrozenGraph):
+        graph = FrozenGraph(graph)
+    if memo is None:
+        memo = {}
+    names = {}
+    prints = []
+    for i, node in enumerate(graph.nodes):
+        known = memo.get(id(node))
+        if known is not None and known[0] is node:
+            prints.append(known[1])
+            continue
+        if isinstance(node, Literal):
+            content = 'L' + encode_literal(node.value, literal_hasher)
+        else:
+            try:
+                name = names[node.func]
+            except (KeyError, TypeError):
+                name = names[node.func] = function_reference(node.func)
+            children = graph.children(i)
+            n_args = len(node._args)
+            args = [prints[c] for c in children[:n_args]]
+            if (is_pos_args_node(node) and isinstance(node._args[0], Literal)
+                    and node._args[0].value is dict):
+                # The order of a dict's (key, value) pairs depends on
+                # string hashing, which may differ between processes.
+                args[1:] = sorted(args[1:])
+            content = ['P', _sized('', name), '%d;' % n_args]
+            content.extend(args)
+            for k, c in sorted(zip(node._keywords, children[n_args:])):
+                content.append(_sized('', k))
+                content.append(prints[c])
+            content = ''.join(content)
+        digest = hashlib.sha1(content).hexdigest()
+        # Keep the node alive, so its id() can't be reused.
+        memo[id(node)] = (node, digest)
+        prints.append(digest)
+    return prints
+
+
+def fingerprint(node, literal_hasher=None, memo=None):
+    """
+    A stable content hash of the subgraph rooted at a node.
+
+    Parameters
+    ----------
+    node : Node
+    literal_hasher : callable, optional
+        Encodes literal values of types not handled by default. See
+        `encode_literal`.
+    memo : dict, optional
+        Fingerprints computed before, by `id()` of their nodes. Shared
+        subgraphs are hashed once per call in any case; pass the same
+        dictionary to several calls to also reuse them across calls.
+
+    Returns
+    -------
+    fingerprint : str
+        A hexadecimal SHA-1 digest.
+
+    Raises
+    ------
+    TypeError
+        If a literal value can't be encoded.
+    ValueError
+        If a function can neither be found by its name nor pickled.
+    """
+    if memo is None:
+        memo = {}
+    known = memo.get(id(node))
+    if known is not None and known[0] is node:
+        return known[1]
+    return graph_fingerprints(node, literal_hasher, memo)[-1]
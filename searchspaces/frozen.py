@@ -0,0 +1,403 @@
+"""
+A frozen, array-backed form of `PartialPlus` graphs.
+
+Analyses over a `PartialPlus` graph otherwise chase Python object
+pointers from the root every time. A `FrozenGraph` does that once,
+numbering the nodes and storing the edges in compressed sparse row
+(CSR) arrays, and caches whatever is computed from them.
+"""
+from array import array
+
+from .partialplus import Node, Literal, GraphIndex, is_variable_node
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _csr(rows):
+    """
+    Pack a sequence of sequences of integers into CSR arrays.
+
+    Parameters
+    ----------
+    rows : iterable
+        Sequences of integers.
+
+    Returns
+    -------
+    indptr : array
+        `indices[indptr[i]:indptr[i + 1]]` is the `i`th row.
+    indices : array
+    """
+    indptr = array('l', [0])
+    indices = array('l')
+    for row in rows:
+        indices.extend(row)
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+def variable_name(node):
+    """
+    Get the name of a variable node.
+
+    Parameters
+    ----------
+    node : PartialPlus
+        A node created by `variable()`.
+
+    Returns
+    -------
+    name : str
+
+    Raises
+    ------
+    ValueError
+        If the name isn't given by a `Literal`, and so can't be
+        known without evaluating the graph.
+    """
+    name = node._keywords['name']
+    if not isinstance(name, Literal):
+        raise ValueError("variable names must be literals to be analyzed")
+    return name.value
+
+
+class FrozenGraph(object):
+    """
+    A snapshot of a graph of `PartialPlus` objects, with integer node
+    IDs and edges in CSR arrays.
+
+    Parameters
+    ----------
+    root : Node
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    Node IDs are assigned in reverse topological order: every node's
+    inputs have lower IDs than the node itself, and the root has the
+    highest ID. Edges run from a node to its inputs, in the order of
+    `Node.inputs()` (positional arguments, then keyword arguments),
+    with repeats.
+
+    Edges are stored in `array.array`s. `numpy_arrays` gives NumPy
+    views of them, without copying, when NumPy is available.
+
+    Modifying the graph after freezing it is not reflected here.
+    """
+    def __init__(self, root):
+        assert isinstance(root, Node)
+        index = GraphIndex(root)
+        order = index.topological_order(reverse=True)
+        # Renumber from the depth-first numbering of the index.
+        renumber = array('l', [0]) * len(order)
+        for new, old in enumerate(order):
+            renumber[old] = new
+        self.nodes = tuple(index.nodes[old] for old in order)
+        self.indptr, self.indices = _csr(
+            [renumber[c] for c in index.children[old]] for old in order)
+        self._ids = dict((id(node), i) for i, node in enumerate(self.nodes))
+        self._parents = None
+        self._depth = None
+        self._variables = None
+        self._dependencies = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node):
+        return id(node) in self._ids
+
+    @property
+    def root(self):
+        """The node the graph was frozen from."""
+        return self.nodes[-1]
+
+    @property
+    def root_id(self):
+        """The ID of the root node."""
+        return len(self.nodes) - 1
+
+    def id_of(self, node):
+        """
+        Look up the integer ID of a node.
+
+        Parameters
+        ----------
+        node : Node
+
+        Returns
+        -------
+        i : int
+
+        Raises
+        ------
+        KeyError
+            If `node` is not part of the graph.
+        """
+        return self._ids[id(node)]
+
+    def children(self, i):
+        """
+        IDs of the inputs of node `i`, in order, with repeats.
+
+        Parameters
+        ----------
+        i : int
+
+        Returns
+        -------
+        children : array
+        """
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def parents(self, i):
+        """
+        IDs of the nodes using node `i` as an input, with repeats.
+
+        Parameters
+        ----------
+        i : int
+
+        Returns
+        -------
+        parents : array
+        """
+        indptr, indices = self.parent_csr
+        return indices[indptr[i]:indptr[i + 1]]
+
+    @property
+    def parent_csr(self):
+        """The transpose of the edge arrays, as `(indptr, indices)`."""
+        if self._parents is None:
+            n = len(self.nodes)
+            counts = array('l', [0]) * (n + 1)
+            for c in self.indices:
+                counts[c + 1] += 1
+            for i in xrange(n):
+                counts[i + 1] += counts[i]
+            indptr = array('l', counts)
+            indices = array('l', [0]) * len(self.indices)
+            ptr = self.indptr
+            children = self.indices
+            for i in xrange(n):
+                for e in xrange(ptr[i], ptr[i + 1]):
+                    c = children[e]
+                    indices[counts[c]] = i
+                    counts[c] += 1
+            self._parents = indptr, indices
+        return self._parents
+
+    def topological_order(self, reverse=False):
+        """
+        IDs of all nodes, sorted topologically.
+
+        Parameters
+        ----------
+        reverse : bool, optional
+            If `False` (the default), every node comes before its
+            inputs, and the root comes first. If `True`, every node
+            comes after its inputs, and the root comes last.
+
+        Returns
+        -------
+        order : xrange
+        """
+        n = len(self.nodes)
+        return xrange(n) if reverse else xrange(n - 1, -1, -1)
+
+    @property
+    def depth(self):
+        """
+        For each node, the length of the longest path to it from the root.
+        """
+        if self._depth is None:
+            depth = array('l', [0]) * len(self.nodes)
+            ptr = self.indptr
+            children = self.indices
+            for i in self.topological_order():
+                d = depth[i] + 1
+                for e in xrange(ptr[i], ptr[i + 1]):
+                    if depth[children[e]] < d:
+                        depth[children[e]] = d
+            self._depth = depth
+        return self._depth
+
+    @property
+    def variables(self):
+        """
+        The sorted names of the variables in the graph.
+
+        Raises
+        ------
+        ValueError
+            If a variable's name is not a `Literal`.
+        """
+        if self._variables is None:
+            self._variables = sorted(set(variable_name(n) for n in self.nodes
+                                         if is_variable_node(n)))
+        return self._variables
+
+    def dependencies(self, i):
+        """
+        The names of the variables node `i` depends on.
+
+        Parameters
+        ----------
+        i : int
+
+        Returns
+        -------
+        names : frozenset
+
+        Raises
+        ------
+        ValueError
+            If a variable's name is not a `Literal`.
+        """
+        return self.dependency_index.variables_of(i)
+
+    @property
+    def dependency_index(self):
+        """
+        The `DependencyIndex` of the graph, built on first use.
+
+        Raises
+        ------
+        ValueError
+            If a variable's name is not a `Literal`.
+        """
+        if self._dependencies is None:
+            self._dependencies = DependencyIndex(self)
+        return self._dependencies
+
+    def numpy_arrays(self):
+        """
+        NumPy views of the edge arrays.
+
+        Returns
+        -------
+        arrays : dict
+            `indptr` and `indices` for the edges from nodes to their
+            inputs, `parent_indptr` and `parent_indices` for the
+            reverse edges, and `depth`.
+
+        Raises
+        ------
+        ImportError
+            If NumPy is not available.
+        """
+        if numpy is None:
+            raise ImportError("numpy is required for numpy_arrays()")
+        parent_indptr, parent_indices = self.parent_csr
+        arrays = dict(indptr=self.indptr, indices=self.indices,
+                      parent_indptr=parent_indptr,
+                      parent_indices=parent_indices, depth=self.depth)
+        return dict((k, numpy.frombuffer(v, dtype=numpy.int_)
+                     if len(v) else numpy.zeros(0, dtype=numpy.int_))
+                    for k, v in arrays.iteritems())
+
+
+class DependencyIndex(object):
+    """
+    For every node of a graph, the set of variables it depends on,
+    directly or through its inputs.
+
+    Parameters
+    ----------
+    graph : FrozenGraph or Node
+
+    Raises
+    ------
+    ValueError
+        If a variable's name is not a `Literal`.
+
+    Notes
+    -----
+    The variables are numbered in the order of their sorted names, and
+    each node's dependencies are stored as an integer with those bits
+    set. Building the index takes one pass over the nodes and edges.
+    """
+    def __init__(self, graph):
+        if not isinstance(graph, FrozenGraph):
+            graph = FrozenGraph(graph)
+        self.graph = graph
+        self.names = graph.variables
+        self.bits = dict((name, i) for i, name in enumerate(self.names))
+        masks = []
+        ptr = graph.indptr
+        children = graph.indices
+        for i, node in enumerate(graph.nodes):
+            if is_variable_node(node):
+                mask = 1 << self.bits[variable_name(node)]
+            else:
+                mask = 0
+                for e in xrange(ptr[i], ptr[i + 1]):
+                    mask |= masks[children[e]]
+            masks.append(mask)
+        self.masks = masks
+        # Nodes with the same dependencies share a frozenset.
+        self._sets = {0: frozenset()}
+
+    def mask(self, names):
+        """
+        The bitset of some variables.
+
+        Parameters
+        ----------
+        names : iterable of str
+            Names not in the graph are ignored.
+
+        Returns
+        -------
+        mask : int
+        """
+        mask = 0
+        for name in names:
+            if name in self.bits:
+                mask |= 1 << self.bits[name]
+        return mask
+
+    def variables_of(self, i):
+        """
+        The names of the variables node `i` depends on.
+
+        Parameters
+        ----------
+        i : int
+
+        Returns
+        -------
+        names : frozenset
+        """
+        mask = self.masks[i]
+        if mask not in self._sets:
+            self._sets[mask] = frozenset(name for b, name in
+                                         enumerate(self.names)
+                                         if mask >> b & 1)
+        return self._sets[mask]
+
+    def affected_by(self, *names):
+        """
+        The nodes depending on any of the given variables.
+
+        Parameters
+        ----------
+        names : str
+
+        Returns
+        -------
+        ids : list of int
+            In increasing order, so inputs come before the nodes using
+            them.
+        """
+        mask = self.mask(names)
+        if not mask:
+            return []
+        return [i for i, m in enumerate(self.masks) if m & mask]
@@ -0,0 +1,311 @@
+"""
+Exhaustive enumeration of discrete search spaces.
+
+The configurations of a space with nested choices don't form a simple
+Cartesian product: the variables of a branch only vary when it is
+selected. `Grid` counts the distinct configurations of the active
+variables by recursing over the variables that select branches, and
+numbers them, so that any configuration can be computed from its
+position without enumerating the ones before it. Iterating over a grid,
+or a slice of it, therefore takes constant memory, and several workers
+can each take their share of a grid without coordinating.
+"""
+from .conditional import ConditionalIndex, NEVER
+from .sampling import is_categorical, categories
+
+
+def domain(info):
+    """
+    The distinct values a discrete variable can take.
+
+    Parameters
+    ----------
+    info : VariableInfo
+
+    Returns
+    -------
+    values : sequence
+        The values of a categorical variable, in order, without
+        repeats (values that compare equal, like `1` and `True`, select
+        the same branches, so only the first is kept), or the integers
+        from the `minimum` to the `maximum` of an `int` variable.
+
+    Raises
+    ------
+    ValueError
+        If the variable is not discrete.
+    """
+    if is_categorical(info):
+        values = []
+        seen = set()
+        for value in categories(info):
+            try:
+                if value in seen:
+                    continue
+                seen.add(value)
+            except TypeError:  # Unhashable: compare with each.
+                if value in values:
+                    continue
+            values.append(value)
+        return values
+    if (info.value_type in (int, long) and info.minimum is not None and
+            info.maximum is not None):
+        return xrange(info.minimum, info.maximum + 1)
+    raise ValueError("variable '%s' is not discrete" % info.name)
+
+
+class _Component(object):
+    """
+    Variables whose activity depends on the same selectors, counted and
+    enumerated independently of other components.
+    """
+    def __init__(self, infos, selectors, domains):
+        self.selectors = sorted(info.name for info in infos
+                                if info.name in selectors)
+        self.others = sorted(info.name for info in infos
+                             if info.name not in selectors)
+        self.infos = dict((info.name, info) for info in infos)
+        self.domains = domains
+        self._counts = {}
+        self.size = self._count({}, frozenset())
+
+    def _status(self, name, assignment, decided):
+        """
+        Whether a variable is active (`True`), inactive (`False`) or
+        can't be told yet (`None`) given the positions assigned to the
+        selectors in `assignment` and the ones `decided` to be inactive.
+        """
+        undetermined = False
+        for term in self.infos[name].conditions:
+            holds = True
+            for selector, key in term:
+                if selector in assignment:
+                    if self.domains[selector][assignment[selector]] != key:
+                        break
+                elif selector in decided:
+                    break
+                else:
+                    holds = False
+            else:
+                if holds:
+                    return True
+                undetermined = True
+        return None if undetermined else False
+
+    def _next(self, assignment, decided):
+        """The first selector not assigned yet whose activity can be
+        told, and its activity, or `(None, None)` if all are done."""
+        pending = False
+        for name in self.selectors:
+            if name in assignment or name in decided:
+                continue
+            pending = True
+            status = self._status(name, assignment, decided)
+            if status is not None:
+                return name, status
+        if pending:
+            raise ValueError("selectors %s condition each other" %
+                             [name for name in self.selectors
+                              if name not in assignment and
+                              name not in decided])
+        return None, None
+
+    def _leaf(self, assignment, decided):
+        """The active variables that are not selectors."""
+        return [name for name in self.others
+                if self._status(name, assignment, decided)]
+
+    def _count(self, assignment, decided):
+        key = (frozenset(assignment.iteritems()), decided)
+        if key in self._counts:
+            return self._counts[key]
+        name, active = self._next(assignment, decided)
+        if name is None:
+            count = 1
+            for other in self._leaf(assignment, decided):
+                count *= len(self.domains[other])
+        elif not active:
+            count = self._count(assignment, decided | frozenset([name]))
+        else:
+            count = 0
+            for position in xrange(len(self.domains[name])):
+                assignment[name] = position
+                count += self._count(assignment, decided)
+            del assignment[name]
+        self._counts[key] = count
+        return count
+
+    def configuration(self, i, out):
+        """Add the values of the `i`th configuration to `out`."""
+        assignment = {}
+        decided = frozenset()
+        while True:
+            name, active = self._next(assignment, decided)
+            if name is None:
+                break
+            if not active:
+                decided = decided | frozenset([name])
+                continue
+            for position in xrange(len(self.domains[name])):
+                assignment[name] = position
+                count = self._count(assignment, decided)
+                if i < count:
+                    break
+                i -= count
+        for name, position in assignment.iteritems():
+            out[name] = self.domains[name][position]
+        # Mixed-radix digits, the last variable varying fastest.
+        for name in reversed(self._leaf(assignment, decided)):
+            i, digit = divmod(i, len(self.domains[name]))
+            out[name] = self.domains[name][digit]
+
+
+class Grid(object):
+    """
+    The distinct configurations of the active variables of a discrete
+    search space, in a fixed order.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+
+    Raises
+    ------
+    ValueError
+        If a variable that can be active is not discrete, that is, has
+        neither a sequence of values (or `bool`) as its `value_type`,
+        nor is an `int` with a `minimum` and a `maximum`.
+
+    Notes
+    -----
+    Configurations are dicts of the values of the variables used by
+    the graph under them, suitable as keyword arguments of `evaluate`.
+    Their number is `size`; grids have no `len()`, as it would overflow
+    for more than `sys.maxsize` configurations.
+    Configurations that differ only in the values of unused variables
+    are counted once. Every value of a selector counts, even those not
+    among the keys of the choices it selects from, which `evaluate`
+    would fail on.
+
+    Variables are split into groups whose activity depends on disjoint
+    sets of selectors; the number of configurations is the product of
+    the numbers for each group. Within a group, counting recurses over
+    the values of the selectors only, and remembers the count for each
+    combination of selector values it sees, so that the memory used
+    depends on the structure of the space, not on the number of
+    configurations.
+    """
+    def __init__(self, space):
+        index = ConditionalIndex.of(space)
+        self.index = index
+        infos = [info for info in index if info.conditions != NEVER]
+        domains = dict((info.name, domain(info)) for info in infos)
+        # Group variables with the selectors in their conditions.
+        group = dict((info.name, info.name) for info in infos)
+
+        def find(name):
+            while group[name] != name:
+                group[name] = group[group[name]]
+                name = group[name]
+            return name
+        for info in infos:
+            for selector in info.selectors:
+                if selector in group:
+                    group[find(selector)] = find(info.name)
+        members = {}
+        for info in infos:  # In sorted order.
+            members.setdefault(find(info.name), []).append(info)
+        selectors = set(index.selectors)
+        # In the order of their first variables' names.
+        self._components = [_Component(component, selectors, domains)
+                            for component in sorted(members.itervalues(),
+                                                    key=lambda g: g[0].name)]
+        size = 1
+        for component in self._components:
+            size *= component.size
+        self.size = size
+
+    def __getitem__(self, i):
+        """
+        Compute the configuration at a position.
+
+        Parameters
+        ----------
+        i : int
+            Negative positions count from the end.
+
+        Returns
+        -------
+        configuration : dict
+        """
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError("grid index out of range")
+        configuration = {}
+        # Mixed-radix digits, the last component varying fastest.
+        for component in reversed(self._components):
+            i, digit = divmod(i, component.size)
+            component.configuration(digit, configuration)
+        return configuration
+
+    def __iter__(self):
+        return self.iterate()
+
+    def iterate(self, skip=0, take=None, step=1):
+        """
+        Lazily generate (some of) the configurations.
+
+        Parameters
+        ----------
+        skip : int, optional
+            The position of the first configuration.
+        take : int, optional
+            The maximum number of configurations generated. By default,
+            all those from `skip` on.
+        step : int, optional
+            The distance between the positions of successive
+            configurations.
+
+        Returns
+        -------
+        configurations : generator
+
+        Notes
+        -----
+        `n` workers can split a grid into contiguous blocks of `b`
+        configurations, with `skip=k * b, take=b` for the `k`th worker,
+        or interleave, with `skip=k, step=n`.
+        """
+        if skip < 0 or step < 1:
+            raise ValueError("skip must be non-negative and step positive")
+        i = skip
+        taken = 0
+        while i < self.size and (take is None or taken < take):
+            yield self[i]
+            i += step
+            taken += 1
+
+
+def grid_size(space):
+    """
+    Count the distinct configurations of a discrete search space.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+
+    Returns
+    -------
+    size : int
+
+    Raises
+    ------
+    ValueError
+        If a variable that can be active is not discrete.
+
+    See Also
+    --------
+    Grid
+    """
+    return Grid(space).size
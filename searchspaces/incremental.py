@@ -0,0 +1,103 @@
+"""
+Incremental re-evaluation of `PartialPlus` graphs.
+
+Optimizers that change only a few variables between consecutive trials
+(local search, coordinate-wise or Bayesian optimization) need not
+rebuild the whole graph every time: the values of nodes that depend on
+none of the changed variables are still valid.
+"""
+from .frozen import FrozenGraph
+from .partialplus import _evaluate
+
+_MISSING = object()
+
+
+def _same_value(a, b):
+    """Whether a variable's value is unchanged, erring on `False`."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    try:
+        return bool(a == b)
+    except Exception:  # e.g. NumPy arrays, whose truth is ambiguous.
+        return False
+
+
+class IncrementalEvaluator(object):
+    """
+    Evaluates a graph repeatedly, recomputing only the nodes that
+    depend on variables whose values changed since the last call.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+    instantiate_call : callable, optional
+        See `_evaluate`.
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle, or a variable's name
+        is not a `Literal`.
+
+    Notes
+    -----
+    Values of nodes are kept between calls, and nodes not downstream of
+    a changed variable are not called again, so their results (which
+    may be mutable objects) are shared between the values returned by
+    successive calls. When a `choice` flips to another branch, only the
+    selection is redone; the newly selected branch is evaluated if it
+    hasn't been with the current values of its variables, and the old
+    one's values are kept in case it is selected again.
+
+    The graph should not be modified after creating the evaluator.
+    """
+    def __init__(self, root, instantiate_call=None):
+        graph = root if isinstance(root, FrozenGraph) else FrozenGraph(root)
+        self.graph = graph
+        self.root = graph.root
+        self.index = graph.dependency_index
+        self.instantiate_call = instantiate_call
+        # Number of nodes whose values were discarded by the last call.
+        self.invalidated = 0
+        self._bindings = {}
+        self._assignment = {}
+
+    def __call__(self, **kwargs):
+        """
+        Evaluate the graph with new values for its variables.
+
+        Parameters
+        ----------
+        kwargs
+            Values of the variables, by name.
+
+        Returns
+        -------
+        value : object
+            The value of the root node.
+        """
+        old = self._assignment
+        changed = [name for name in set(old).union(kwargs)
+                   if not _same_value(old.get(name, _MISSING),
+                                      kwargs.get(name, _MISSING))]
+        bindings = self._bindings
+        nodes = self.graph.nodes
+        invalidated = 0
+        for i in self.index.affected_by(*changed):
+            if bindings.pop(nodes[i], _MISSING) is not _MISSING:
+                invalidated += 1
+        for name in changed:
+            bindings.pop(name, None)
+            if name in kwargs:
+                bindings[name] = kwargs[name]
+        self._assignment = dict(kwargs)
+        self.invalidated = invalidated
+        return _evaluate(self.root, instantiate_call=self.instantiate_call,
+                         bindings=bindings)
+
+    def reset(self):
+        """Forget all values computed so far."""
+        self._bindings = {}
+        self._assignment = {}
@@ -2,6 +2,7 @@ import os
 import tempfile
 from searchspaces.test_utils import skip_if_no_module
 from searchspaces import evaluate
+from searchspaces.transforms import fold_constants
 try:
     from searchspaces.load.pylearn2_yaml import (
         append_yaml_src, append_yaml_callback, proxy_to_partialplus,
@@ -162,3 +163,20 @@ def test_load_path():
         assert isinstance(p, Foo)
     finally:
         os.remove(fn)
+
+
+@skip_if_no_module('pylearn2')
+def test_load_reads_environment_at_evaluation():
+    src = "!obj:searchspaces.load.tests.test_pylearn2_yaml.Foo {x: '${FOO}'}\n"
+    folded, _ = fold_constants(load(src))
+    old = os.environ.get('FOO')
+    try:
+        os.environ['FOO'] = 'abc'
+        assert evaluate(folded).x == 'abc'
+        os.environ['FOO'] = 'def'
+        assert evaluate(folded).x == 'def'
+    finally:
+        if old is None:
+            del os.environ['FOO']
+        else:
+            os.environ['FOO'] = old
@@ -0,0 +1,610 @@
+"""
+Concurrent evaluation of `PartialPlus` graphs.
+
+`evaluate(p, executor=...)` runs the functions of independent nodes at
+the same time on a `concurrent.futures` executor, starting each as soon
+as its inputs are done, while keeping the lazy indexing semantics of
+`evaluate`: elements of a sequence or values of a dict that a `getitem`
+(or `choice`) node doesn't select are never evaluated.
+
+`evaluate_async` evaluates a graph without blocking, when some of its
+functions return futures, for instance of I/O done elsewhere.
+
+`evaluate_many` evaluates one graph with many assignments of its
+variables on a pool of worker processes, sending the graph to each
+worker only once.
+"""
+from collections import deque
+import operator
+import sys
+import threading
+
+from .partialplus import (Literal, is_indexable, variable_node,
+                          make_list, make_tuple, call_with_list_of_pos_args,
+                          choice_node, _select_branch, _branch_keys)
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    Future = None
+
+
+# Functions that only assemble their arguments into containers, and
+# are cheaper to call right away than to hand to an executor.
+_INLINE_FUNCTIONS = set([make_list, make_tuple, call_with_list_of_pos_args,
+                         choice_node, operator.getitem])
+
+
+def _is_future(value):
+    return hasattr(value, 'add_done_callback') and hasattr(value, 'result')
+
+
+# Phases of the nodes being evaluated; see `_evaluate`.
+_CALL = 1
+_INDEX = 2
+_KEYS = 3
+_SELECT = 4
+_CACHED = 5
+
+
+class _Scheduler(object):
+    """
+    Evaluates a graph, launching node functions through `submit`.
+
+    Parameters
+    ----------
+    root : Node
+    bindings : dict
+        Values of variables by name, and of nodes already evaluated.
+    submit : callable
+        Called as `submit(func, args, kwargs)` to launch a node's
+        function. Returns either a future of its value (anything with
+        `add_done_callback` and `result` methods), or the value itself.
+    cache : object, optional
+        See `_evaluate`.
+    max_concurrency : int, optional
+        Maximum number of node functions running at once.
+
+    Notes
+    -----
+    The scheduler is driven by events: its start, and the completion of
+    the futures returned by `submit`. Events are handled one at a time,
+    by whichever thread posts one while no other thread is handling
+    them, so the state below is never touched by two threads at once.
+    """
+    def __init__(self, root, bindings, submit, cache=None,
+                 max_concurrency=None):
+        if Future is None:
+            raise ImportError("concurrent.futures (the 'futures' package "
+                              "on Python 2) is required")
+        self.root = root
+        self.bindings = bindings
+        self.submit = submit
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.result = Future()
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._draining = False
+        # Per node being evaluated: its phase, the data for that phase,
+        # the number of inputs still awaited, and the nodes awaiting it.
+        self._phase = {}
+        self._data = {}
+        self._remaining = {}
+        self._waiting = {}
+        self._ready = deque()
+        # Maps the futures of running functions to their nodes.
+        self._running = {}
+        self._queued = deque()
+        self._cache_keys = {}
+
+    def start(self):
+        """
+        Start evaluating the graph.
+
+        Returns
+        -------
+        future : Future
+            Resolves to the value of the root node, or to the first
+            exception raised while evaluating it.
+        """
+        self._post(None)
+        return self.result
+
+    def _post(self, future):
+        with self._lock:
+            self._events.append(future)
+            if self._draining:
+                return
+            self._draining = True
+        while True:
+            with self._lock:
+                if not self._events:
+                    self._draining = False
+                    return
+                future = self._events.popleft()
+            self._handle(future)
+
+    def _handle(self, future):
+        if self.result.done():
+            return
+        try:
+            if future is None:
+                if self.cache is not None:
+                    self._cache_keys = self.cache.prepare(self.root,
+                                                          self.bindings)
+                self._request(self.root, None)
+            else:
+                node = self._running.pop(future)
+                self._launch_queued()
+                self._finish(node, future.result())
+            while self._ready:
+                self._advance(self._ready.popleft())
+            if self.root in self.bindings:
+                self.result.set_result(self.bindings[self.root])
+            elif not self._running and not self._queued:
+                raise ValueError("call graph contains a directed cycle")
+        except BaseException:
+            self._fail(*sys.exc_info())
+
+    def _fail(self, exc_type, exc, tb):
+        for future in self._running:
+            future.cancel()
+        self._running.clear()
+        self._queued.clear()
+        if hasattr(self.result, 'set_exception_info'):
+            self.result.set_exception_info(exc, tb)
+        else:
+            self.result.set_exception(exc)
+
+    def _request(self, node, parent):
+        """Ask for the value of `node`; `True` if it is available."""
+        if node in self.bindings:
+            return True
+        if isinstance(node, Literal):
+            self.bindings[node] = node.value
+            return True
+        self._waiting.setdefault(node, []).append(parent)
+        if node not in self._phase:
+            self._begin(node)
+        return False
+
+    def _wait_for(self, node, inputs):
+        remaining = 0
+        for i in inputs:
+            if not self._request(i, node):
+                remaining += 1
+        self._remaining[node] = remaining
+        if remaining == 0:
+            self._ready.append(node)
+
+    def _begin(self, node):
+        key = self._cache_keys.get(id(node))
+        if key is not None:
+            found, value = self.cache.get(key)
+            if found:
+                self._phase[node] = _CACHED
+                self._data[node] = value
+                self._ready.append(node)
+                return
+        if node.func is operator.getitem and is_indexable(node):
+            self._phase[node] = _INDEX
+            self._wait_for(node, node._args[1:])
+        else:
+            self._phase[node] = _CALL
+            self._wait_for(node, node.inputs())
+
+    def _advance(self, node):
+        """Move `node` on once the inputs it waited for are done."""
+        bindings = self.bindings
+        phase = self._phase[node]
+        if phase == _CALL:
+            args = [bindings[arg] for arg in node._args]
+            kw = (dict((k, bindings[v])
+                       for k, v in node._keywords.iteritems())
+                  if node._keywords else {})
+            if node.func is variable_node:
+                name = kw['name']
+                try:
+                    value = bindings[name]
+                except KeyError:
+                    raise KeyError("variable with name '%s' not bound" % name)
+                self._finish(node, value)
+            elif node.func in _INLINE_FUNCTIONS:
+                self._finish(node, node.func(*args, **kw))
+            elif (self.max_concurrency is not None and
+                    len(self._running) >= self.max_concurrency):
+                self._queued.append((node, args, kw))
+            else:
+                self._launch(node, args, kw)
+        elif phase == _INDEX:
+            branch = _select_branch(node, bindings[node._args[1]])
+            if branch is None:
+                keys = _branch_keys(node)
+                self._data[node] = keys
+                self._phase[node] = _KEYS
+                self._wait_for(node, keys)
+            else:
+                self._select(node, branch)
+        elif phase == _KEYS:
+            self._select(node, _select_branch(
+                node, bindings[node._args[1]],
+                [bindings[k] for k in self._data[node]]))
+        elif phase == _SELECT:
+            data = self._data[node]
+            if isinstance(data, tuple):
+                func = node._args[0].func
+                self._finish(node, func(*[bindings[e] for e in data]))
+            else:
+                self._finish(node, bindings[data])
+        else:  # phase == _CACHED
+            self._finish(node, self._data[node])
+
+    def _select(self, node, branch):
+        """Wait for the branch `node` selects, then take its value."""
+        self._data[node] = branch
+        self._phase[node] = _SELECT
+        self._wait_for(node, branch if isinstance(branch, tuple)
+                       else (branch,))
+
+    def _launch(self, node, args, kw):
+        value = self.submit(node.func, args, kw)
+        if _is_future(value):
+            self._running[value] = node
+            value.add_done_callback(self._post)
+        else:
+            self._finish(node, value)
+
+    def _launch_queued(self):
+        while self._queued and (self.max_concurrency is None or
+                                len(self._running) < self.max_concurrency):
+            self._launch(*self._queued.popleft())
+
+    def _finish(self, node, value):
+        self.bindings[node] = value
+        if self._phase.get(node) == _CALL and id(node) in self._cache_keys:
+            self.cache.set(self._cache_keys[id(node)], value)
+        self._phase.pop(node, None)
+        self._data.pop(node, None)
+        self._remaining.pop(node, None)
+        for parent in self._waiting.pop(node, ()):
+            if parent is not None:
+                self._remaining[parent] -= 1
+                if self._remaining[parent] == 0:
+                    self._ready.append(parent)
+
+
+def evaluate_parallel(p, executor, cache=None, **kwargs):
+    """
+    Evaluate a graph, running independent nodes concurrently.
+
+    Parameters
+    ----------
+    p : Node
+    executor : concurrent.futures.Executor
+        Runs the functions of the nodes, except those that only build
+        lists, tuples and dicts, or look up variables, which are run
+        in the scheduling thread.
+    cache : object, optional
+        See `evaluate`.
+    kwargs
+        Values of the variables, by name.
+
+    Returns
+    -------
+    value : object
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    The first exception raised by a node is raised here, after
+    cancelling the functions not yet started by the executor.
+    """
+    if isinstance(p, Literal):
+        return p.value
+
+    def submit(func, args, kw):
+        return executor.submit(func, *args, **kw)
+    scheduler = _Scheduler(p, dict(kwargs), submit, cache=cache)
+    return scheduler.start().result()
+
+
+def _call(func, args, kwargs):
+    """Call a node function right away, for `evaluate_async`."""
+    return func(*args, **kwargs)
+
+
+def evaluate_async(p, max_concurrency=None, cache=None, **kwargs):
+    """
+    Start evaluating a graph whose functions may return futures,
+    without blocking.
+
+    Parameters
+    ----------
+    p : Node
+    max_concurrency : int, optional
+        Maximum number of node functions whose futures are pending at
+        once. Functions ready to be called beyond that wait for a
+        pending one to finish.
+    cache : object, optional
+        See `evaluate`.
+    kwargs
+        Values of the variables, by name.
+
+    Returns
+    -------
+    future : concurrent.futures.Future
+        Resolves to the value of the graph, or to the first exception
+        raised while evaluating it.
+
+    Notes
+    -----
+    Node functions are called in the thread that starts the evaluation
+    or that completes the future of one of their inputs. A function
+    returning a future (anything with `add_done_callback` and
+    `result` methods) is an asynchronous node: its value is the
+    future's result, and independent asynchronous nodes are pending at
+    the same time. Values are memoized, and `getitem` and `choice`
+    nodes evaluate only what they select, as in `evaluate`.
+
+    On Python 3, the returned future can be awaited in a coroutine with
+    `await asyncio.wrap_future(evaluate_async(p, ...))`.
+    """
+    if Future is None:
+        raise ImportError("concurrent.futures (the 'futures' package "
+                          "on Python 2) is required")
+    if isinstance(p, Literal):
+        future = Future()
+        future.set_result(p.value)
+        return future
+    scheduler = _Scheduler(p, dict(kwargs), _call, cache=cache,
+                           max_concurrency=max_concurrency)
+    return scheduler.start()
+
+
+class TrialResult(object):
+    """
+    The outcome of evaluating a graph with one assignment.
+
+    Parameters
+    ----------
+    index : int
+        Position of the assignment in the input.
+    assignment : dict
+    value : object, optional
+        The value of the graph, if evaluating it succeeded.
+    error : Exception, optional
+        The exception raised otherwise.
+    traceback : str, optional
+        The formatted traceback of `error`, from the worker.
+    """
+    __slots__ = ('index', 'assignment', 'value', 'error', 'traceback')
+
+    def __init__(self, index, assignment, value=None, error=None,
+                 traceback=None):
+        self.index = index
+        self.assignment = assignment
+        self.value = value
+        self.error = error
+        self.traceback = traceback
+
+    @property
+    def ok(self):
+        """Whether evaluating the graph succeeded."""
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return 'TrialResult(%d, value=%r)' % (self.index, self.value)
+        return 'TrialResult(%d, error=%r)' % (self.index, self.error)
+
+
+# The graph evaluated by a worker process, set up by `_init_worker`.
+_worker_graph = None
+
+
+def _init_worker(data):
+    global _worker_graph
+    from .serialize import loads
+    _worker_graph = loads(data)
+
+
+def _run_chunk(chunk):
+    """
+    Evaluate the worker's graph with a list of `(index, assignment)`.
+
+    Returns a list of `(index, pickled value, error, traceback)`; values
+    are pickled here so that one that can't be fails only its trial.
+    """
+    import cPickle as pickle
+    import traceback
+    from .partialplus import evaluate
+    results = []
+    for index, assignment in chunk:
+        try:
+            value = evaluate(_worker_graph, **assignment)
+            results.append((index, pickle.dumps(value, -1), None, None))
+        except Exception as e:
+            tb = traceback.format_exc()
+            try:
+                # Some exceptions pickle but can't be unpickled, which
+                # would kill the pool's result handler in the parent.
+                pickle.loads(pickle.dumps(e, -1))
+            except Exception:
+                e = RuntimeError('%s: %s' % (type(e).__name__, e))
+            results.append((index, None, e, tb))
+    return results
+
+
+def _chunks(assignments, chunksize):
+    chunk = []
+    for item in enumerate(assignments):
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _chunk_failed(chunk):
+    """
+    Results for every trial of a chunk whose task failed as a whole,
+    as returned by `_run_chunk`, from the exception being handled.
+    """
+    import traceback
+    e = sys.exc_info()[1]
+    tb = traceback.format_exc()
+    return [(index, None, e, tb) for index, _ in chunk]
+
+
+def evaluate_many(root, assignments, processes=None, ordered=True,
+                  chunksize=1, max_pending=None):
+    """
+    Evaluate a graph with many assignments of its variables, on a
+    pool of worker processes.
+
+    Parameters
+    ----------
+    root : Node
+    assignments : iterable of dict
+        Values of the variables, by name, for each trial. Consumed
+        lazily, as workers become free.
+    processes : int, optional
+        Number of worker processes; defaults to the number of CPUs.
+    ordered : bool, optional
+        If `True` (the default), results are yielded in the order of
+        `assignments`, otherwise as they are completed.
+    chunksize : int, optional
+        Number of assignments sent to a worker at a time.
+    max_pending : int, optional
+        Maximum number of chunks sent out but not yet yielded. Defaults
+        to four times the number of processes.
+
+    Returns
+    -------
+    results : iterator of TrialResult
+
+    Raises
+    ------
+    ValueError
+        If a function in the graph can neither be imported by name
+        nor pickled, such as a lambda or a nested function (see
+        `searchspaces.serialize.function_reference`); such graphs
+        couldn't be sent to the workers by pickling either. This is
+        raised right away; the workers are only started once iteration
+        begins.
+
+    Notes
+    -----
+    The graph is serialized once and loaded by each worker when it
+    starts; after that, only assignments and results travel between
+    processes. An exception evaluating one trial, or pickling its
+    value, is reported in that trial's result and doesn't affect the
+    others. If a chunk of assignments can't be sent to a worker at all
+    (e.g. an assignment can't be pickled), every trial of that chunk
+    is reported as failed with the same exception. Stopping the
+    iteration early terminates the workers.
+    """
+    import multiprocessing
+    from .serialize import dumps
+    data = dumps(root)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if max_pending is None:
+        max_pending = 4 * processes
+    return _evaluate_many(data, assignments, processes, ordered, chunksize,
+                          max_pending)
+
+
+def _evaluate_many(data, assignments, processes, ordered, chunksize,
+                   max_pending):
+    """The generator behind `evaluate_many`, given the serialized
+    graph."""
+    import cPickle as pickle
+    import multiprocessing
+    import Queue
+    pool = multiprocessing.Pool(processes, _init_worker, (data,))
+    # Whether the pool was shut down cleanly, after all results.
+    closed = False
+    # Assignments sent out, by index, until their results are yielded.
+    sent = {}
+    chunks = _chunks(assignments, chunksize)
+
+    def make_results(results):
+        for index, value, error, tb in results:
+            assignment = sent.pop(index)
+            if error is None:
+                yield TrialResult(index, assignment, pickle.loads(value))
+            else:
+                yield TrialResult(index, assignment, error=error,
+                                  traceback=tb)
+
+    try:
+        if ordered:
+            pending = deque()
+            while True:
+                while len(pending) < max_pending:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    sent.update(chunk)
+                    pending.append((chunk, pool.apply_async(_run_chunk,
+                                                            (chunk,))))
+                if not pending:
+                    break
+                chunk, r = pending.popleft()
+                try:
+                    results = r.get()
+                except Exception:
+                    results = _chunk_failed(chunk)
+                for result in make_results(results):
+                    yield result
+        else:
+            done = Queue.Queue()
+            # Maps the first index of each chunk sent out to the chunk
+            # and its result.
+            pending = {}
+            while True:
+                while len(pending) < max_pending:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    sent.update(chunk)
+                    key = chunk[0][0]
+                    pending[key] = chunk, pool.apply_async(
+                        _run_chunk, (chunk,),
+                        callback=lambda results, key=key: done.put(
+                            (key, results)))
+                if not pending:
+                    break
+                try:
+                    key, results = done.get(timeout=0.1)
+                except Queue.Empty:
+                    # The callback isn't called if a task fails as a
+                    # whole (e.g. an assignment can't be pickled), so
+                    # look for those.
+                    for key, (chunk, r) in pending.items():
+                        if r.ready() and not r.successful():
+                            del pending[key]
+                            try:
+                                r.get()
+                            except Exception:
+                                results = _chunk_failed(chunk)
+                            for result in make_results(results):
+                                yield result
+                    continue
+                del pending[key]
+                for result in make_results(results):
+                    yield result
+        pool.close()
+        pool.join()
+        closed = True
+    finally:
+        if not closed:
+            pool.terminate()
+            pool.join()
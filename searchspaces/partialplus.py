@@ -8,11 +8,11 @@ __contact__ = "github.com/hyperopt/hyperopt"
 
 # Keep this to only standard library imports so that this is droppable in
 # another code-base for re-use.
-from collections import deque
-import compiler
 from functools import partial as _partial
+import inspect
 import operator
 import warnings
+import weakref
 from itertools import izip, repeat
 
 # TODO: support o_len functionality from old Apply nodes
@@ -52,7 +52,7 @@ def is_dict_like_node(node):
 
 
 def is_indexable(node):
-    if len(node.args) != 2 or len(node.keywords) > 0:
+    if len(node._args) != 2 or len(node._keywords) > 0:
         return False
     obj, index = node.args
     if is_sequence_node(obj) or is_dict_like_node(obj):
@@ -108,6 +108,108 @@ def call_with_list_of_pos_args(f, *args):
     return f(args)
 
 
+def _literal_key_index(node):
+    """
+    Build the key lookup table of a dict-like node.
+
+    Parameters
+    ----------
+    node : PartialPlus
+        A `call_with_list_of_pos_args` node.
+
+    Returns
+    -------
+    key_index : dict or None
+        Maps the value of each key to the position of its (first)
+        `(key, value)` pair among `node.args[1:]`. `None` if `node` is
+        not dict-like, or not all of its keys are hashable `Literal`s,
+        in which case indexing it has to evaluate and scan the keys.
+    """
+    args = node._args
+    if not (args and isinstance(args[0], Literal) and
+            isinstance(args[0].value, type) and
+            issubclass(args[0].value, dict)):
+        return None
+    key_index = {}
+    try:
+        for i, pair in enumerate(args[1:]):
+            if not (is_tuple_node(pair) and len(pair._args) == 2 and
+                    isinstance(pair._args[0], Literal)):
+                return None
+            key_index.setdefault(pair._args[0].value, i)
+    except TypeError:  # Unhashable key.
+        return None
+    return key_index
+
+
+def _key_position(key_index, index_val):
+    """
+    Find the position of a key in the `_key_index` of a dict-like node.
+
+    Returns `None` if `index_val` is unhashable, so the keys need to be
+    scanned, and raises `KeyError` if it is not one of the keys. Keys
+    that compare equal (like `1` and `True`) resolve to the first one,
+    as with `list.index`.
+    """
+    try:
+        return key_index[index_val]
+    except TypeError:
+        return None
+
+
+def _select_branch(node, index_val, key_values=None):
+    """
+    Find the branch an indexing node selects with a given index.
+
+    Parameters
+    ----------
+    node : PartialPlus
+        A `getitem` node of a list, tuple or dict, as told by
+        `is_indexable`.
+    index_val : object
+        The value of its index.
+    key_values : list, optional
+        The values of the dict's keys, in the order of
+        `_branch_keys(node)`. Only needed once a call without them
+        returned `None`.
+
+    Returns
+    -------
+    branch : Node, tuple or None
+        The selected element or value, a tuple of the selected elements
+        if `index_val` is a slice of a list or tuple, or `None` if the
+        dict's keys must be evaluated to tell, because they are not all
+        literals or `index_val` is unhashable.
+
+    Raises
+    ------
+    IndexError, TypeError
+        If `index_val` doesn't select elements of a list or tuple.
+    KeyError
+        If `index_val` is not one of the keys of a dict.
+    """
+    obj = node._args[0]
+    if is_sequence_node(obj):
+        return obj._args[index_val]
+    if key_values is not None:
+        try:
+            position = key_values.index(index_val)
+        except ValueError:
+            raise KeyError(index_val)
+    elif obj._key_index is None:
+        return None
+    else:
+        position = _key_position(obj._key_index, index_val)
+        if position is None:
+            return None
+    return obj._args[position + 1]._args[1]
+
+
+def _branch_keys(node):
+    """The key nodes of the dict indexed by an indexing node."""
+    return [pair._args[0] for pair in node._args[0]._args[1:]]
+
+
 def partial(f, *args, **kwargs):
     """
     A workalike for `functools.partial` that actually (recursively)
@@ -174,132 +276,63 @@ def as_partialplus(p):
         return Literal(p)
 
 
-class UniqueStack(object):
-    """
-    Implementation of a stack (using a deque) that also checks pushed elements
-    for uniqueness.
-    """
-    def __init__(self):
-        self._deque = deque()
-        self._members = set()
-
-    def push(self, elem):
-        """
-        Push an element onto the stack.
+# Colours for the depth-first search in `_traversal_helper`. Nodes not yet
+# seen have no colour at all.
+_GREY = 1   # On the path from the root to the current node.
+_BLACK = 2  # Done with, along with everything reachable from it.
 
-        Parameters
-        ----------
-        elem : object
 
-        Raises
-        ------
-        KeyError
-            If `elem` already exists in this stack.
-        """
-
-        if elem in self._members:
-            raise KeyError(str(elem))
-        else:
-            self._deque.append(elem)
-            self._members.add(elem)
-
-    def pop(self):
-        """
-        Pop the topmost element off the stack.
-
-        Returns
-        -------
-        elem : object
-            The top-most element from the stack (removed).
-
-        Raises
-        ------
-        IndexError
-            If the stack is empty.
-        """
-        try:
-            elem = self._deque.pop()
-            self._members.remove(elem)
-        except IndexError:
-            raise IndexError("pop from an empty %s" % self.__class__.__name__)
-        return elem
-
-    def pop_until(self, elem):
-        """
-        Pop and discard items until the head of the stack is the
-        object `elem`.
-
-        Parameters
-        ----------
-        elem : object
-            The desired element at the head of the stack.
-
-        Raises
-        ------
-        ValueError
-            If the stack is emptied before finding `elem`.
-        """
-        while len(self._deque) > 0 and self._deque[-1] is not elem:
-            self.pop()
-        if len(self._deque) == 0:
-            raise ValueError("never found sentinel element")
-
-
-def _traversal_helper(root, build_inverted=False):
+def _traversal_helper(root, index=None):
     """
-    Helper function for `depth_first_traversal` and `topological_sort`.
+    Helper function for `depth_first_traversal` and `GraphIndex`.
 
     Parameters
     ----------
     root : Node
-    build_inverted : boolean, optional
-        If `True`, after all nodes have been yielded, yield a dictionary
-        containing an inverted index.
+    index : dict, optional
+        If given, filled in with a mapping from the `id()` of every node
+        produced to its position in the traversal.
 
     Returns
     -------
     gen : generator object
         A generator producing nodes from the graph, in a depth-first order.
-        If `build_inverted` is True then the last item it yields is a
-        dictionary containing an inverted index (mapping nodes to their
-        parents).
 
     Raises
     ------
     ValueError
         If the graph contains a directed cycle.
+
+    Notes
+    -----
+    Cycles are found by three-colour marking: running into a node that
+    is still on the current path (grey) means the graph has a cycle.
+    Each edge is looked at once.
     """
     assert isinstance(root, Node)
-    visited = {}
-    to_visit = deque()
-    # TODO: optimize out UniqueStack class by just doing what it would do
-    # in the function body.
-    path = UniqueStack()
-    # None = our sentinel value for "no parent".
-    path.push(None)
-    to_visit.append((None, root))
-    while len(to_visit) > 0:
-        parent, node = to_visit.pop()
-        path.pop_until(parent)
-        try:
-            path.push(node)
-        except KeyError:
-            raise ValueError("call graph contains a directed cycle")
-        if node not in visited:
-            if build_inverted:
-                visited.setdefault(node, set()).add(parent)
-            else:
-                visited[node] = True
-            yield node
-            if isinstance(node, PartialPlus):
-                children = node.args + (tuple(node.keywords.values())
-                                        if node.keywords is not None else ())
-                to_visit.extend((node, c) for c in children)
-        elif build_inverted:
-            visited[node].add(parent)
-    if build_inverted:
-        visited[root].remove(None)
-        yield visited
+    index = {} if index is None else index
+    colours = bytearray([_GREY])
+    index[id(root)] = 0
+    yield root
+    # Inputs are visited last to first, which is the order in which
+    # pushing them all onto a stack and popping them off would visit them.
+    stack = [(0, reversed(root.inputs()))]
+    while stack:
+        i, children = stack[-1]
+        for child in children:
+            j = index.get(id(child))
+            if j is None:
+                j = len(colours)
+                index[id(child)] = j
+                colours.append(_GREY)
+                yield child
+                stack.append((j, reversed(child.inputs())))
+                break
+            elif colours[j] == _GREY:
+                raise ValueError("call graph contains a directed cycle")
+        else:
+            colours[i] = _BLACK
+            stack.pop()
 
 
 def depth_first_traversal(root):
@@ -323,13 +356,124 @@ def depth_first_traversal(root):
     return _traversal_helper(root)
 
 
-def topological_sort(root):
+class GraphIndex(object):
+    """
+    An index of the nodes reachable from a root, and the edges
+    between them.
+
+    Parameters
+    ----------
+    root : Node
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    Nodes are numbered by their position in `depth_first_traversal`
+    (so the root is node 0). Edges point from a node to its inputs,
+    and an input used more than once by the same node gives rise to
+    more than one edge. The index reflects the graph at the time it
+    was built; it is not updated if the graph is modified.
+    """
+    def __init__(self, root):
+        ids = {}
+        self.nodes = list(_traversal_helper(root, index=ids))
+        self._ids = ids
+        self.children = [tuple(ids[id(c)] for c in node.inputs())
+                         for node in self.nodes]
+        self.parents = [[] for _ in self.nodes]
+        for i, children in enumerate(self.children):
+            for c in children:
+                self.parents[c].append(i)
+        self._order = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def root(self):
+        """The node the index was built from."""
+        return self.nodes[0]
+
+    def index(self, node):
+        """
+        Look up the integer ID of a node.
+
+        Parameters
+        ----------
+        node : Node
+
+        Returns
+        -------
+        i : int
+
+        Raises
+        ------
+        KeyError
+            If `node` is not in the graph.
+        """
+        return self._ids[id(node)]
+
+    def __contains__(self, node):
+        return id(node) in self._ids
+
+    def parents_of(self, node):
+        """The nodes that have `node` as an input, without duplicates."""
+        nodes = self.nodes
+        return [nodes[i] for i in sorted(set(self.parents[self.index(node)]))]
+
+    def children_of(self, node):
+        """The inputs of `node`, without duplicates."""
+        nodes = self.nodes
+        return [nodes[i]
+                for i in sorted(set(self.children[self.index(node)]))]
+
+    def topological_order(self, reverse=False):
+        """
+        Integer IDs of the nodes, sorted topologically.
+
+        Parameters
+        ----------
+        reverse : bool, optional
+            If `False` (the default), every node comes before its
+            inputs, and the root comes first. If `True`, every node
+            comes after its inputs, and the root comes last.
+
+        Returns
+        -------
+        order : list
+        """
+        if self._order is None:
+            # Kahn's algorithm: a node is ready once all of the edges
+            # from its parents have been consumed.
+            remaining = [len(p) for p in self.parents]
+            children = self.children
+            order = [0]
+            append = order.append
+            for i in order:
+                for c in children[i]:
+                    remaining[c] -= 1
+                    if not remaining[c]:
+                        append(c)
+            assert len(order) == len(self.nodes)
+            self._order = order
+        return self._order[::-1] if reverse else list(self._order)
+
+
+def topological_sort(root, reverse=False):
     """
     Perform a topological sort of a graph of PartialPlus objects.
 
     Parameters
     ----------
     root : Node
+    reverse : bool, optional
+        If `False` (the default), every node is produced before its
+        inputs, starting with `root`. If `True`, every node is
+        produced after its inputs, ending with `root`.
 
     Returns
     -------
@@ -341,18 +485,10 @@ def topological_sort(root):
     ValueError
         If the graph contains a directed cycle.
     """
-    # TODO: make this more efficient and natively support reverse sort
-    # (probably by getting two dictionaries).
-    candidates = deque(_traversal_helper(root, build_inverted=True))
-    dependencies = candidates.pop()
-    visited = set()
-    while candidates:
-        proposed = candidates.popleft()
-        if dependencies[proposed].difference(visited):
-            candidates.append(proposed)
-        else:
-            visited.add(proposed)
-            yield proposed
+    index = GraphIndex(root)
+    nodes = index.nodes
+    for i in index.topological_order(reverse=reverse):
+        yield nodes[i]
 
 
 class MissingArgument(object):
@@ -374,9 +510,6 @@ def _extract_param_names(fn):
 
     Returns
     -------
-    param_names : list
-        A list of all the function's argument names.
-
     pos_args : list
         A list of names of the non-special arguments to `fn`.
 
@@ -392,8 +525,8 @@ def _extract_param_names(fn):
     """
     code = fn.__code__
 
-    extra_args_ok = bool(code.co_flags & compiler.consts.CO_VARARGS)
-    extra_kwargs_ok = bool(code.co_flags & compiler.consts.CO_VARKEYWORDS)
+    extra_args_ok = bool(code.co_flags & inspect.CO_VARARGS)
+    extra_kwargs_ok = bool(code.co_flags & inspect.CO_VARKEYWORDS)
     expected_num_args = (code.co_argcount + int(extra_args_ok) +
                          int(extra_kwargs_ok))
     assert len(code.co_varnames) >= expected_num_args
@@ -406,6 +539,90 @@ def _extract_param_names(fn):
     return pos_params, args_param, kwargs_param
 
 
+# Stands in for the signature of callables that can't be inspected,
+# such as builtins.
+_UNKNOWN_SIGNATURE = None
+
+# Signatures computed by `_signature`. Weakly keyed, so that they don't
+# keep functions alive; callables that can't be weakly referenced (such
+# as builtins) go in the plain dictionary.
+_SIGNATURES = weakref.WeakKeyDictionary()
+_STRONG_SIGNATURES = {}
+
+
+def _python_function(fn):
+    """
+    Find the Python function that is run when calling `fn`.
+
+    Returns
+    -------
+    func : function or None
+        `None` if there is none (e.g. `fn` is a builtin).
+    bound : bool
+        Whether the first parameter of `func` is filled in implicitly,
+        as `self` is when calling bound methods, classes or callable
+        objects.
+    """
+    if inspect.isfunction(fn):
+        return fn, False
+    elif inspect.ismethod(fn):
+        return fn.im_func, fn.im_self is not None
+    elif inspect.isclass(fn):
+        init = getattr(fn, '__init__', None)
+    else:
+        init = getattr(type(fn), '__call__', None)
+    func = getattr(init, 'im_func', None)
+    if not inspect.isfunction(func):
+        return None, False
+    return func, True
+
+
+def _signature(fn):
+    """
+    Inspect (or look up) the parameters of a callable.
+
+    Parameters
+    ----------
+    fn : callable
+        A function, method, class, or callable object.
+
+    Returns
+    -------
+    signature : tuple or None
+        `(pos_params, args_param, kwargs_param, defaults)`, as returned
+        by `_extract_param_names` plus the default values of the last
+        positional parameters, leaving out the implicit `self` of
+        methods. `None` if `fn` has no Python function to inspect.
+    """
+    try:
+        return _SIGNATURES[fn]
+    except KeyError:
+        pass
+    except TypeError:  # Can't be weakly referenced.
+        try:
+            return _STRONG_SIGNATURES[fn]
+        except (KeyError, TypeError):
+            pass
+    func, bound = _python_function(fn)
+    if func is None:
+        signature = _UNKNOWN_SIGNATURE
+    else:
+        params, args_param, kwargs_param = _extract_param_names(func)
+        defaults = func.__defaults__ if func.__defaults__ else ()
+        if bound:
+            params = params[1:]
+            defaults = defaults[len(defaults) - len(params):]
+        signature = (tuple(params), args_param, kwargs_param, defaults)
+    try:
+        _SIGNATURES[fn] = signature
+    except TypeError:
+        try:
+            _STRONG_SIGNATURES[fn] = signature
+        except TypeError:  # Unhashable.
+            pass
+    return signature
+
+
 def _bind_parameters(params, named_args, kwargs_param, binding=None):
     """
     Resolve bindings for arguments from a list of parameter
@@ -458,16 +675,19 @@ def _param_assignment(pp):
     """
     binding = {}
 
-    fn = pp.func
-    code = fn.__code__
     pos_args = pp.args
-    named_args = {} if pp.keywords is None else pp.keywords
-    params, args_param, kwargs_param = _extract_param_names(fn)
-
-    if len(pos_args) > code.co_argcount and not args_param:
+    named_args = pp._keywords
+    signature = _signature(pp.func)
+    if signature is _UNKNOWN_SIGNATURE:
+        binding.update(enumerate(pos_args))
+        binding.update(named_args)
+        return binding
+    params, args_param, kwargs_param, defaults = signature
+
+    if len(pos_args) > len(params) and not args_param:
         raise TypeError('Argument count exceeds number of positional params')
     elif args_param:
-        binding[args_param] = pos_args[code.co_argcount:]
+        binding[args_param] = pos_args[len(params):]
 
     # -- bind positional arguments
     for param_i, arg_i in izip(params, pos_args):
@@ -479,11 +699,7 @@ def _param_assignment(pp):
                        int(args_param is not None))
     assert len(binding) <= expected_length
 
-    # Right-aligned default values for params. Default to empty tuple
-    # so that iteration below simply terminates in this case.
-    defaults = fn.__defaults__ if fn.__defaults__ else ()
-
-    # -- fill in default parameter values
+    # -- fill in default parameter values (right-aligned)
     for param_i, default_i in izip(params[-len(defaults):], defaults):
         binding.setdefault(param_i, Literal(default_i))
 
@@ -493,26 +709,45 @@ def _param_assignment(pp):
     return binding
 
 
+class _EmptyKeywords(dict):
+    """
+    A read-only empty dictionary, standing in for the keyword arguments
+    of every `PartialPlus` created without any.
+    """
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("%s is read-only" % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+_NO_KEYWORDS = _EmptyKeywords()
+
+
 class Node(object):
+    __slots__ = ()
+
     def clone(self):
         bindings = {}
-        nodes = reversed(list(topological_sort(self)))
-        for node in nodes:
+        for node in topological_sort(self, reverse=True):
             if isinstance(node, Literal):
-                bindings[node] = Literal(node.value)
+                bindings[id(node)] = Literal(node.value)
             else:  # PartialPlus
                 func = node.func
-                args = [bindings[a] for a in node.args]
-                keywords = dict((k, bindings[v])
-                                for k, v in node.keywords.iteritems())
-                bindings[node] = PartialPlus(func, *args, **keywords)
-        return bindings[nodes[-1]]
+                args = [bindings[id(a)] for a in node.args]
+                keywords = dict((k, bindings[id(v)])
+                                for k, v in node._keywords.iteritems())
+                bindings[id(node)] = PartialPlus(func, *args, **keywords)
+        return bindings[id(self)]
 
     def inputs(self):
         return ()
 
 
 class Literal(Node):
+    __slots__ = ('_value',)
     func = None
     args = None
     keywords = None
@@ -520,6 +755,9 @@ class Literal(Node):
     def __init__(self, value):
         self._value = value
 
+    def __reduce__(self):
+        return (Literal, (self._value,))
+
     def __gt__(self, other):
         if not hasattr(other, 'value'):
             return False
@@ -540,9 +778,14 @@ class Literal(Node):
         return self._value
 
 
-class PartialPlus(_partial, Node):
+def _make_partialplus(f, args, keywords):
+    """Unpickling helper for `PartialPlus`."""
+    return PartialPlus(f, *args, **keywords)
+
+
+class PartialPlus(Node):
     """
-    A subclass of `functools.partial` that allows for
+    A workalike for `functools.partial` that allows for
     common arithmetic/builtin operations to be performed
     on them, deferred by wrapping in another object of
     this same type. Also overrides `__call__` to suggest
@@ -551,14 +794,36 @@ class PartialPlus(_partial, Node):
     Notable exceptions *not* implemented include __len__ and
     __iter__, because returning non-integer/iterator stuff
     from those methods tends to break things.
+
+    Notes
+    -----
+    Instances are kept small, as graphs can have a great many of
+    them: there's no instance `__dict__`, the arguments are stored
+    once, and all nodes without keyword arguments share a single
+    empty dictionary (see `keywords`).
+
+    Dict-like nodes (of `call_with_list_of_pos_args` with a `dict` type),
+    such as those built for `choice`, whose keys are all `Literal`s keep
+    a table from keys to branches, so that indexing them doesn't scan
+    the keys.
     """
+    __slots__ = ('func', '_args', '_keywords', '_key_index', '_binding')
 
     def __init__(self, f, *args, **kwargs):
+        if not callable(f):
+            raise TypeError("the first argument must be callable")
         assert all(isinstance(a, Node) for a in args)
         assert all(isinstance(v, Node) for k, v in kwargs.iteritems())
-        super(PartialPlus, self).__init__(self, f, *args, **kwargs)
-        self._keywords = kwargs
+        self.func = f
+        self._keywords = kwargs if kwargs else _NO_KEYWORDS
         self._args = args
+        self._key_index = (_literal_key_index(self)
+                           if f is call_with_list_of_pos_args else None)
+        self._binding = None
+
+    def __reduce__(self):
+        return (_make_partialplus, (self.func, self._args,
+                                    dict(self._keywords)))
 
     def __call__(self, *args, **kwargs):
         raise TypeError("use evaluate() for %s objects" %
@@ -660,13 +925,24 @@ class PartialPlus(_partial, Node):
 
     def inputs(self):
         # TODO: make this a property
-        return self.args + (tuple(self.keywords.itervalues())
-                            if self.keywords is not None else ())
+        if self._keywords:
+            return self._args + tuple(self._keywords.itervalues())
+        return self._args
 
     @property
     def arg(self):
-        # TODO: bindings
-        return _param_assignment(self)
+        """
+        The arguments of the node, by the name of the parameter of
+        `func` they are bound to.
+
+        Parameters not given a value are bound to a `Literal` of their
+        default value, or to `MissingArgument`. If `func` can't be
+        inspected (as for builtins), positional arguments are listed
+        by position instead.
+        """
+        if self._binding is None:
+            self._binding = _param_assignment(self)
+        return dict(self._binding)
 
     @property
     def keywords(self):
@@ -674,7 +950,15 @@ class PartialPlus(_partial, Node):
         Overwrite the default keywords attribute to always have a dictionary
         in that spot rather than None sometimes, which makes for a lot of
         annoying special cases.
+
+        Nodes created without keyword arguments share a read-only empty
+        dictionary, and only get one of their own (which can be
+        modified) when this is first accessed.
         """
+        if self._keywords is _NO_KEYWORDS:
+            self._keywords = {}
+        # The caller may modify the dictionary.
+        self._binding = None
         return self._keywords
 
     @property
@@ -687,6 +971,9 @@ class PartialPlus(_partial, Node):
 
     def append_arg(self, arg):
         self._args = self._args + (arg,)
+        self._binding = None
+        if self.func is call_with_list_of_pos_args:
+            self._key_index = _literal_key_index(self)
 
 
 def variable(name, value_type, minimum=None, maximum=None, default=None,
@@ -727,7 +1014,7 @@ def variable(name, value_type, minimum=None, maximum=None, default=None,
     return partial(variable_node, **d)
 
 
-def evaluate(p, **kwargs):
+def evaluate(p, cache=None, executor=None, **kwargs):
     """
     Evaluate a nested tree of functools.partial objects,
     used for deferred evaluation.
@@ -735,50 +1022,34 @@ def evaluate(p, **kwargs):
     Parameters
     ----------
     p : object
+    cache : object, optional
+        A cache of the results of nodes, such as a
+        `searchspaces.cache.DiskCache` or `searchspaces.cache.LRUCache`.
+        Which nodes it stores is up to the cache; by default, only
+        those applying functions marked with
+        `searchspaces.cache.cacheable`.
+    executor : concurrent.futures.Executor, optional
+        If given, independent nodes are evaluated concurrently on it.
+        See `searchspaces.parallel.evaluate_parallel`.
 
     """
-    return _evaluate(p, bindings=kwargs)
+    if executor is not None:
+        from .parallel import evaluate_parallel
+        return evaluate_parallel(p, executor, cache=cache, **kwargs)
+    return _evaluate(p, bindings=kwargs, cache=cache)
 
 
-def _handle_indexing(p, instantiate_call, bindings, recurse):
-    # Assumes is_indexable has already returned True.
-    obj, index = p.args
-    index_val = recurse(index)
-    if is_sequence_node(obj):
-        elem_val = obj.args[index_val]
-        if isinstance(index_val, slice):  # TODO: something more robust?
-            # elem_val is a sliced out sublist, recurse on each element
-            # therein and call obj.func (make_list, make_tuple) on result.
-            elem_val = instantiate_call(obj.func,
-                                        *[recurse(e) for e in elem_val])
-        else:
-            elem_val = recurse(elem_val)
-        try:
-            # bindings the value of this subexpression as
-            int(index_val)
-            bindings[p] = elem_val
-        except TypeError:
-            # TODO: is this even conceivably used?
-            bindings[p] = instantiate_call(p.func, elem_val, index_val)
-    else:  # assumes is_dict_like_node(obj) is True
-        assert obj.func == call_with_list_of_pos_args
-        assert all(is_tuple_node(node) and len(node.args) == 2
-                   for node in obj.args[1:])
-        # TODO: check length better when output-length annotation is supported.
-        keys, values = zip(*(node.args for node in obj.args[1:]))
-        # We could only evaluate as many keys as it takes to find the right
-        # one, but this might make what gets evaluated or not kind of hard
-        # to predict.
-        keys = [recurse(k) for k in keys]
-        try:
-            ind = keys.index(index_val)
-        except ValueError:
-            raise KeyError(index_val)
-        bindings[p] = recurse(values[ind])
-    return bindings[p]
+# Work items on the explicit stack used by `_evaluate` are tuples of
+# `(node, phase, data)`. Each node starts out in `_EXPAND`, which schedules
+# whatever it needs first; later phases pick up the results from `bindings`.
+_EXPAND = 0
+_CALL = 1
+_INDEX = 2
+_KEYS = 3
+_SELECT = 4
 
 
-def _evaluate(p, instantiate_call=None, bindings=None):
+def _evaluate(p, instantiate_call=None, bindings=None, cache=None):
     """
     Evaluate a nested tree of functools.partial objects,
     used for deferred evaluation.
@@ -794,6 +1065,12 @@ def _evaluate(p, instantiate_call=None, bindings=None):
     bindings : dict, optional
         A dictionary mapping `Node` objects to values to use
         in their stead. Used to cache objects already evaluated.
+    cache : object, optional
+        Its `prepare(p, bindings)` method returns a dictionary mapping
+        the `id()` of nodes whose results may be cached to keys. The
+        results of those nodes are looked up with `get(key)`, which
+        returns a `(found, value)` pair, before evaluating them, and
+        stored with `set(key, value)` after.
 
     Returns
     -------
@@ -801,14 +1078,18 @@ def _evaluate(p, instantiate_call=None, bindings=None):
         The result of evaluating `p` if `p` was a partial
         instance, or else `p` itself.
 
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
     Notes
     -----
-    For large graphs this recursive implementation may hit the
-    recursion limit and be kind of slow. TODO: write an
-    iterative version.
+    This walks the graph with an explicit stack rather than by
+    recursion, so the depth of the graph is not limited by the
+    interpreter's recursion limit. Every value computed, including
+    those of variable nodes, is stored in `bindings`.
     """
-    instantiate_call = ((lambda f, *args, **kwargs: f(*args, **kwargs))
-                        if instantiate_call is None else instantiate_call)
     bindings = {} if bindings is None else bindings
 
     # If we've encountered this exact partial node before,
@@ -820,27 +1101,110 @@ def _evaluate(p, instantiate_call=None, bindings=None):
         bindings[p] = p.value
         return bindings[p]
 
-    recurse = _partial(_evaluate, instantiate_call=instantiate_call,
-                       bindings=bindings)
-
-    # When evaluating an expression of the form
-    # `list(...)[item]`
-    # only evaluate the element(s) of the list that we need.
-    if p.func == operator.getitem and is_indexable(p):
-        return _handle_indexing(p, instantiate_call, bindings, recurse)
-    args = [recurse(arg) for arg in p.args]
-    kw = (dict((kw, recurse(val)) for kw, val in p.keywords.iteritems())
-          if p.keywords else {})
-
-    if is_variable_node(p):
-        assert 'name' in p.keywords
-        name = kw['name']
-        try:
-            return bindings[name]
-        except KeyError:
-            raise KeyError("variable with name '%s' not bound" % name)
-
-    # bindings the evaluated value (for subsequent calls that
-    # will look at this bindings dictionary) and return.
-    bindings[p] = instantiate_call(p.func, *args, **kw)
+    # Nodes that have been expanded but not yet computed. Running into
+    # one of these again while expanding means we are inside a cycle.
+    pending = set()
+    cache_keys = cache.prepare(p, bindings) if cache is not None else {}
+    getitem = operator.getitem
+    stack = [(p, _EXPAND, None)]
+    push = stack.append
+    pop = stack.pop
+    while stack:
+        node, phase, data = pop()
+        if phase == _EXPAND:
+            if node in bindings:
+                continue
+            if isinstance(node, Literal):
+                bindings[node] = node.value
+                continue
+            if node in pending:
+                raise ValueError("call graph contains a directed cycle")
+            if cache_keys and id(node) in cache_keys:
+                found, value = cache.get(cache_keys[id(node)])
+                if found:
+                    bindings[node] = value
+                    continue
+            pending.add(node)
+            # When evaluating an expression of the form
+            # `list(...)[item]`
+            # only evaluate the element(s) of the list that we need.
+            if node.func is getitem and is_indexable(node):
+                index = node._args[1]
+                push((node, _INDEX, None))
+                if index not in bindings:
+                    push((index, _EXPAND, None))
+                continue
+            push((node, _CALL, None))
+            children = (node._args + tuple(node._keywords.itervalues())
+                        if node._keywords else node._args)
+            # Pushed in reverse, so that they are evaluated left to right.
+            for child in reversed(children):
+                if child not in bindings:
+                    # Literals are resolved on the spot rather than
+                    # taking a trip through the stack.
+                    if isinstance(child, Literal):
+                        bindings[child] = child.value
+                    else:
+                        push((child, _EXPAND, None))
+        elif phase == _CALL:
+            args = [bindings[arg] for arg in node._args]
+            kw = (dict((k, bindings[v])
+                       for k, v in node._keywords.iteritems())
+                  if node._keywords else {})
+            if node.func is variable_node:
+                assert 'name' in node._keywords
+                name = kw['name']
+                try:
+                    bindings[node] = bindings[name]
+                except KeyError:
+                    raise KeyError("variable with name '%s' not bound" % name)
+            elif instantiate_call is None:
+                bindings[node] = node.func(*args, **kw)
+            else:
+                bindings[node] = instantiate_call(node.func, *args, **kw)
+            if cache_keys and id(node) in cache_keys:
+                cache.set(cache_keys[id(node)], bindings[node])
+            pending.discard(node)
+        elif phase == _INDEX:
+            # A tuple of element nodes if the index is a slice,
+            # otherwise a single element or value node.
+            branch = _select_branch(node, bindings[node._args[1]])
+            if branch is None:
+                obj = node._args[0]
+                assert obj.func is call_with_list_of_pos_args
+                assert all(is_tuple_node(n) and len(n.args) == 2
+                           for n in obj._args[1:])
+                # TODO: check length better when output-length annotation
+                # is supported.
+                keys = _branch_keys(node)
+                push((node, _KEYS, keys))
+                # We could only evaluate as many keys as it takes to find
+                # the right one, but this might make what gets evaluated or
+                # not kind of hard to predict.
+                for key in reversed(keys):
+                    if key not in bindings:
+                        push((key, _EXPAND, None))
+                continue
+            push((node, _SELECT, branch))
+            for elem in reversed(branch if isinstance(branch, tuple)
+                                 else (branch,)):
+                if elem not in bindings:
+                    push((elem, _EXPAND, None))
+        elif phase == _KEYS:
+            branch = _select_branch(node, bindings[node._args[1]],
+                                    [bindings[k] for k in data])
+            push((node, _SELECT, branch))
+            if branch not in bindings:
+                push((branch, _EXPAND, None))
+        else:  # phase == _SELECT
+            if isinstance(data, tuple):
+                # A sliced out sublist: call obj.func (make_list,
+                # make_tuple) on the evaluated elements.
+                func = node._args[0].func
+                elems = [bindings[e] for e in data]
+                bindings[node] = (func(*elems) if instantiate_call is None
+                                  else instantiate_call(func, *elems))
+            else:
+                bindings[node] = bindings[data]
+            pending.discard(node)
     return bindings[p]
@@ -0,0 +1,263 @@
+"""
+Compile-once evaluation plans for `PartialPlus` graphs.
+
+`evaluate` walks the graph and inspects every node each time it is
+called. When the same graph is evaluated many times with different
+variable bindings (e.g. in a hyperparameter search loop), it is cheaper
+to flatten the graph once into a table of integer slots and run that.
+"""
+import operator
+
+from .frozen import FrozenGraph
+from .partialplus import (Literal, is_indexable, is_sequence_node,
+                          is_variable_node, _select_branch, _branch_keys)
+
+# Opcodes for the slots of an `EvaluationPlan`.
+_CALL = 0
+_VARIABLE = 1
+_INDEX_SEQUENCE = 2
+_INDEX_DICT = 3
+
+
+class _Unset(object):
+    """Marker for slots whose value has not been computed yet."""
+
+
+def compile(root):
+    """
+    Compile a graph of `PartialPlus` objects into an `EvaluationPlan`.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+
+    Returns
+    -------
+    plan : EvaluationPlan
+        A plan that evaluates `root` when called with variable
+        bindings as keyword arguments.
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+    """
+    return EvaluationPlan(root)
+
+
+class EvaluationPlan(object):
+    """
+    A graph of `PartialPlus` objects, flattened into integer slots.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+        The root of the graph to compile, or the graph itself.
+
+    Notes
+    -----
+    Slots are the node IDs of the graph's `FrozenGraph`, so that every
+    node's inputs have lower slot numbers than the node itself. The
+    lazy indexing semantics of `evaluate` are kept: the elements of a
+    sequence or the values of a dict that are not selected by a
+    `getitem` node are never evaluated. To that end, each slot reached
+    through such a `getitem` node gets its own straight-line program
+    (the slots it needs that are not behind another lazy `getitem`),
+    built the first time it is selected.
+
+    The graph should not be modified after it has been compiled.
+    """
+    def __init__(self, root):
+        graph = root if isinstance(root, FrozenGraph) else FrozenGraph(root)
+        nodes = graph.nodes
+        slot = graph.id_of
+        self._nodes = nodes
+        self._slot = slot
+        self._initial = [_Unset] * len(nodes)
+        self._ops = [None] * len(nodes)
+        self._data = [None] * len(nodes)
+        # The slots each slot needs evaluated before it can be computed,
+        # not counting those only reached through lazy indexing.
+        self._eager = [()] * len(nodes)
+        for i, node in enumerate(nodes):
+            if isinstance(node, Literal):
+                self._initial[i] = node.value
+                continue
+            args = tuple(slot(a) for a in node.args)
+            if is_variable_node(node):
+                assert 'name' in node._keywords
+                name = node._keywords['name']
+                self._ops[i] = _VARIABLE
+                self._data[i] = slot(name)
+                self._eager[i] = (slot(name),)
+            elif node.func is operator.getitem and is_indexable(node):
+                obj, index = node.args
+                if is_sequence_node(obj):
+                    self._ops[i] = _INDEX_SEQUENCE
+                    self._data[i] = (node, args[1])
+                    self._eager[i] = (args[1],)
+                else:  # assumes is_dict_like_node(obj) is True
+                    keys = tuple(slot(k) for k in _branch_keys(node))
+                    self._ops[i] = _INDEX_DICT
+                    self._data[i] = (node, args[1], keys)
+                    self._eager[i] = (args[1],) + keys
+            else:
+                kwargs = tuple((k, slot(v))
+                               for k, v in node._keywords.iteritems())
+                self._ops[i] = _CALL
+                self._data[i] = (node.func, args, kwargs)
+                self._eager[i] = args + tuple(s for _, s in kwargs)
+        self._programs = {}
+        self._root = len(nodes) - 1
+        self._root_program = self._program(self._root)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    @property
+    def root(self):
+        """The root `Node` of the compiled graph."""
+        return self._nodes[self._root]
+
+    def _program(self, target):
+        """
+        Build (or retrieve) the straight-line program for a slot.
+
+        Parameters
+        ----------
+        target : int
+            The slot to be computed.
+
+        Returns
+        -------
+        program : tuple
+            The non-literal slots needed to compute `target`, not
+            counting those behind a lazy `getitem`, in an order in
+            which they can be computed.
+        """
+        if target in self._programs:
+            return self._programs[target]
+        eager = self._eager
+        initial = self._initial
+        # Depth-first post-order, visiting inputs left to right, so that
+        # calls happen in the same order as with `evaluate`.
+        program = []
+        reached = set([target])
+        stack = [(target, iter(eager[target]))]
+        while stack:
+            s, inputs = stack[-1]
+            for child in inputs:
+                if child not in reached:
+                    reached.add(child)
+                    stack.append((child, iter(eager[child])))
+                    break
+            else:
+                stack.pop()
+                if initial[s] is _Unset:
+                    program.append(s)
+        program = tuple(program)
+        self._programs[target] = program
+        return program
+
+    def __call__(self, **kwargs):
+        """
+        Evaluate the compiled graph.
+
+        Parameters
+        ----------
+        kwargs : dict
+            Values to bind to the variables in the graph, by name.
+
+        Returns
+        -------
+        value : object
+            The same value `evaluate(root, **kwargs)` would return.
+        """
+        return self.run(kwargs)
+
+    def run(self, bindings, instantiate_call=None):
+        """
+        Evaluate the compiled graph.
+
+        Parameters
+        ----------
+        bindings : dict
+            A dictionary mapping variable names to their values.
+        instantiate_call : callable, optional
+            Rather than call `p.func` directly, instead call
+            `instantiate_call(p.func, ...)`
+
+        Returns
+        -------
+        value : object
+            The same value `evaluate(root, **bindings)` would return.
+        """
+        values = self._initial[:]
+        ops = self._ops
+        data = self._data
+        # Each frame is a program and a position within it.
+        frames = [[self._root_program, 0]]
+        while frames:
+            frame = frames[-1]
+            program, pc = frame
+            if pc == len(program):
+                frames.pop()
+                continue
+            slot = program[pc]
+            if values[slot] is not _Unset:
+                frame[1] = pc + 1
+                continue
+            op = ops[slot]
+            if op == _CALL:
+                func, args, kwargs = data[slot]
+                args = [values[a] for a in args]
+                kwargs = (dict((k, values[v]) for k, v in kwargs)
+                          if kwargs else {})
+                if instantiate_call is None:
+                    values[slot] = func(*args, **kwargs)
+                else:
+                    values[slot] = instantiate_call(func, *args, **kwargs)
+            elif op == _VARIABLE:
+                name = values[data[slot]]
+                try:
+                    values[slot] = bindings[name]
+                except KeyError:
+                    raise KeyError("variable with name '%s' not bound" % name)
+            elif op == _INDEX_SEQUENCE:
+                node, index = data[slot]
+                branch = _select_branch(node, values[index])
+                if isinstance(branch, tuple):
+                    selected = [self._slot(e) for e in branch]
+                    missing = [e for e in selected if values[e] is _Unset]
+                    if not missing:
+                        func = node._args[0].func
+                        elems = [values[e] for e in selected]
+                        values[slot] = (func(*elems)
+                                        if instantiate_call is None
+                                        else instantiate_call(func, *elems))
+                else:
+                    selected = self._slot(branch)
+                    if values[selected] is not _Unset:
+                        missing = ()
+                        values[slot] = values[selected]
+                    else:
+                        missing = (selected,)
+                # Pushed last to first, so that they run first to last.
+                frames.extend([self._program(e), 0]
+                              for e in reversed(missing))
+                continue
+            else:  # op == _INDEX_DICT
+                node, index, keys = data[slot]
+                index_val = values[index]
+                branch = _select_branch(node, index_val)
+                if branch is None:
+                    branch = _select_branch(node, index_val,
+                                            [values[k] for k in keys])
+                selected = self._slot(branch)
+                if values[selected] is _Unset:
+                    frames.append([self._program(selected), 0])
+                else:
+                    values[slot] = values[selected]
+                continue
+            frame[1] = pc + 1
+        return values[self._root]
@@ -0,0 +1,274 @@
+"""
+Vectorized random sampling of search spaces.
+
+Rather than evaluating the graph once per draw, `sample` reads the
+metadata of every variable from a `ConditionalIndex` and draws the
+values of each variable for all samples with a single NumPy call. The
+choices made by the draws then determine, again column by column,
+which variables each sample actually uses.
+"""
+from itertools import izip
+
+from .conditional import ConditionalIndex, ALWAYS, NEVER
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _random_state(rng):
+    """`rng` itself, or a new `numpy.random.RandomState` seeded with it
+    if it is an int or `None`."""
+    if rng is None or isinstance(rng, (int, long)):
+        return numpy.random.RandomState(rng)
+    return rng
+
+
+def is_categorical(info):
+    """
+    Check whether a variable takes its values from a sequence.
+
+    Parameters
+    ----------
+    info : VariableInfo
+
+    Returns
+    -------
+    categorical : bool
+        `True` if its `value_type` is a list or tuple of values, or
+        `bool`.
+    """
+    return (isinstance(info.value_type, (list, tuple)) or
+            info.value_type is bool)
+
+
+def categories(info):
+    """
+    The values a categorical variable can take.
+
+    Parameters
+    ----------
+    info : VariableInfo
+
+    Returns
+    -------
+    values : list
+    """
+    if info.value_type is bool:
+        return [False, True]
+    return list(info.value_type)
+
+
+def _category_array(values):
+    """An array of the values of a categorical variable, of object dtype
+    unless they are all numbers of the same type."""
+    array = numpy.array(values)
+    if (array.ndim != 1 or array.dtype.kind not in 'biuf' or
+            len(set(type(value) for value in values)) != 1):
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+    return array
+
+
+def _draw(info, n, rng):
+    """
+    Draw `n` values of a variable.
+
+    Returns
+    -------
+    values : ndarray
+    codes : ndarray or None
+        For categorical variables, the positions of the values drawn
+        among `categories(info)`.
+    """
+    distribution = info.distribution
+    custom = (callable(distribution) or
+              callable(getattr(distribution, 'rvs', None)))
+    if is_categorical(info) and not custom:
+        values = categories(info)
+        if not values:
+            raise ValueError("variable '%s' has no values" % info.name)
+        p = None
+        if distribution is not None:
+            p = numpy.asarray(distribution, dtype=float)
+            p = p / p.sum()
+        codes = rng.choice(len(values), size=n, p=p)
+        return _category_array(values)[codes], codes
+    if callable(getattr(distribution, 'rvs', None)):
+        # e.g. a frozen scipy.stats distribution.
+        values = distribution.rvs(size=n, random_state=rng)
+        return numpy.asarray(values), None
+    if callable(distribution):
+        return numpy.asarray(distribution(rng, n)), None
+    if info.value_type not in (int, long, float):
+        raise ValueError("don't know how to sample variable '%s' of type %r"
+                         % (info.name, info.value_type))
+    low, high = info.minimum, info.maximum
+    if low is None or high is None:
+        raise ValueError("variable '%s' needs a minimum and a maximum, or "
+                         "a distribution, to be sampled" % info.name)
+    if info.value_type is float:
+        if info.log_scale:
+            return numpy.exp(rng.uniform(numpy.log(low), numpy.log(high),
+                                         size=n)), None
+        return rng.uniform(low, high, size=n), None
+    if info.log_scale:
+        # Uniform in log space over [low, high + 1), floored.
+        values = numpy.floor(numpy.exp(rng.uniform(
+            numpy.log(low), numpy.log(high + 1), size=n)))
+        return numpy.minimum(values, high).astype(numpy.int64), None
+    return rng.randint(low, high + 1, size=n).astype(numpy.int64), None
+
+
+class Samples(object):
+    """
+    Columns of values drawn for the variables of a search space.
+
+    Attributes
+    ----------
+    names : list
+        The sorted names of the variables.
+    values : dict
+        Maps each name to an array of `n` values. Values are drawn for
+        every sample, even where the variable is inactive, except for
+        variables that are never used, which get an array of `None`.
+    active : dict
+        Maps each name to a boolean array, true for the samples in
+        which the variable is used.
+    codes : dict
+        Maps the names of categorical variables to arrays of the
+        positions of their values among their categories.
+    """
+    def __init__(self, n, names, values, active, codes):
+        self.n = n
+        self.names = names
+        self.values = values
+        self.active = active
+        self.codes = codes
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, name):
+        """The values of a variable, as a masked array hiding the samples
+        in which it is inactive."""
+        return numpy.ma.masked_array(self.values[name],
+                                     mask=~self.active[name])
+
+    def assignments(self):
+        """
+        Convert to one assignment per sample.
+
+        Returns
+        -------
+        assignments : list
+            Dicts of the values of the active variables, by name, as
+            Python objects, suitable as keyword arguments of
+            `evaluate`.
+        """
+        rows = [{} for _ in xrange(self.n)]
+        for name in self.names:
+            rows_of = numpy.flatnonzero(self.active[name])
+            column = self.values[name][rows_of].tolist()
+            for i, value in izip(rows_of.tolist(), column):
+                rows[i][name] = value
+        return rows
+
+
+def _equals(info, key, values, codes):
+    """Which entries of a column of values of a variable equal `key`."""
+    if codes is not None:
+        table = numpy.array([value == key for value in categories(info)],
+                            dtype=bool)
+        return table[codes]
+    return numpy.asarray(values == key, dtype=bool)
+
+
+def _activity(index, n, values, codes):
+    """
+    Tell where variables are active from columns of their values.
+
+    Parameters
+    ----------
+    index : ConditionalIndex
+    n : int
+        The length of the columns.
+    values : dict
+        Arrays of values, by variable name.
+    codes : dict
+        Arrays of the positions of the values of categorical variables
+        among their categories, by variable name.
+
+    Returns
+    -------
+    active : dict
+        Boolean arrays, by variable name.
+    """
+    masks = {}
+    for info in index:
+        if info.conditions == ALWAYS:
+            active = numpy.ones(n, dtype=bool)
+        else:
+            active = numpy.zeros(n, dtype=bool)
+            for term in info.conditions:
+                holds = numpy.ones(n, dtype=bool)
+                for name, key in term:
+                    holds &= _equals(index[name], key, values[name],
+                                     codes.get(name))
+                active |= holds
+        masks[info.name] = active
+    return masks
+
+
+def sample(space, n, rng=None):
+    """
+    Draw random configurations of a search space.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+    n : int
+        The number of configurations.
+    rng : numpy.random.RandomState or int, optional
+        The random number generator, or a seed for one.
+
+    Returns
+    -------
+    samples : Samples
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not available.
+    ValueError
+        If a variable can't be sampled.
+
+    Notes
+    -----
+    Variables are drawn by calling their `distribution`, if it is an
+    object with an `rvs(size, random_state)` method such as a frozen
+    `scipy.stats` distribution, or a callable taking the random number
+    generator and `n`. Otherwise, categorical variables (those with a
+    sequence of values, or `bool`, as `value_type`) are drawn uniformly,
+    or with the probabilities given as their `distribution`, and
+    `float` and `int` variables are drawn uniformly between `minimum`
+    and `maximum` (inclusive for `int`), or log-uniformly if
+    `log_scale`.
+    """
+    if numpy is None:
+        raise ImportError("numpy is required for sampling")
+    index = ConditionalIndex.of(space)
+    rng = _random_state(rng)
+    values = {}
+    codes = {}
+    for info in index:
+        if info.conditions == NEVER:
+            # In branches that can't be selected; may not be sampleable.
+            values[info.name] = numpy.empty(n, dtype=object)
+            continue
+        values[info.name], code = _draw(info, n, rng)
+        if code is not None:
+            codes[info.name] = code
+    return Samples(n, index.names, values, _activity(index, n, values, codes),
+                   codes)
@@ -0,0 +1,429 @@
+"""
+A compact, versioned binary format for `PartialPlus` graphs.
+
+Layout (all integers little-endian)::
+
+    header    magic "SSPG", u16 version, u16 reserved, then u32 counts
+              of strings, literals, nodes, edges and keyword edges, and
+              u64 offset of the buffer section
+    strings   for each: u32 length, UTF-8 bytes (function references,
+              see `function_reference`, and keyword names)
+    refs      i32 per node: a string index for the function of a call
+              node, or ~i for a node holding literal i
+    nargs     i32 per node: number of positional arguments
+    indptr    i32 per node, plus one: CSR row pointers of the edges
+    indices   i32 per edge: node IDs of the inputs, positional first
+    kwnames   i32 per keyword edge: string index of the keyword
+    literals  for each: u8 encoding, u64 inline offset, u64 inline
+              length, u64 buffer offset, u64 buffer length
+    inline    u64 length, then pickled literal values
+    buffers   (64-byte aligned) large literal payloads
+
+Node IDs are those of `FrozenGraph`, so every node's inputs come before
+it, and a graph can be rebuilt in a single pass.
+"""
+from array import array
+import base64
+import cPickle as pickle
+import importlib
+import mmap as _mmap
+import struct
+import sys
+
+from .frozen import FrozenGraph
+from .partialplus import Literal, PartialPlus
+from .transforms import _literal_key
+
+MAGIC = 'SSPG'
+VERSION = 2
+
+_HEADER = struct.Struct('<4sHHIIIIIQ')
+_LITERAL = struct.Struct('<BQQQQ')
+_LENGTH = struct.Struct('<I')
+_BLOB_LENGTH = struct.Struct('<Q')
+_ALIGNMENT = 64
+
+# Prefix of function references holding a pickled callable, rather
+# than a name; not a valid start of a module name.
+_PICKLED = '!'
+
+# Ways a literal value can be stored.
+_INLINE_PICKLE = 0
+_BUFFER_PICKLE = 1
+_BUFFER_NDARRAY = 2
+
+assert array('i').itemsize == 4
+
+
+def _to_bytes(a):
+    """Little-endian bytes of an `array`."""
+    if sys.byteorder == 'big':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tostring()
+
+
+def _from_bytes(data, start, count):
+    """Read `count` little-endian int32s from `data` at `start`."""
+    a = array('i')
+    a.fromstring(data[start:start + 4 * count])
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a, start + 4 * count
+
+
+def qualified_name(f):
+    """
+    The name under which a function can be imported.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    name : str
+        Of the form `"module:name"`.
+
+    Raises
+    ------
+    ValueError
+        If `f` can't be found again by importing its module and
+        looking up its name (lambdas, nested functions, ...).
+    """
+    module = getattr(f, '__module__', None)
+    name = getattr(f, '__name__', None)
+    if module is None and name is not None and _is_ufunc(f):
+        # NumPy ufuncs have no __module__, but live in numpy.
+        module = 'numpy'
+    if module is None or name is None:
+        raise ValueError("can't find an importable name for %r" % (f,))
+    qualified = '%s:%s' % (module, name)
+    try:
+        found = resolve_name(qualified)
+    except (ImportError, AttributeError):
+        found = None
+    if found is not f:
+        raise ValueError("%r is not importable as %s" % (f, qualified))
+    return qualified
+
+
+def function_reference(f):
+    """
+    A string from which a function can be found again.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    reference : str
+        The `qualified_name` of `f` if it has one, otherwise `'!'`
+        followed by the base64 encoding of its pickle, for instance
+        for callable instances.
+
+    Raises
+    ------
+    ValueError
+        If `f` can neither be imported by name nor pickled (lambdas,
+        nested functions, ...).
+    """
+    try:
+        return qualified_name(f)
+    except ValueError:
+        pass
+    try:
+        return _PICKLED + base64.b64encode(pickle.dumps(f, 2))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        raise ValueError("%r can neither be imported by name nor "
+                         "pickled" % (f,))
+
+
+def resolve_reference(reference):
+    """
+    Find the function referred to by `function_reference`.
+
+    Parameters
+    ----------
+    reference : str
+
+    Returns
+    -------
+    f : callable
+    """
+    if reference.startswith(_PICKLED):
+        return pickle.loads(base64.b64decode(reference[len(_PICKLED):]))
+    return resolve_name(reference)
+
+
+def resolve_name(qualified):
+    """
+    Import the object named by `qualified_name`.
+
+    Parameters
+    ----------
+    qualified : str
+        Of the form `"module:attribute.path"`.
+
+    Returns
+    -------
+    obj : object
+    """
+    module, _, path = qualified.partition(':')
+    obj = importlib.import_module(module)
+    for attr in path.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _is_ufunc(f):
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(f, numpy.ufunc)
+
+
+def _is_ndarray(value):
+    numpy = sys.modules.get('numpy')
+    return (numpy is not None and type(value) is numpy.ndarray and
+            not value.dtype.hasobject)
+
+
+def dumps(root, buffer_threshold=65536):
+    """
+    Serialize a graph to a string.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+    buffer_threshold : int, optional
+        Literal values whose serialized size is at least this many
+        bytes are stored in the aligned buffer section at the end, as
+        are NumPy arrays.
+
+    Returns
+    -------
+    data : str
+
+    Raises
+    ------
+    ValueError
+        If a function in the graph can neither be found by its name
+        nor pickled, see `function_reference`.
+    """
+    graph = root if isinstance(root, FrozenGraph) else FrozenGraph(root)
+    strings = []
+    string_ids = {}
+
+    def intern(s):
+        if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(s)
+        return string_ids[s]
+
+    function_names = {}
+    literal_ids = {}
+    literal_values = []
+    refs = array('i')
+    nargs = array('i')
+    kwnames = array('i')
+    for node in graph.nodes:
+        if isinstance(node, Literal):
+            key = _literal_key(node.value)
+            if key not in literal_ids:
+                literal_ids[key] = len(literal_values)
+                literal_values.append(node.value)
+            refs.append(~literal_ids[key])
+            nargs.append(0)
+        else:
+            try:
+                name = function_names[node.func]
+            except (KeyError, TypeError):
+                name = function_names[node.func] = \
+                    function_reference(node.func)
+            refs.append(intern(name))
+            nargs.append(len(node._args))
+            kwnames.extend(intern(k) for k in node._keywords)
+
+    inline = []
+    inline_length = 0
+    buffers = []
+    buffers_length = 0
+    literals = []
+    for value in literal_values:
+        if _is_ndarray(value):
+            meta = pickle.dumps((value.dtype.str, value.shape), 2)
+            payload = value.tostring()
+            encoding = _BUFFER_NDARRAY
+        else:
+            meta = pickle.dumps(value, 2)
+            payload = None
+            encoding = _INLINE_PICKLE
+            if len(meta) >= buffer_threshold:
+                meta, payload, encoding = '', meta, _BUFFER_PICKLE
+        record = [encoding, inline_length, len(meta), 0, 0]
+        inline.append(meta)
+        inline_length += len(meta)
+        if payload is not None:
+            padding = -buffers_length % _ALIGNMENT
+            buffers.append('\0' * padding)
+            buffers_length += padding
+            record[3:] = buffers_length, len(payload)
+            buffers.append(payload)
+            buffers_length += len(payload)
+        literals.append(_LITERAL.pack(*record))
+
+    body = []
+    for s in strings:
+        encoded = s.encode('utf-8')
+        body.append(_LENGTH.pack(len(encoded)))
+        body.append(encoded)
+    indptr = array('i', graph.indptr)
+    indices = array('i', graph.indices)
+    body.extend([_to_bytes(refs), _to_bytes(nargs), _to_bytes(indptr),
+                 _to_bytes(indices), _to_bytes(kwnames)])
+    body.extend(literals)
+    body.append(_BLOB_LENGTH.pack(inline_length))
+    body.extend(inline)
+    length = _HEADER.size + sum(len(b) for b in body)
+    padding = -length % _ALIGNMENT
+    body.append('\0' * padding)
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(strings),
+                          len(literal_values), len(graph), len(indices),
+                          len(kwnames), length + padding)
+    return ''.join([header] + body + buffers)
+
+
+def dump(root, f, buffer_threshold=65536):
+    """
+    Serialize a graph to a file.
+
+    Parameters
+    ----------
+    root : Node or FrozenGraph
+    f : str or file-like object
+        A path, or a file opened for writing in binary mode.
+    buffer_threshold : int, optional
+        See `dumps`.
+    """
+    data = dumps(root, buffer_threshold=buffer_threshold)
+    if isinstance(f, basestring):
+        with open(f, 'wb') as f:
+            f.write(data)
+    else:
+        f.write(data)
+
+
+def loads(data):
+    """
+    Rebuild a graph serialized with `dumps`.
+
+    Parameters
+    ----------
+    data : str, buffer or mmap.mmap
+        The serialized graph. NumPy arrays stored in the buffer section
+        are views into `data`, without copying, if it supports the
+        buffer interface.
+
+    Returns
+    -------
+    root : Node
+
+    Raises
+    ------
+    ValueError
+        If `data` is not a serialized graph, or one written with a
+        newer version of the format.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("not a serialized graph: too short")
+    (magic, version, _, n_strings, n_literals, n_nodes, n_edges,
+     n_kwedges, buffers_offset) = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a serialized graph: bad magic number")
+    if version > VERSION:
+        raise ValueError("unsupported format version %d" % version)
+    pos = _HEADER.size
+    strings = []
+    for _ in xrange(n_strings):
+        (length,) = _LENGTH.unpack_from(data, pos)
+        pos += _LENGTH.size
+        strings.append(data[pos:pos + length].decode('utf-8'))
+        pos += length
+    refs, pos = _from_bytes(data, pos, n_nodes)
+    nargs, pos = _from_bytes(data, pos, n_nodes)
+    indptr, pos = _from_bytes(data, pos, n_nodes + 1)
+    indices, pos = _from_bytes(data, pos, n_edges)
+    kwnames, pos = _from_bytes(data, pos, n_kwedges)
+    records = []
+    for _ in xrange(n_literals):
+        records.append(_LITERAL.unpack_from(data, pos))
+        pos += _LITERAL.size
+    pos += _BLOB_LENGTH.size
+    values = []
+    for encoding, offset, length, buf_offset, buf_length in records:
+        meta = data[pos + offset:pos + offset + length]
+        start = buffers_offset + buf_offset
+        if encoding == _INLINE_PICKLE:
+            values.append(pickle.loads(meta))
+        elif encoding == _BUFFER_PICKLE:
+            values.append(pickle.loads(data[start:start + buf_length]))
+        elif encoding == _BUFFER_NDARRAY:
+            import numpy
+            dtype, shape = pickle.loads(meta)
+            dtype = numpy.dtype(dtype)
+            count = buf_length // dtype.itemsize if dtype.itemsize else 0
+            try:
+                flat = numpy.frombuffer(data, dtype=dtype, count=count,
+                                        offset=start)
+            except (TypeError, ValueError):
+                flat = numpy.fromstring(data[start:start + buf_length],
+                                        dtype=dtype)
+            values.append(flat.reshape(shape))
+        else:
+            raise ValueError("unknown literal encoding %d" % encoding)
+
+    functions = {}
+    nodes = []
+    kwedge = 0
+    for i in xrange(n_nodes):
+        ref = refs[i]
+        if ref < 0:
+            nodes.append(Literal(values[~ref]))
+            continue
+        if ref not in functions:
+            functions[ref] = resolve_reference(strings[ref])
+        start, stop = indptr[i], indptr[i + 1]
+        split = start + nargs[i]
+        args = [nodes[j] for j in indices[start:split]]
+        kwargs = {}
+        for j in indices[split:stop]:
+            kwargs[strings[kwnames[kwedge]]] = nodes[j]
+            kwedge += 1
+        nodes.append(PartialPlus(functions[ref], *args, **kwargs))
+    return nodes[-1]
+
+
+def load(f, mmap=False):
+    """
+    Rebuild a graph serialized with `dump`.
+
+    Parameters
+    ----------
+    f : str or file-like object
+        A path, or a file opened for reading in binary mode.
+    mmap : bool, optional
+        If `True`, memory-map the file instead of reading it, so that
+        NumPy arrays in the graph are backed by the file's pages (and
+        shared between processes loading the same file). Requires `f`
+        to be a path or a real file.
+
+    Returns
+    -------
+    root : Node
+    """
+    if isinstance(f, basestring):
+        with open(f, 'rb') as opened:
+            return load(opened, mmap=mmap)
+    if mmap:
+        return loads(_mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ))
+    return loads(f.read())
@@ -1,5 +1,7 @@
 from functools import wraps
 from nose import SkipTest
+from searchspaces.partialplus import partial, variable, choice
+from searchspaces.partialplus import as_partialplus
 
 
 def skip_if_no_module(name):
@@ -25,3 +27,40 @@ def skip_if_no_module(name):
             return f(*args, **kwargs)
         return wrapped
     return wrapper_maker
+
+
+def model_space(svm, tree, **others):
+    """
+    A search space choosing between an SVM and a tree model.
+
+    Parameters
+    ----------
+    svm, tree : object
+        What the `'model'` entry evaluates to when the variable
+        `'kind'` is `'svm'` or `'tree'`.
+    others
+        Other entries of the space.
+
+    Returns
+    -------
+    space : PartialPlus
+        A dict with `'model'` and the entries of `others`.
+    """
+    kind = variable('kind', value_type=['svm', 'tree'])
+    others['model'] = choice(kind, ('svm', svm), ('tree', tree))
+    return as_partialplus(others)
+
+
+def kernel_choice(degree, **kwargs):
+    """
+    A choice, by a variable `'kernel'`, between `'rbf'` and `'poly'`,
+    which evaluates to `str(degree)`.
+
+    Parameters
+    ----------
+    degree : object
+    kwargs
+        Passed on to `variable` for `'kernel'`.
+    """
+    kernel = variable('kernel', value_type=['rbf', 'poly'], **kwargs)
+    return choice(kernel, ('rbf', 'rbf'), ('poly', partial(str, degree)))
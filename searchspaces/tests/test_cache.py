@@ -0,0 +1,184 @@
+import os
+import shutil
+import tempfile
+from searchspaces.partialplus import partial, variable, choice, evaluate
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.cache import DiskCache, LRUCache, cacheable, is_cacheable
+from searchspaces.cache import estimate_size
+
+
+calls = []
+
+
+@cacheable
+def load_data(n, scale=1):
+    calls.append(n)
+    return [i * scale for i in range(n)]
+
+
+def with_cache_dir(f):
+    def wrapped():
+        directory = tempfile.mkdtemp()
+        try:
+            f(directory)
+        finally:
+            shutil.rmtree(directory)
+    wrapped.__name__ = f.__name__
+    wrapped.__doc__ = f.__doc__
+    return wrapped
+
+
+@with_cache_dir
+def test_disk_cache_reuses_results(directory):
+    """Test that cacheable results are reused between evaluations."""
+    del calls[:]
+    x = variable('x', value_type=[1, 2])
+    y = variable('y', value_type=float)
+    p = as_pp({'data': partial(load_data, 5, scale=x), 'y': y})
+    cache = DiskCache(directory)
+    assert evaluate(p, cache=cache, x=1, y=0.5) == {'data': range(5),
+                                                    'y': 0.5}
+    # `y` isn't an input of load_data, so doesn't change its key.
+    assert evaluate(p, cache=cache, x=1, y=1.5)['data'] == range(5)
+    assert calls == [5]
+    assert cache.hits == 1
+    assert evaluate(p, cache=cache, x=2, y=0.5)['data'] == range(0, 10, 2)
+    assert calls == [5, 5]
+    # A new cache object (or process) on the same directory.
+    q = as_pp({'data': partial(load_data, 5, scale=x), 'y': y})
+    assert evaluate(q, cache=DiskCache(directory), x=2, y=3)['data'] == \
+        range(0, 10, 2)
+    assert calls == [5, 5]
+    # Without a cache, nothing changes.
+    evaluate(p, x=1, y=0.5)
+    assert calls == [5, 5, 5]
+
+
+@with_cache_dir
+def test_disk_cache_unevaluated_branches(directory):
+    """Test that cacheable nodes in branches not taken, or depending
+    on unbound variables, are left alone."""
+    del calls[:]
+    x = variable('x', value_type=['a', 'b'])
+    p = choice(x, ('a', partial(load_data, 3)),
+               ('b', partial(load_data, variable('n', value_type=int))))
+    cache = DiskCache(directory)
+    assert evaluate(p, cache=cache, x='a') == range(3)
+    assert evaluate(p, cache=cache, x='a') == range(3)
+    assert calls == [3]
+    assert evaluate(p, cache=cache, x='b', n=2) == range(2)
+    assert calls == [3, 2]
+
+
+@with_cache_dir
+def test_cache_keys_ignore_inactive_variables(directory):
+    """Test that nodes above a choice are cached without the variables
+    of the branches not taken."""
+    k = variable('k', value_type=['a', 'b'])
+    n = variable('n', value_type=int)
+    p = partial(load_data, choice(k, ('a', 3), ('b', n)))
+    for cache in (DiskCache(directory), LRUCache()):
+        del calls[:]
+        assert evaluate(p, cache=cache, k='a') == range(3)
+        assert evaluate(p, cache=cache, k='a', n=5) == range(3)
+        assert evaluate(p, cache=cache, k='a', n=6) == range(3)
+        assert calls == [3]
+        assert evaluate(p, cache=cache, k='b', n=3) == range(3)
+        assert evaluate(p, cache=cache, k='b', n=3) == range(3)
+        assert calls == [3, 3]
+        assert cache.hits == 3
+
+
+@with_cache_dir
+def test_disk_cache_eviction(directory):
+    """Test that the least recently used results are evicted."""
+    cache = DiskCache(directory)
+    for i in range(4):
+        cache.set('key%d' % i, 'x' * 1000)
+        os.utime(cache._path('key%d' % i), (i, i))
+    assert cache.get('key0') == (True, 'x' * 1000)
+    assert cache.get('missing') == (False, None)
+    cache.evict(cache.size() - 1)
+    assert not cache.get('key1')[0]
+    assert cache.get('key0')[0] and cache.get('key3')[0]
+    cache.clear()
+    assert cache.size() == 0
+    assert [name for name in os.listdir(directory)] == []
+
+
+@with_cache_dir
+def test_disk_cache_unpicklable(directory):
+    """Test that unpicklable results are not stored."""
+    cache = DiskCache(directory)
+    cache.set('f', lambda: None)
+    assert cache.get('f') == (False, None)
+    assert os.listdir(directory) == []
+    assert is_cacheable(load_data)
+    assert not is_cacheable(float)
+
+
+def test_lru_cache_reuses_results():
+    """Test that LRUCache reuses results, keyed by the variables the
+    node depends on."""
+    del calls[:]
+    x = variable('x', value_type=[1, 2])
+    y = variable('y', value_type=float)
+    p = as_pp([partial(load_data, 3, scale=x), y])
+    cache = LRUCache()
+    assert evaluate(p, cache=cache, x=1, y=0.5) == [range(3), 0.5]
+    assert evaluate(p, cache=cache, x=1, y=1.5) == [range(3), 1.5]
+    assert calls == [3]
+    # True == 1, but isn't the same assignment.
+    evaluate(p, cache=cache, x=True, y=1.5)
+    assert calls == [3, 3]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 0)
+    assert len(cache) == 2
+    # A new graph doesn't share results.
+    q = as_pp([partial(load_data, 3, scale=x), y])
+    evaluate(q, cache=cache, x=1, y=0.5)
+    assert calls == [3, 3, 3]
+
+
+def test_lru_cache_predicate():
+    """Test that LRUCache only shares the results of cacheable
+    functions by default, and of others when its predicate says so."""
+    counted = []
+
+    def count(v):
+        counted.append(v)
+        return [v * 2]
+    x = variable('x', value_type=int)
+    p = as_pp({'a': partial(count, x), 'b': partial(load_data, 2)})
+    cache = LRUCache(max_entries=10)
+    first = evaluate(p, cache=cache, x=3)
+    first['a'].append(99)
+    assert evaluate(p, cache=cache, x=3) == {'a': [6], 'b': range(2)}
+    assert counted == [3, 3]
+    assert len(cache) == 1
+    cache = LRUCache(predicate=lambda node: (
+        getattr(node, 'func', None) is count))
+    assert evaluate(p, cache=cache, x=3) == evaluate(p, cache=cache, x=3)
+    assert counted == [3, 3, 3]
+
+
+def test_lru_cache_eviction():
+    """Test LRU eviction by entry count and by size."""
+    cache = LRUCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.evictions == 1
+    cache = LRUCache(max_bytes=100, sizeof=len)
+    cache.set('a', 'x' * 60)
+    cache.set('b', 'x' * 30)
+    cache.set('c', 'x' * 30)
+    assert len(cache) == 2 and cache.nbytes == 60
+    assert not cache.get('a')[0]
+    cache.set('d', 'x' * 1000)
+    assert len(cache) == 2 and not cache.get('d')[0]
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+    assert estimate_size(['abc', 'abc']) > estimate_size([])
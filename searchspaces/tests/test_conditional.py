@@ -0,0 +1,110 @@
+from searchspaces.partialplus import partial, variable, choice
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.conditional import ConditionalIndex, ALWAYS, NEVER
+from searchspaces.test_utils import model_space, kernel_choice
+
+
+def test_conditions():
+    """Test the conditions and metadata of variables."""
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3,
+                 log_scale=True)
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=int, minimum=1, maximum=10,
+                     default=3, note='max depth')
+    lr = variable('lr', value_type=float, minimum=0.01, maximum=1.0)
+    index = ConditionalIndex(model_space(
+        {'C': c, 'kernel': kernel_choice(degree)}, depth, lr=lr,
+        unused=as_pp([depth, lr])[1]))
+    assert index.names == ['C', 'degree', 'depth', 'kernel', 'kind', 'lr']
+    assert index.selectors == ['kernel', 'kind']
+    assert index['kind'].conditions == ALWAYS
+    assert not index['lr'].conditional
+    assert index['C'].conditions == frozenset([frozenset([('kind', 'svm')])])
+    assert index['degree'].conditions == frozenset(
+        [frozenset([('kind', 'svm'), ('kernel', 'poly')])])
+    assert index['degree'].selectors == frozenset(['kind', 'kernel'])
+    assert index['depth'].conditions == frozenset(
+        [frozenset([('kind', 'tree')])])
+    assert index['C'].log_scale and index['C'].minimum == 1e-3
+    assert index['kernel'].value_type == ['rbf', 'poly']
+    assert index['depth'].default == 3
+    assert index['depth'].kwargs == {'note': 'max depth'}
+    assert [v.name for v in index] == index.names
+
+
+def test_active():
+    """Test finding the variables active under partial assignments."""
+    c = variable('C', value_type=float)
+    degree = variable('degree', value_type=int)
+    depth = variable('depth', value_type=int)
+    index = ConditionalIndex(model_space(
+        {'C': c, 'kernel': kernel_choice(degree)}, depth,
+        lr=variable('lr', value_type=float)))
+    assert index.active({}) == ['kind', 'lr']
+    assert index.active({'kind': 'tree'}) == ['depth', 'kind', 'lr']
+    assert index.active({'kind': 'svm'}) == ['C', 'kernel', 'kind', 'lr']
+    assert index.active({'kind': 'svm', 'kernel': 'poly'}) == \
+        ['C', 'degree', 'kernel', 'kind', 'lr']
+    # kernel is irrelevant for trees.
+    assert index.active({'kind': 'tree', 'kernel': 'poly'}) == \
+        ['depth', 'kind', 'lr']
+
+
+def test_sequence_and_shared_conditions():
+    """Test selections from lists, variables used in several branches,
+    and branches that are never selected."""
+    i = variable('i', value_type=[0, 1, 2])
+    x = variable('x', value_type=float)
+    y = variable('y', value_type=float)
+    z = variable('z', value_type=float)
+    p = as_pp([as_pp([x, y, partial(float, x)])[i], as_pp([z, y])[0]])
+    index = ConditionalIndex(p)
+    assert index['x'].conditions == frozenset([frozenset([('i', 0)]),
+                                               frozenset([('i', 2)])])
+    assert index['y'].conditions == frozenset([frozenset([('i', 1)])])
+    assert index['z'].conditions == ALWAYS
+    assert index.active({'i': 2}) == ['i', 'x', 'z']
+    # The same selector nested in itself.
+    q = choice(i, (0, choice(i, (0, x), (1, y))), (1, z))
+    index = ConditionalIndex(q)
+    assert index['y'].conditions == NEVER
+    assert index['x'].conditions == frozenset([frozenset([('i', 0)])])
+    assert index.active({'i': 1}) == ['i', 'z']
+
+
+def test_negative_positions():
+    """Test that elements of a sequence are also selected by negative
+    positions, and conservatively by variables of unknown type."""
+    x = variable('x', value_type=float)
+    y = variable('y', value_type=float)
+    i = variable('i', value_type=int)
+    index = ConditionalIndex(as_pp([x, y])[i])
+    assert index['y'].conditions == frozenset([frozenset([('i', 1)]),
+                                               frozenset([('i', -1)])])
+    assert index.active({'i': -1, 'y': 1.0}) == ['i', 'y']
+    assert index.active({'i': -2}) == ['i', 'x']
+    i = variable('i', value_type=[-1, 0])
+    index = ConditionalIndex(as_pp([x, y])[i])
+    assert index['x'].conditions == frozenset([frozenset([('i', 0)])])
+    assert index['y'].conditions == frozenset([frozenset([('i', -1)])])
+    i = variable('i', value_type=[0, slice(1, None)])
+    index = ConditionalIndex(as_pp([x, y])[i])
+    assert index.active({'i': slice(1, None)}) == ['i', 'x', 'y']
+
+
+def test_unknown_selections():
+    """Test that branches selected by expressions are conservatively
+    taken to be active."""
+    i = variable('i', value_type=int)
+    x = variable('x', value_type=float)
+    y = variable('y', value_type=float)
+    index = ConditionalIndex(as_pp([x, y])[partial(abs, i)])
+    assert index['x'].conditions == ALWAYS
+    assert index.active({}) == ['i', 'x', 'y']
+    raised = False
+    try:
+        ConditionalIndex(variable('a', value_type=float,
+                                  minimum=variable('b', value_type=float)))
+    except ValueError:
+        raised = True
+    assert raised
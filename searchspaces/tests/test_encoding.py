@@ -0,0 +1,65 @@
+from searchspaces.partialplus import variable
+from searchspaces.encoding import Codec
+from searchspaces.sampling import sample
+from searchspaces.test_utils import skip_if_no_module, model_space
+
+
+@skip_if_no_module('numpy')
+def test_encode():
+    """Test encoding assignments as arrays."""
+    import numpy
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3,
+                 log_scale=True)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100)
+    p = model_space(c, depth, lr=variable('lr', value_type=float,
+                                          minimum=0., maximum=1.))
+    codec = Codec(p)
+    assert codec.names == ['C', 'depth', 'kind', 'lr']
+    assert numpy.allclose(codec.bounds, [[numpy.log(1e-3), numpy.log(1e3)],
+                                         [1, 100], [0, 1], [0, 1]])
+    X, mask = codec.encode([{'kind': 'svm', 'C': 10., 'lr': 0.5},
+                            {'kind': 'tree', 'depth': 3, 'lr': 0.1,
+                             'C': 5.}])
+    assert X.shape == mask.shape == (2, 4)
+    assert mask.tolist() == [[True, False, True, True],
+                             [False, True, True, True]]
+    assert numpy.allclose(X, [[numpy.log(10.), 0, 0, 0.5],
+                              [0, 3, 1, 0.1]])
+    for bad in ({'kind': 'svm', 'lr': 0.5},
+                {'kind': 'forest', 'lr': 0.5, 'depth': 3}):
+        raised = False
+        try:
+            codec.encode([bad])
+        except ValueError:
+            raised = True
+        assert raised
+
+
+@skip_if_no_module('numpy')
+def test_round_trip():
+    """Test decoding encoded samples and assignments."""
+    import numpy
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3,
+                 log_scale=True)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100)
+    p = model_space(c, depth, lr=variable('lr', value_type=float,
+                                          minimum=0., maximum=1.))
+    codec = Codec(p)
+    samples = sample(p, 1000, rng=0)
+    assignments = samples.assignments()
+    X, mask = codec.encode(samples)
+    Y, mask2 = codec.encode(assignments)
+    assert numpy.allclose(X, Y) and (mask == mask2).all()
+    decoded = codec.decode(X)
+    assert [sorted(a) for a in decoded] == [sorted(a) for a in assignments]
+    for a, b in zip(decoded, assignments):
+        assert a['kind'] == b['kind']
+        if 'C' in a:
+            assert numpy.allclose(a['C'], b['C'])
+        else:
+            assert a['depth'] == b['depth']
+            assert isinstance(a['depth'], int)
+    assert codec.decode(X, mask) == decoded
+    # Values proposed by a surrogate are rounded and clipped.
+    assert codec.decode([[0., 2.6, 7.3, 0.5]]) == [{'kind': 'tree',
+                                                    'depth': 3, 'lr': 0.5}]
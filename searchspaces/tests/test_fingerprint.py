@@ -0,0 +1,116 @@
+import operator
+import os
+import subprocess
+import sys
+from searchspaces.partialplus import partial, variable, choice, Literal
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.fingerprint import fingerprint, graph_fingerprints
+from searchspaces.fingerprint import encode_literal
+from searchspaces.test_utils import skip_if_no_module
+
+
+def make_space():
+    x = variable('x', value_type=['a', 'b'])
+    return as_pp({'c': choice(x, ('a', [1, 2.5]), ('b', None)),
+                  'd': partial(operator.add, x, u'y'), 'e': (True, {3: 4})})
+
+
+def test_fingerprint_structural():
+    """Test that fingerprints depend on structure, not identity."""
+    assert fingerprint(make_space()) == fingerprint(make_space())
+    assert fingerprint(make_space()) != fingerprint(make_space().args[1])
+    # Same values of different types.
+    prints = set(fingerprint(Literal(v)) for v in (1, 1.0, True, '1', u'1',
+                                                   0.0, -0.0, (1,), [1]))
+    assert len(prints) == 9
+    assert (fingerprint(partial(float, x=Literal(1))) !=
+            fingerprint(partial(float, y=Literal(1))))
+    assert (fingerprint(partial(int, Literal(1))) !=
+            fingerprint(partial(float, Literal(1))))
+    assert (fingerprint(as_pp([1, 2])) != fingerprint(as_pp([2, 1])))
+    assert encode_literal({1: 2, 3: 4}) == encode_literal({3: 4, 1: 2})
+
+
+def test_fingerprint_stable_across_processes():
+    """Test that fingerprints are the same in a new process."""
+    code = ('import operator\n'
+            'from searchspaces.partialplus import partial, variable\n'
+            'from searchspaces.partialplus import as_partialplus as as_pp\n'
+            'from searchspaces.fingerprint import fingerprint\n'
+            'x = variable("x", value_type=float)\n'
+            'p = as_pp({"a": partial(operator.mul, x, 2.5),\n'
+            '           "b": (1, u"z"), "c": None})\n'
+            'print fingerprint(p)\n')
+    root = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=root, PYTHONHASHSEED='random')
+    outputs = set(subprocess.check_output([sys.executable, '-c', code],
+                                          env=env).strip()
+                  for _ in xrange(2))
+    assert len(outputs) == 1
+
+
+def test_fingerprint_shared_subgraphs():
+    """Test that shared subgraphs are hashed once, even without a
+    memo."""
+    class Opaque(object):
+        pass
+    hashed = []
+
+    def hasher(value):
+        hashed.append(value)
+        return 'opaque'
+    p = Literal(Opaque())
+    for _ in range(40):
+        p = partial(operator.add, p, p)
+    fingerprint(p, literal_hasher=hasher)
+    assert len(hashed) == 1
+
+
+def test_graph_fingerprints_memo():
+    """Test fingerprinting whole graphs and reusing a memo."""
+    p = make_space()
+    prints = graph_fingerprints(p)
+    assert prints[-1] == fingerprint(p)
+    memo = {}
+    fingerprint(p.args[2], memo=memo)
+    size = len(memo)
+    assert fingerprint(p, memo=memo) == prints[-1]
+    assert len(memo) == len(prints) > size
+
+
+def test_unencodable_literal():
+    """Test that unencodable literals raise TypeError, unless a
+    hasher is given."""
+    class Opaque(object):
+        pass
+    raised = False
+    try:
+        fingerprint(Literal(Opaque()))
+    except TypeError:
+        raised = True
+    assert raised
+    p = Literal(Opaque())
+    assert (fingerprint(p, literal_hasher=lambda v: 'opaque') ==
+            fingerprint(Literal(Opaque()), literal_hasher=lambda v: 'opaque'))
+
+
+@skip_if_no_module('numpy')
+def test_fingerprint_numpy():
+    """Test fingerprinting NumPy array literals."""
+    import numpy
+    a = numpy.arange(6)
+    assert fingerprint(Literal(a)) == fingerprint(Literal(a.copy()))
+    assert fingerprint(Literal(a)) != fingerprint(Literal(a.reshape(2, 3)))
+    assert fingerprint(Literal(a)) != fingerprint(Literal(a + 1))
+
+
+@skip_if_no_module('numpy')
+def test_fingerprint_ufuncs():
+    """Test fingerprinting nodes applying NumPy ufuncs."""
+    import numpy
+    x = partial(float, variable('x', value_type=float))
+    assert (fingerprint(partial(numpy.exp, x)) ==
+            fingerprint(partial(numpy.exp, x)))
+    assert (fingerprint(partial(numpy.exp, x)) !=
+            fingerprint(partial(numpy.log, x)))
@@ -0,0 +1,103 @@
+import operator
+from searchspaces.partialplus import partial, variable, choice
+from searchspaces.partialplus import depth_first_traversal
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.frozen import FrozenGraph, DependencyIndex
+from searchspaces.test_utils import skip_if_no_module
+
+
+def test_frozen_graph_structure():
+    """Test node IDs and edges of a FrozenGraph."""
+    p1 = partial(float, 5)
+    p2 = p1 + p1
+    p3 = partial(operator.truediv, p1, p2)
+    graph = FrozenGraph(p3)
+    assert len(graph) == 4
+    assert graph.root is p3
+    assert graph.root_id == 3
+    assert p1 in graph
+    assert partial(float, 5) not in graph
+    assert graph.nodes[graph.id_of(p2)] is p2
+    # Inputs always have lower IDs.
+    for i in xrange(len(graph)):
+        assert all(c < i for c in graph.children(i))
+    assert list(graph.children(graph.id_of(p2))) == [graph.id_of(p1)] * 2
+    assert (sorted(graph.parents(graph.id_of(p1))) ==
+            sorted([graph.id_of(p2)] * 2 + [graph.id_of(p3)]))
+    assert list(graph.parents(graph.root_id)) == []
+    assert list(graph.topological_order()) == [3, 2, 1, 0]
+    assert list(graph.topological_order(reverse=True)) == [0, 1, 2, 3]
+
+
+def test_frozen_graph_depth():
+    """Test longest-path depths."""
+    p1 = partial(float, 5)
+    p2 = p1 + 1
+    p3 = p1 * p2
+    graph = FrozenGraph(p3)
+    assert graph.depth[graph.id_of(p3)] == 0
+    assert graph.depth[graph.id_of(p2)] == 1
+    assert graph.depth[graph.id_of(p1)] == 2
+    assert graph.depth[graph.id_of(p1.args[0])] == 3
+
+
+def test_frozen_graph_dependencies():
+    """Test per-node variable dependencies."""
+    x = variable('x', value_type=int)
+    y = variable('y', value_type=float)
+    a = x + 1
+    b = partial(float, y) * a
+    p = as_pp([b, partial(int, '3'), choice(y, (1, x), (2, 4))])
+    graph = FrozenGraph(p)
+    assert graph.variables == ['x', 'y']
+    assert graph.dependencies(graph.id_of(a)) == frozenset(['x'])
+    assert graph.dependencies(graph.id_of(b)) == frozenset(['x', 'y'])
+    assert graph.dependencies(graph.id_of(p.args[1])) == frozenset()
+    assert graph.dependencies(graph.root_id) == frozenset(['x', 'y'])
+
+
+def test_dependency_index():
+    """Test bitset queries of a DependencyIndex."""
+    x = variable('x', value_type=int)
+    y = variable('y', value_type=float)
+    a = x + 1
+    b = partial(float, y) * 2
+    c = partial(int, '3')
+    p = as_pp([a, b, c, variable('x', value_type=int)])
+    index = DependencyIndex(p)
+    graph = index.graph
+    assert index.names == ['x', 'y']
+    assert index.masks[graph.id_of(a)] == 1
+    assert index.masks[graph.id_of(b)] == 2
+    assert index.masks[graph.root_id] == 3
+    assert index.mask(['y', 'z']) == 2
+    assert index.variables_of(graph.id_of(c)) == frozenset()
+    affected = index.affected_by('x')
+    assert affected == sorted(affected)
+    assert (set(graph.nodes[i] for i in affected) ==
+            set([x, a, p.args[3], p]))
+    assert index.affected_by('z') == []
+    assert len(index.affected_by('x', 'y')) == 7
+    assert graph.dependency_index is graph.dependency_index
+
+
+def test_frozen_graph_large():
+    """Test that freezing handles graphs deeper than the recursion limit."""
+    p = partial(float, 0)
+    for i in xrange(5000):
+        p = p + i
+    graph = FrozenGraph(p)
+    assert len(graph) == len(list(depth_first_traversal(p)))
+    assert max(graph.depth) == 5001
+
+
+@skip_if_no_module('numpy')
+def test_frozen_graph_numpy_arrays():
+    """Test NumPy views of the CSR arrays."""
+    p1 = partial(float, 5)
+    graph = FrozenGraph(p1 + p1)
+    arrays = graph.numpy_arrays()
+    assert list(arrays['indptr']) == list(graph.indptr)
+    assert list(arrays['indices']) == list(graph.indices)
+    assert list(arrays['parent_indices']) == list(graph.parent_csr[1])
+    assert list(arrays['depth']) == list(graph.depth)
@@ -0,0 +1,91 @@
+from searchspaces.partialplus import variable, choice, evaluate
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.conditional import VariableInfo
+from searchspaces.grid import Grid, grid_size, domain
+from searchspaces.test_utils import model_space, kernel_choice
+
+
+def key(configuration):
+    return tuple(sorted(configuration.items()))
+
+
+def test_grid_size():
+    """Test counting configurations without enumerating them."""
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=range(1, 11))
+    p = model_space({'kernel': kernel_choice(degree)}, depth,
+                    opt=variable('opt', value_type=['a', 'b', 'c', 'a']))
+    # (rbf + 4 poly degrees + 10 depths) x 3 optimizers.
+    assert grid_size(p) == 45
+    wide = as_pp([choice(variable('c%d' % i, value_type=[0, 1]),
+                         (0, variable('x%d' % i, value_type=range(10))),
+                         (1, 0))
+                  for i in range(40)])
+    assert grid_size(wide) == 11 ** 40
+    raised = False
+    try:
+        grid_size(variable('f', value_type=float))
+    except ValueError:
+        raised = True
+    assert raised
+
+
+def test_domain():
+    """Test that repeated values are dropped, hashable or not."""
+    info = VariableInfo('v', value_type=['a', 1, True, [2], 'a', [2], 1.0])
+    assert domain(info) == ['a', 1, [2]]
+    info = VariableInfo('v', value_type=int, minimum=3, maximum=5)
+    assert list(domain(info)) == [3, 4, 5]
+
+
+def test_grid_configurations():
+    """Test that configurations are distinct, complete and evaluate."""
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=range(1, 11))
+    p = model_space({'kernel': kernel_choice(degree)}, depth,
+                    opt=variable('opt', value_type=['a', 'b', 'c', 'a']))
+    grid = Grid(p)
+    configurations = list(grid)
+    assert len(configurations) == grid.size == 45
+    assert len(set(key(c) for c in configurations)) == 45
+    for configuration in configurations:
+        value = evaluate(p, **configuration)
+        if configuration['kind'] == 'tree':
+            assert sorted(configuration) == ['depth', 'kind', 'opt']
+            assert value['model'] == configuration['depth']
+        elif configuration['kernel'] == 'poly':
+            assert value['model']['kernel'] == str(configuration['degree'])
+        else:
+            assert sorted(configuration) == ['kernel', 'kind', 'opt']
+    assert grid[-1] == configurations[-1]
+    raised = False
+    try:
+        grid[45]
+    except IndexError:
+        raised = True
+    assert raised
+
+
+def test_grid_sharding():
+    """Test splitting a grid between workers."""
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=range(1, 11))
+    p = model_space({'kernel': kernel_choice(degree)}, depth,
+                    opt=variable('opt', value_type=['a', 'b', 'c', 'a']))
+    grid = Grid(p)
+    everything = [key(c) for c in grid]
+    blocks = []
+    for k in range(4):
+        blocks.extend(key(c) for c in grid.iterate(skip=k * 12, take=12))
+    assert blocks == everything
+    interleaved = []
+    for k in range(4):
+        interleaved.extend(key(c) for c in grid.iterate(skip=k, step=4))
+    assert sorted(interleaved) == sorted(everything)
+    assert list(grid.iterate(skip=100)) == []
+    wide = Grid(as_pp([variable('x%d' % i, value_type=range(10))
+                       for i in range(30)]))
+    last = list(wide.iterate(skip=wide.size - 2))
+    assert last[-1] == dict(('x%d' % i, 9) for i in range(30))
+    # Names are sorted as strings, so x9 varies fastest.
+    assert last[0]['x9'] == 8
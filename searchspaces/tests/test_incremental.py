@@ -0,0 +1,68 @@
+from searchspaces.partialplus import partial, variable, choice, evaluate
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.incremental import IncrementalEvaluator
+
+
+calls = []
+
+
+def record(name, *args):
+    calls.append(name)
+    return (name,) + args
+
+
+def make_space():
+    x = variable('x', value_type=int)
+    y = variable('y', value_type=float)
+    z = variable('z', value_type=['a', 'b'])
+    return as_pp({'x': partial(record, 'fx', x),
+                  'y': partial(record, 'fy', y),
+                  'z': choice(z, ('a', partial(record, 'fa', x)),
+                              ('b', partial(record, 'fb', y)))})
+
+
+def test_incremental_recomputes_affected():
+    """Test that only nodes depending on changed variables are
+    recomputed."""
+    del calls[:]
+    p = make_space()
+    ev = IncrementalEvaluator(p)
+    assert ev(x=1, y=0.5, z='a') == evaluate(p, x=1, y=0.5, z='a')
+    del calls[:]
+    ev(x=1, y=0.5, z='a')
+    assert calls == []
+    del calls[:]
+    assert ev(x=2, y=0.5, z='a') == {'x': ('fx', 2), 'y': ('fy', 0.5),
+                                     'z': ('fa', 2)}
+    assert sorted(calls) == ['fa', 'fx']
+    del calls[:]
+    # Flipping the choice evaluates the new branch only.
+    assert ev(x=2, y=0.5, z='b')['z'] == ('fb', 0.5)
+    assert calls == ['fb']
+    del calls[:]
+    # ... and flipping back reuses the old one.
+    assert ev(x=2, y=0.5, z='a')['z'] == ('fa', 2)
+    assert calls == []
+
+
+def test_incremental_types_and_errors():
+    """Test that values of a different type count as changes, and that
+    errors leave the evaluator usable."""
+    del calls[:]
+    ev = IncrementalEvaluator(make_space())
+    ev(x=1, y=0.5, z='a')
+    del calls[:]
+    assert ev(x=True, y=0.5, z='a')['x'][1] is True
+    assert sorted(calls) == ['fa', 'fx']
+    assert ev.invalidated > 0
+    raised = False
+    try:
+        ev(y=0.5, z='a')
+    except KeyError:
+        raised = True
+    assert raised
+    assert ev(x=3, y=0.5, z='a')['z'] == ('fa', 3)
+    ev.reset()
+    del calls[:]
+    ev(x=3, y=0.5, z='a')
+    assert sorted(calls) == ['fa', 'fx', 'fy']
@@ -0,0 +1,263 @@
+import threading
+import time
+from searchspaces.partialplus import partial, variable, choice, evaluate
+from searchspaces.partialplus import PartialPlus, Literal
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.parallel import evaluate_many, evaluate_async
+from searchspaces.test_utils import skip_if_no_module
+
+
+calls = []
+
+
+def slow(name, delay=0.05):
+    time.sleep(delay)
+    calls.append(name)
+    return name
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def concat(*args):
+    return ''.join(args)
+
+
+@skip_if_no_module('concurrent.futures')
+def test_parallel_matches_sequential():
+    """Test that parallel evaluation gives the same results, and only
+    evaluates selected branches."""
+    from concurrent.futures import ThreadPoolExecutor
+    del calls[:]
+    x = variable('x', value_type=['a', 'b'])
+    shared = partial(slow, 's')
+    p = as_pp({'c': choice(x, ('a', partial(concat, shared, 'A')),
+                           ('b', partial(slow, 'b'))),
+               'l': [partial(slow, 'l0'), partial(slow, 'l1')][1],
+               'd': {'k': partial(concat, shared, shared)}['k']})
+    with ThreadPoolExecutor(4) as executor:
+        for value in ('a', 'b'):
+            del calls[:]
+            assert (evaluate(p, executor=executor, x=value) ==
+                    evaluate(p, x=value))
+            assert 'l0' not in calls
+            assert ('b' in calls) == (value == 'b')
+        assert evaluate(Literal(3), executor=executor) == 3
+
+
+@skip_if_no_module('concurrent.futures')
+def test_parallel_runs_concurrently():
+    """Test that independent nodes run at the same time."""
+    from concurrent.futures import ThreadPoolExecutor
+    p = as_pp([partial(slow, str(i), delay=0.2) for i in range(8)])
+    with ThreadPoolExecutor(8) as executor:
+        start = time.time()
+        assert evaluate(p, executor=executor) == [str(i) for i in range(8)]
+        assert time.time() - start < 1.
+
+
+@skip_if_no_module('concurrent.futures')
+def test_parallel_first_exception_cancels():
+    """Test that the first exception is raised, and pending work is
+    cancelled."""
+    from concurrent.futures import ThreadPoolExecutor
+    del calls[:]
+    p = as_pp([partial(fail, 'boom')] +
+              [partial(slow, str(i), delay=0.05) for i in range(20)])
+    with ThreadPoolExecutor(1) as executor:
+        raised = False
+        try:
+            evaluate(p, executor=executor)
+        except ValueError as e:
+            raised = str(e) == 'boom'
+        assert raised
+    assert len(calls) < 20
+
+
+@skip_if_no_module('concurrent.futures')
+def test_parallel_errors():
+    """Test unbound variables and cycles."""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(2) as executor:
+        raised = False
+        try:
+            evaluate(as_pp([variable('x', value_type=int)]),
+                     executor=executor)
+        except KeyError:
+            raised = True
+        assert raised
+        p = PartialPlus(concat, Literal('a'))
+        q = PartialPlus(concat, p)
+        p.append_arg(q)
+        raised = False
+        try:
+            evaluate(q, executor=executor)
+        except ValueError:
+            raised = True
+        assert raised
+
+
+def divide(a, b):
+    return a / b
+
+
+def test_evaluate_many():
+    """Test evaluating many assignments on worker processes."""
+    x = variable('x', value_type=int)
+    p = as_pp({'q': partial(divide, 12, x), 'x': x})
+    assignments = [{'x': i} for i in (1, 2, 0, 3, 4, 6)]
+    results = list(evaluate_many(p, assignments, processes=2, chunksize=2,
+                                 max_pending=1))
+    assert [r.index for r in results] == range(6)
+    assert [r.assignment for r in results] == assignments
+    assert [r.value['q'] for r in results if r.ok] == [12, 6, 4, 3, 2]
+    assert isinstance(results[2].error, ZeroDivisionError)
+    assert 'ZeroDivisionError' in results[2].traceback
+    unordered = list(evaluate_many(p, iter(assignments), processes=2,
+                                   ordered=False))
+    assert (sorted(r.index for r in unordered) == range(6))
+    assert all(r.value['x'] == r.assignment['x'] for r in unordered if r.ok)
+
+
+class TwoArgError(Exception):
+    """Pickles, but can't be unpickled."""
+    def __init__(self, a, b):
+        super(TwoArgError, self).__init__('%s %s' % (a, b))
+
+
+def raise_two_arg_error(x):
+    if x == 0:
+        raise TwoArgError('bad', x)
+    return x
+
+
+def test_evaluate_many_unpicklable_error():
+    """Test that an exception that can't be unpickled fails only its
+    trial."""
+    p = partial(raise_two_arg_error, variable('x', value_type=int))
+    for ordered in (True, False):
+        results = sorted(evaluate_many(p, [{'x': 1}, {'x': 0}, {'x': 2}],
+                                       processes=1, ordered=ordered),
+                         key=lambda r: r.index)
+        assert [r.ok for r in results] == [True, False, True]
+        assert isinstance(results[1].error, RuntimeError)
+        assert 'TwoArgError' in str(results[1].error)
+        assert 'TwoArgError' in results[1].traceback
+
+
+def test_evaluate_many_early_stop():
+    """Test stopping early and lazily consuming assignments."""
+    consumed = []
+
+    def assignments():
+        for i in xrange(1000):
+            consumed.append(i)
+            yield {'x': i + 1}
+    p = partial(divide, 12, variable('x', value_type=int))
+    results = evaluate_many(p, assignments(), processes=1, max_pending=2)
+    assert next(results).value == 12
+    results.close()
+    assert len(consumed) < 10
+
+
+def test_evaluate_many_failed_chunk():
+    """Test that a chunk that can't be sent fails only its trials."""
+    x = variable('x', value_type=float)
+    p = partial(divide, 12, x)
+    assignments = [{'x': 1.}, {'x': lambda: 0}, {'x': 3.}]
+    for ordered in (True, False):
+        results = sorted(evaluate_many(p, assignments, processes=1,
+                                       ordered=ordered),
+                         key=lambda r: r.index)
+        assert [r.ok for r in results] == [True, False, True]
+        assert [r.value for r in results if r.ok] == [12., 4.]
+        assert results[1].assignment is assignments[1]
+
+
+@skip_if_no_module('numpy')
+def test_evaluate_many_ufunc():
+    """Test evaluating a graph applying a NumPy ufunc."""
+    import numpy
+    p = partial(numpy.exp, partial(float, variable('x', value_type=float)))
+    results = list(evaluate_many(p, [{'x': 0.}, {'x': 1.}], processes=1))
+    assert [r.value for r in results] == [1., numpy.exp(1.)]
+
+
+def test_evaluate_many_checks_graph_eagerly():
+    """Test that a graph that can't be serialized is reported when
+    calling evaluate_many, not when iterating."""
+    raised = False
+    try:
+        evaluate_many(partial(lambda: 0), [{}])
+    except ValueError:
+        raised = True
+    assert raised
+
+
+class Tracker(object):
+    """Counts the futures pending at once."""
+    def __init__(self):
+        self.pending = 0
+        self.max_pending = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, value, delay=0.05):
+        from concurrent.futures import Future
+        future = Future()
+        with self.lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+
+        def resolve():
+            with self.lock:
+                self.pending -= 1
+            if isinstance(value, Exception):
+                future.set_exception(value)
+            else:
+                future.set_result(value)
+        threading.Timer(delay, resolve).start()
+        return future
+
+
+tracker = Tracker()
+
+
+def fetch(value, delay=0.05):
+    return tracker.fetch(value, delay)
+
+
+@skip_if_no_module('concurrent.futures')
+def test_evaluate_async():
+    """Test evaluating a graph with future-returning functions."""
+    tracker.max_pending = 0
+    x = variable('x', value_type=['a', 'b'])
+    p = as_pp({'c': choice(x, ('a', partial(concat, partial(fetch, 'f'),
+                                            'g')),
+                           ('b', partial(fetch, ValueError('no')))),
+               'l': [partial(fetch, str(i)) for i in range(6)]})
+    start = time.time()
+    future = evaluate_async(p, x='a')
+    assert future.result(timeout=5) == {'c': 'fg',
+                                        'l': [str(i) for i in range(6)]}
+    assert time.time() - start < 0.3
+    assert tracker.max_pending == 7
+    tracker.max_pending = 0
+    assert (evaluate_async(p, max_concurrency=2, x='a').result(timeout=5) ==
+            evaluate_async(p, x='a').result(timeout=5))
+    raised = False
+    try:
+        evaluate_async(p, x='b').result(timeout=5)
+    except ValueError:
+        raised = True
+    assert raised
+    assert evaluate_async(as_pp([1, 2])).result() == [1, 2]
+
+
+@skip_if_no_module('concurrent.futures')
+def test_evaluate_async_limit():
+    """Test the concurrency limit of evaluate_async."""
+    tracker.max_pending = 0
+    p = as_pp([partial(fetch, i, 0.01) for i in range(10)])
+    assert evaluate_async(p, max_concurrency=3).result(timeout=5) == range(10)
+    assert tracker.max_pending <= 3
@@ -1,8 +1,11 @@
 from collections import OrderedDict
 import operator
+import pickle
+import sys
 from searchspaces.partialplus import partial, Literal, choice
 from searchspaces.partialplus import evaluate, variable, is_indexable
 from searchspaces.partialplus import depth_first_traversal, topological_sort
+from searchspaces.partialplus import GraphIndex, call_with_list_of_pos_args
 from searchspaces.partialplus import as_partialplus as as_pp
 
 
@@ -191,6 +194,56 @@ def test_star_kwargs():
     }
 
 
+def test_arg_callables():
+    """Test partial.arg lookups on classes, methods, callable objects
+    and builtins."""
+    class Foo(object):
+        def __init__(self, a, b=2):
+            pass
+
+        def method(self, c, d=4):
+            return -1
+
+        def __call__(self, e, *f):
+            return -1
+
+    class Bar(object):
+        pass
+
+    assert partial(Foo, 1).arg == {'a': Literal(1), 'b': Literal(2)}
+    assert partial(Foo(1).method, 3).arg == {'c': Literal(3),
+                                             'd': Literal(4)}
+    assert partial(Foo.method, None, 3).arg['self'] == Literal(None)
+    assert partial(Foo(1), 5, 6).arg == {'e': Literal(5), 'f': (Literal(6),)}
+    # Without Python code to inspect, positional arguments are listed by
+    # position.
+    assert partial(float, '3').arg == {0: Literal('3')}
+    assert partial(dict, a=1).arg == {'a': Literal(1)}
+    assert partial(Bar).arg == {}
+
+
+def test_arg_cached():
+    """Test that partial.arg is cached, and updated by append_arg."""
+    def f(a, b=None, *c):
+        return -1
+    p = partial(f, 0)
+    assert p.arg['b'] == Literal(None)
+    assert p.arg is not p.arg
+    p.arg['a'] = 'changed'
+    assert p.arg['a'] == Literal(0)
+    p.append_arg(Literal(1))
+    assert p.arg['b'] == Literal(1)
+    p.append_arg(Literal(2))
+    assert p.arg['c'] == (Literal(2),)
+    p.keywords['d'] = Literal(3)
+    raised = False
+    try:
+        p.arg
+    except TypeError:
+        raised = True
+    assert raised
+
+
 def test_tuple():
     """Test that tuples are correctly traversed/converted."""
     def add(x, y):
@@ -269,6 +322,52 @@ def test_topological_sort():
             and toposort.index(p2) > toposort.index(p4))
     assert toposort.index(Literal(5)) > toposort.index(p1)
     assert toposort.index(Literal(0.5)) > toposort.index(p2)
+    reverse = list(topological_sort(p5, reverse=True))
+    assert reverse == toposort[::-1]
+
+
+def test_topological_sort_long_chain():
+    """Test topological sort on a long chain with shortcuts."""
+    nodes = [partial(float, 0)]
+    for i in xrange(5000):
+        nodes.append(partial(operator.add, nodes[-1], nodes[i // 2]))
+    toposort = list(topological_sort(nodes[-1], reverse=True))
+    position = dict((id(n), i) for i, n in enumerate(toposort))
+    for node in toposort:
+        for c in node.inputs():
+            assert position[id(c)] < position[id(node)]
+
+
+def test_graph_index():
+    """Test parent/child lookups in a GraphIndex."""
+    p1 = partial(float, 5)
+    p2 = p1 + p1
+    p3 = p1 / p2
+    index = GraphIndex(p3)
+    assert index.root is p3
+    assert len(index) == 4
+    assert p2 in index
+    assert partial(float, 5) not in index
+    assert index.index(p3) == 0
+    assert set(index.parents_of(p1)) == set([p2, p3])
+    assert index.children_of(p2) == [p1]
+    assert index.children_of(p1) == [Literal(5)]
+    assert index.parents_of(p3) == []
+    # p1 shows up twice as an input of p2.
+    assert len(index.parents[index.index(p1)]) == 3
+    order = index.topological_order()
+    assert order[0] == 0
+    assert index.topological_order(reverse=True) == order[::-1]
+
+
+def test_clone():
+    """Test that clone() copies every node of a graph."""
+    x = variable('x', value_type=int)
+    p = as_pp({'a': [x, x + 1], 'b': partial(float, '3')})
+    q = p.clone()
+    original = set(id(n) for n in depth_first_traversal(p))
+    assert not original.intersection(id(n) for n in depth_first_traversal(q))
+    assert evaluate(q, x=2) == evaluate(p, x=2)
 
 
 def test_cycle_detection():
@@ -350,6 +449,45 @@ def test_choice():
     assert evaluate(p, x='b') == 'c'
 
 
+def test_choice_key_index():
+    """Test choices with literal keys, looked up without scanning."""
+    calls = []
+
+    def key(k):
+        calls.append(k)
+        return k
+    x = variable('x', value_type=int)
+    p = choice(x, *[(i, i * 10) for i in range(300)])
+    assert p.args[0].args[0]._key_index is not None
+    assert [evaluate(p, x=i) for i in (0, 150, 299)] == [0, 1500, 2990]
+    raised = False
+    try:
+        evaluate(p, x=300)
+    except KeyError:
+        raised = True
+    assert raised
+    # Equal keys resolve to the first, as when scanning.
+    p = choice(x, (1, 'int'), (True, 'bool'), (1.0, 'float'), ('a', 'str'))
+    assert evaluate(p, x=True) == 'int'
+    assert evaluate(p, x=1.0) == 'int'
+    # Unhashable indices fall back to scanning.
+    raised = False
+    try:
+        evaluate(p, x=[1])
+    except KeyError:
+        raised = True
+    assert raised
+    # Non-literal keys are evaluated and scanned, as before.
+    q = choice(x, (partial(key, 1), 'a'), (2, 'b'))
+    assert q.args[0].args[0]._key_index is None
+    assert evaluate(q, x=2) == 'b'
+    assert calls == [1]
+    # Appending a pair updates the table.
+    d = as_pp({'a': 1})
+    d.append_arg(as_pp(('b', 2)))
+    assert evaluate(d['b']) == 2
+
+
 def test_choice_raises():
     raised = False
     try:
@@ -364,3 +502,93 @@ def test_choice_raises():
     except ValueError:
         raised = True
     assert raised
+
+
+def test_lazy_index_slice_offset():
+    """Test that slices not starting at zero select the right elements."""
+    def dont_eval():
+        assert 0, 'Evaluate does not need this, should not eval'
+    plist = as_pp([partial(dont_eval), 0, 1, 2, partial(dont_eval)])
+    assert [0, 1, 2] == evaluate(plist[1:4])
+
+
+def test_evaluate_deep_chain():
+    """Test that evaluation isn't limited by the recursion limit."""
+    p = partial(int, 0)
+    for i in xrange(5 * sys.getrecursionlimit()):
+        p = p + 1
+    assert evaluate(p) == 5 * sys.getrecursionlimit()
+
+
+def test_evaluate_deep_lazy_chain():
+    """Test deep chains of lazy lookups."""
+    p = as_pp(5)
+    for i in xrange(2 * sys.getrecursionlimit()):
+        p = as_pp([p, 4])[variable('x', value_type=int)]
+    assert evaluate(p, x=0) == 5
+    assert evaluate(p, x=1) == 4
+
+
+def test_evaluate_cycle_detection():
+    """Test that evaluate raises on a cyclic graph."""
+    p1 = partial(float, 5)
+    p2 = partial(int, p1)
+    p1.append_arg(p2)
+    raised = False
+    try:
+        evaluate(p2)
+    except ValueError:
+        raised = True
+    assert raised
+
+
+def test_evaluate_order():
+    """Test that inputs are evaluated left to right, as they appear."""
+    calls = []
+
+    def f(name):
+        calls.append(name)
+        return name
+
+    def g(*args, **kwargs):
+        return args
+    p = partial(g, partial(f, 'a'), partial(f, 'b'), partial(f, 'c'),
+                k=partial(f, 'd'))
+    assert evaluate(p) == ('a', 'b', 'c')
+    assert calls == ['a', 'b', 'c', 'd']
+    del calls[:]
+    evaluate(as_pp([partial(f, 'a'), partial(f, 'b'), partial(f, 'c')]))
+    assert calls == ['a', 'b', 'c']
+    del calls[:]
+    evaluate(as_pp([partial(f, 'a'), partial(f, 'b'), partial(f, 'c'),
+                    partial(f, 'd')])[1:3])
+    assert calls == ['b', 'c']
+    del calls[:]
+    keys = [partial(f, 'k0'), partial(f, 'k1'), partial(f, 'k2')]
+    d = partial(call_with_list_of_pos_args, dict,
+                *[as_pp((k, i)) for i, k in enumerate(keys)])
+    assert evaluate(d[keys[2]]) == 2
+    assert calls == ['k2', 'k0', 'k1']
+
+
+def test_compact_nodes():
+    """Test that nodes have no __dict__ and share empty keywords."""
+    p = partial(float, 5)
+    q = partial(int, p)
+    assert not hasattr(p, '__dict__')
+    assert not hasattr(Literal(5), '__dict__')
+    assert p.inputs() == p.args
+    # Accessing keywords gives the node a dictionary of its own.
+    p.keywords['not_a_real_keyword'] = q
+    assert 'not_a_real_keyword' in p.keywords
+    assert len(q.keywords) == 0
+    assert len(partial(int, 3).keywords) == 0
+
+
+def test_pickle():
+    """Test that graphs survive a round trip through pickle."""
+    x = variable('x', value_type=int)
+    p = as_pp({'a': [x, x + 1], 'b': partial(float, '3')})
+    for protocol in (0, pickle.HIGHEST_PROTOCOL):
+        q = pickle.loads(pickle.dumps(p, protocol))
+        assert evaluate(q, x=2) == evaluate(p, x=2)
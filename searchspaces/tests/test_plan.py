@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from searchspaces.partialplus import partial, choice, variable, evaluate
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.plan import compile
+
+
+def dont_eval():
+    # -- This function body should never be evaluated
+    assert 0, 'Evaluate does not need this, should not eval'
+
+
+def test_plan_matches_evaluate():
+    """Test that a plan evaluates to the same thing as evaluate()."""
+    def mod(x, y):
+        return x % y
+    x = variable('x', value_type=int)
+    p = as_pp({5: partial(mod, 5, x), 3: (7, 9), 4: [partial(mod, 9, x)],
+               'f': partial(float, x) * 2.5})
+    plan = compile(p)
+    for value in (2, 3, 4):
+        assert plan(x=value) == evaluate(p, x=value)
+
+
+def test_plan_lazy_index():
+    """Test that a plan only evaluates the elements it needs."""
+    x = variable('x', value_type=int)
+    plan = compile(as_pp([-1, partial(dont_eval)])[0])
+    assert plan() == -1
+    plan = compile(as_pp((partial(dont_eval), -1))[x])
+    assert plan(x=1) == -1
+    plan = compile(as_pp([-1, 0, 1, partial(dont_eval)])[:3])
+    assert plan() == [-1, 0, 1]
+    plan = compile(as_pp((partial(dont_eval), -1, 0, 1))[1:])
+    assert plan() == (-1, 0, 1)
+    plan = compile(as_pp(OrderedDict({'a': partial(dont_eval), 'b': 3}))[x])
+    assert plan(x='b') == 3
+
+
+def test_plan_choice():
+    """Test that choice() nodes pick the right branch."""
+    p = choice(variable('x', value_type=['a', 'b', 'c']),
+               ('a', partial(float, '1.5')),
+               ('b', choice(variable('y', value_type=[0, 1]),
+                            (0, partial(dont_eval)),
+                            (1, partial(int, '3')))),
+               ('c', partial(dont_eval)))
+    plan = compile(p)
+    assert plan(x='a') == 1.5
+    assert plan(x='b', y=1) == 3
+    raised = False
+    try:
+        plan(x='d')
+    except KeyError:
+        raised = True
+    assert raised
+
+
+def test_plan_two_objects():
+    """Test that shared nodes are evaluated once per run."""
+    class Foo(object):
+        pass
+    p = partial(Foo)
+    plan = compile(as_pp([p, [0, 1, p], [(p,)]]))
+    r = plan()
+    assert r[0] is r[1][-1]
+    assert r[0] is r[2][0][0]
+    assert plan()[0] is not r[0]
+
+
+def test_plan_unbound_variable():
+    """Test that unbound variables raise KeyError."""
+    plan = compile(variable('x', value_type=int) + 1)
+    raised = False
+    try:
+        plan(y=5)
+    except KeyError:
+        raised = True
+    assert raised
+
+
+def test_plan_instantiate_call():
+    """Test that instantiate_call is used for every call."""
+    calls = []
+
+    def instantiate_call(f, *args, **kwargs):
+        calls.append(f)
+        return f(*args, **kwargs)
+    plan = compile(partial(int, '3') + variable('x', value_type=int))
+    assert plan.run({'x': 2}, instantiate_call=instantiate_call) == 5
+    assert len(calls) == 2
+
+
+def test_plan_nested_lazy_chain():
+    """Test long chains of lazy lookups."""
+    p = variable('x', value_type=int)
+    for i in xrange(300):
+        p = as_pp([p + 1, p])[variable('y', value_type=int)]
+    plan = compile(p)
+    assert plan(x=0, y=0) == 300
+    assert plan(x=3, y=1) == 3
+
+
+def test_plan_order():
+    """Test that plans call functions in the same order as evaluate."""
+    calls = []
+
+    def f(name):
+        calls.append(name)
+        return name
+
+    def g(*args, **kwargs):
+        return args
+    p = as_pp([partial(g, partial(f, 'a'), partial(f, 'b'), k=partial(f, 'c')),
+               partial(f, 'd')])
+    evaluate(p)
+    expected = calls[:]
+    del calls[:]
+    compile(p)()
+    assert calls == expected == ['a', 'b', 'c', 'd']
+    p = as_pp([partial(f, 'a'), partial(f, 'b'), partial(f, 'c'),
+               partial(f, 'd')])[1:]
+    del calls[:]
+    evaluate(p)
+    expected = calls[:]
+    del calls[:]
+    assert compile(p)() == ['b', 'c', 'd']
+    assert calls == expected == ['b', 'c', 'd']
@@ -0,0 +1,111 @@
+from searchspaces.partialplus import variable, evaluate
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.conditional import ConditionalIndex
+from searchspaces.sampling import sample
+from searchspaces.test_utils import (skip_if_no_module, model_space,
+                                     kernel_choice)
+
+
+@skip_if_no_module('numpy')
+def test_sample_ranges():
+    """Test that values are drawn within their ranges."""
+    import numpy
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3,
+                 log_scale=True)
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100,
+                     log_scale=True)
+    lr = variable('lr', value_type=float, minimum=0., maximum=1.)
+    p = model_space({'C': c, 'kernel': kernel_choice(degree,
+                                                     distribution=[3, 1])},
+                    depth, lr=lr)
+    samples = sample(p, 2000, rng=0)
+    assert len(samples) == 2000
+    assert samples.names == ['C', 'degree', 'depth', 'kernel', 'kind', 'lr']
+    c = samples.values['C']
+    assert c.min() >= 1e-3 and c.max() <= 1e3
+    # Log-uniform: about as many values below 1 as above.
+    assert 800 < (c < 1).sum() < 1200
+    degree = samples.values['degree']
+    assert set(degree.tolist()) == set([2, 3, 4, 5])
+    depth = samples.values['depth']
+    assert depth.min() >= 1 and depth.max() <= 100
+    assert (depth < 10).sum() > (depth >= 10).sum()
+    assert set(samples.values['kind'].tolist()) == set(['svm', 'tree'])
+    assert 1300 < (samples.values['kernel'] == 'rbf').sum() < 1700
+    assert (samples.codes['kind'] == 0).sum() == \
+        (samples.values['kind'] == 'svm').sum()
+    lr = samples.values['lr']
+    assert lr.dtype == numpy.float64 and 0 <= lr.min() and lr.max() <= 1
+    assert (sample(p, 5, rng=numpy.random.RandomState(1)).values['C'] ==
+            sample(p, 5, rng=1).values['C']).all()
+
+
+@skip_if_no_module('numpy')
+def test_sample_conditionality():
+    """Test that inactive variables are masked out."""
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3,
+                 log_scale=True)
+    degree = variable('degree', value_type=int, minimum=2, maximum=5)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100,
+                     log_scale=True)
+    lr = variable('lr', value_type=float, minimum=0., maximum=1.)
+    p = model_space({'C': c, 'kernel': kernel_choice(degree,
+                                                     distribution=[3, 1])},
+                    depth, lr=lr)
+    samples = sample(ConditionalIndex(p), 500, rng=1)
+    kind = samples.values['kind']
+    svm = kind == 'svm'
+    assert samples.active['kind'].all() and samples.active['lr'].all()
+    assert (samples.active['C'] == svm).all()
+    assert (samples.active['depth'] == ~svm).all()
+    assert (samples.active['degree'] ==
+            svm & (samples.values['kernel'] == 'poly')).all()
+    assert samples['depth'].count() == (~svm).sum()
+    for assignment in samples.assignments()[:50]:
+        value = evaluate(p, **assignment)
+        if assignment['kind'] == 'svm':
+            assert set(assignment) >= set(['C', 'kernel'])
+            assert 'depth' not in assignment
+            assert value['model']['C'] == assignment['C']
+        else:
+            assert sorted(assignment) == ['depth', 'kind', 'lr']
+            assert isinstance(assignment['depth'], int)
+            assert value['model'] == assignment['depth']
+
+
+@skip_if_no_module('numpy')
+def test_sample_never_used():
+    """Test that variables in branches that can't be selected aren't
+    drawn, even if they couldn't be."""
+    x = variable('x', value_type=['a'])
+    unbounded = variable('unbounded', value_type=float)
+    p = as_pp([x, unbounded])[0]
+    samples = sample(p, 10, rng=0)
+    assert not samples.active['unbounded'].any()
+    assert samples['unbounded'].count() == 0
+    assert samples.assignments() == [{'x': 'a'}] * 10
+
+
+class Constant(object):
+    def rvs(self, size, random_state):
+        return [7.] * size
+
+
+@skip_if_no_module('numpy')
+def test_sample_distributions():
+    """Test variables sampled with their distributions, and errors."""
+    p = as_pp([variable('a', value_type=float, distribution=Constant()),
+               variable('b', value_type=float,
+                        distribution=lambda rng, n: rng.normal(size=n)),
+               variable('c', value_type=bool)])
+    samples = sample(p, 10, rng=0)
+    assert samples.values['a'].tolist() == [7.] * 10
+    assert samples.values['b'].shape == (10,)
+    assert set(samples.values['c'].tolist()) <= set([True, False])
+    raised = False
+    try:
+        sample(variable('d', value_type=float), 10)
+    except ValueError:
+        raised = True
+    assert raised
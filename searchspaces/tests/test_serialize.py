@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+from searchspaces.partialplus import partial, variable, choice, evaluate
+from searchspaces.partialplus import depth_first_traversal
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.serialize import dump, dumps, load, loads, qualified_name
+from searchspaces.test_utils import skip_if_no_module
+
+
+class Foo(object):
+    def __init__(self, x=None, y=None):
+        self.x = x
+        self.y = y
+
+
+def test_round_trip():
+    """Test that a graph evaluates the same after dumps/loads."""
+    x = variable('x', value_type=['a', 'b'])
+    shared = partial(len, x)
+    p = as_pp({'choice': choice(x, ('a', [1, shared]), ('b', (2.5, None))),
+               'foo': partial(Foo, x, y=shared), 'str': 'hello'})
+    q = loads(dumps(p))
+    assert (len(list(depth_first_traversal(q))) ==
+            len(list(depth_first_traversal(p))))
+    for value in ('a', 'b'):
+        expected = evaluate(p, x=value)
+        result = evaluate(q, x=value)
+        assert result['choice'] == expected['choice']
+        assert result['foo'].x == expected['foo'].x
+        assert result['foo'].y == expected['foo'].y
+        assert result['str'] == 'hello'
+
+
+def test_sharing_preserved():
+    """Test that shared nodes stay shared, and equal literals are stored
+    once."""
+    a = partial(float, 3)
+    p = as_pp([a, a, [], []])
+    q = loads(dumps(p))
+    assert q.args[0] is q.args[1]
+    result = evaluate(q)
+    assert result[:2] == [3.0, 3.0]
+    # Mutable literals are not merged.
+    assert result[2] is not result[3]
+    small = dumps(as_pp(['abc' * 100] * 2))
+    assert len(small) < len(dumps(as_pp(['abc' * 100, 'def' * 100])))
+
+
+class Scale(object):
+    def __init__(self, factor):
+        self.factor = factor
+
+    def __call__(self, x):
+        return self.factor * x
+
+
+@skip_if_no_module('numpy')
+def test_ufuncs_and_callable_instances():
+    """Test that NumPy ufuncs are stored by name, and other picklable
+    callables by their pickle."""
+    import numpy
+    x = variable('x', value_type=float)
+    p = partial(Scale(2.), partial(numpy.exp, partial(float, x)))
+    assert qualified_name(numpy.exp) == 'numpy:exp'
+    q = loads(dumps(p))
+    assert q.func.factor == 2.
+    assert q.args[0].func is numpy.exp
+    assert evaluate(q, x=0.) == evaluate(p, x=0.) == 2.
+
+
+def test_unnamed_functions_rejected():
+    """Test that lambdas and nested functions can't be serialized."""
+    def nested(x):
+        return x
+    for f in (nested, lambda x: x):
+        raised = False
+        try:
+            dumps(partial(f, 1))
+        except ValueError:
+            raised = True
+        assert raised
+    assert qualified_name(float) == '__builtin__:float'
+
+
+def test_bad_data():
+    """Test that data with a bad header is rejected."""
+    for data in ('', 'x' * 100, 'SSPG\xff\xff' + dumps(as_pp(1))[6:]):
+        raised = False
+        try:
+            loads(data)
+        except ValueError:
+            raised = True
+        assert raised
+
+
+def test_large_literals_out_of_band():
+    """Test that large literals survive being stored in the buffer
+    section."""
+    big = range(10000)
+    p = as_pp([big, 'small'])
+    data = dumps(p, buffer_threshold=1024)
+    assert evaluate(loads(data)) == [big, 'small']
+    assert evaluate(loads(dumps(p, buffer_threshold=0))) == [big, 'small']
+
+
+@skip_if_no_module('numpy')
+def test_numpy_arrays_mmap():
+    """Test loading NumPy arrays from a memory-mapped file."""
+    import numpy
+    arr = numpy.arange(12, dtype='float32').reshape(3, 4)
+    p = partial(Foo, arr, y=numpy.arange(5))
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'graph.bin')
+        dump(p, path)
+        for mmap in (False, True):
+            result = evaluate(load(path, mmap=mmap))
+            assert result.x.dtype == arr.dtype
+            assert numpy.all(result.x == arr)
+            assert numpy.all(result.y == numpy.arange(5))
+        q = load(path, mmap=True)
+        # The array is a view of the mapped file, not a copy.
+        assert not q.args[0].value.flags.owndata
+        del q
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,200 @@
+from searchspaces.partialplus import partial, Literal, choice, variable
+from searchspaces.partialplus import evaluate, depth_first_traversal
+from searchspaces.partialplus import as_partialplus as as_pp
+from searchspaces.transforms import fold_constants, pure, impure, is_pure
+from searchspaces.transforms import merge_common_subexpressions, specialize
+
+
+class Foo(object):
+    def __init__(self, x=None):
+        self.x = x
+
+
+def test_pure_marking():
+    """Test marking functions as pure and impure."""
+    def f(x):
+        return x
+    assert not is_pure(f)
+    assert pure(f) is f
+    assert is_pure(f)
+    assert impure(f) is f
+    assert not is_pure(f)
+    assert is_pure(float)
+
+
+def test_fold_constants():
+    """Test that variable-independent pure subgraphs are folded."""
+    x = variable('x', value_type=int)
+    p = as_pp({'a': [1, partial(float, '2.5') * 2], 'b': x + 3,
+               'c': (partial(Foo, 3), x)})
+    folded, report = fold_constants(p)
+    for value in (0, 5):
+        r = evaluate(folded, x=value)
+        e = evaluate(p, x=value)
+        assert r['a'] == e['a']
+        assert r['b'] == e['b']
+        assert r['c'][0].x == e['c'][0].x
+        assert r['c'][1] == e['c'][1]
+    assert report.nodes_before == len(list(depth_first_traversal(p)))
+    assert report.nodes_after == len(list(depth_first_traversal(folded)))
+    assert report.eliminated > 0
+    assert report.folded == 1  # The product in the list under "a".
+    assert report.failed == 0
+    # Impure nodes are left alone.
+    assert any(n.func is Foo for n in depth_first_traversal(folded))
+
+
+def test_fold_constants_whole_graph():
+    """Test folding a graph without variables down to a single literal."""
+    p = as_pp((partial(int, '3'), (4, 5), ('a', partial(float, 1))))
+    folded, report = fold_constants(p)
+    assert isinstance(folded, Literal)
+    assert folded.value == (3, (4, 5), ('a', 1.0))
+    assert report.nodes_after == 1
+    assert report.folded == 1
+
+
+def test_mutable_results_not_shared():
+    """Test that lists, dicts and sets are neither folded nor merged, so
+    that each evaluation gets its own."""
+    x = variable('x', value_type=int)
+    p = as_pp([[1, 2], [1, 2], {'a': 1}, partial(set, (1,)), x])
+    for q, _ in (fold_constants(p), merge_common_subexpressions(p)):
+        assert not isinstance(q, Literal)
+        r = evaluate(q, x=0)
+        assert r[0] is not r[1]
+        r[0].append(3)
+        r[2]['b'] = 2
+        r[3].add(2)
+        assert evaluate(q, x=0) == [[1, 2], [1, 2], {'a': 1}, set([1]), 0]
+
+
+def test_fold_constants_leaves_failures():
+    """Test that constant subgraphs that raise are left in place."""
+    p = choice(variable('x', value_type=[0, 1]),
+               (0, partial(int, 'not a number')),
+               (1, partial(int, '7')))
+    folded, report = fold_constants(p)
+    assert report.failed == 1
+    assert evaluate(folded, x=1) == 7
+    raised = False
+    try:
+        evaluate(folded, x=0)
+    except ValueError:
+        raised = True
+    assert raised
+
+
+def test_fold_constants_shares_unchanged():
+    """Test that subgraphs without constants are shared, not copied."""
+    x = variable('x', value_type=int)
+    q = partial(Foo, x)
+    p = as_pp([q, partial(float, '1')])
+    folded, _ = fold_constants(p)
+    assert folded is not p
+    assert folded.args[0] is q
+    folded, report = fold_constants(q)
+    assert folded is q
+    assert report.eliminated == 0
+
+
+def test_merge_common_subexpressions():
+    """Test that identical pure subgraphs are merged."""
+    x = variable('x', value_type=int)
+    p = as_pp([partial(float, x) + 1, partial(float, x) + 1, None, None,
+               partial(Foo, 3), partial(Foo, 3), 1.0, 1, True, -0.0, 0.0])
+    merged, report = merge_common_subexpressions(p)
+    assert merged.args[0] is merged.args[1]
+    assert merged.args[2] is merged.args[3]
+    # Impure nodes are kept apart, but their inputs are merged.
+    assert merged.args[4] is not merged.args[5]
+    assert merged.args[4].args[0] is merged.args[5].args[0]
+    # Equal literals of different types aren't merged.
+    assert len(set(id(a) for a in merged.args[6:])) == 5
+    r = evaluate(merged, x=2)
+    assert r[:4] == [3.0, 3.0, None, None]
+    assert r[4] is not r[5]
+    assert r[6:] == [1.0, 1, True, -0.0, 0.0]
+    assert [type(v) for v in r[6:]] == [float, int, bool, float, float]
+    assert report.merged > 0
+    assert report.nodes_after == len(list(depth_first_traversal(merged)))
+    assert report.eliminated == report.nodes_before - report.nodes_after
+
+
+def test_merge_variables_and_choices():
+    """Test merging of variable nodes and the choices that use them."""
+    def make():
+        return choice(variable('x', value_type=['a', 'b']),
+                      ('a', (1, 2)), ('b', partial(int, '3')))
+    p = as_pp({'first': make(), 'second': make()})
+    merged, report = merge_common_subexpressions(p)
+    first, second = [pair.args[1] for pair in merged.args[1:]]
+    assert first is second
+    assert evaluate(merged, x='a') == {'first': (1, 2), 'second': (1, 2)}
+    assert evaluate(merged, x='b') == {'first': 3, 'second': 3}
+
+
+def test_specialize():
+    """Test fixing variables and pruning unselected branches."""
+    calls = []
+
+    def model(name, *args):
+        calls.append(name)
+        return (name,) + args
+    kind = variable('kind', value_type=['svm', 'tree'])
+    kernel = variable('kernel', value_type=['rbf', 'poly'])
+    c = variable('C', value_type=float)
+    depth = variable('depth', value_type=int)
+    svm = partial(model, 'svm', c, choice(kernel, ('rbf', 'rbf'),
+                                          ('poly', partial(str, depth))))
+    tree = partial(model, 'tree', depth)
+    p = as_pp({'model': choice(kind, ('svm', svm), ('tree', tree)),
+               'c': c})
+    q, report = specialize(p, {'kind': 'tree'})
+    assert evaluate(q, depth=3, C=1.) == evaluate(p, kind='tree', depth=3,
+                                                  C=1.)
+    nodes = list(depth_first_traversal(q))
+    # The selected branch is shared with the original graph.
+    assert svm not in nodes and tree in nodes
+    # kind was only used to select, so no longer appears at all.
+    assert kind not in nodes
+    assert report.substituted == 0 and report.resolved == 1
+    assert report.nodes_after < report.nodes_before
+    r, report = specialize(p, {'kind': 'svm', 'kernel': 'poly',
+                               'depth': 4})
+    assert evaluate(r, C=2.) == {'model': ('svm', 2., '4'), 'c': 2.}
+    assert report.substituted == 1 and report.resolved == 2
+    assert not any(getattr(n, 'func', None) is model and n.args[0].value ==
+                   'tree' for n in depth_first_traversal(r))
+    # The original graph is untouched.
+    assert evaluate(p, kind='tree', depth=3, C=1.)['model'] == ('tree', 3)
+
+
+def test_specialize_sequences_and_failures():
+    """Test selections from lists, computed indices, and selections that
+    are left for evaluation to fail on."""
+    i = variable('i', value_type=int)
+    x = variable('x', value_type=float)
+    seq = as_pp([x, partial(float, 2), partial(float, 3)])
+    p = as_pp([seq[i], seq[partial(abs, i)], seq[Literal(slice(1, None))]])
+    q, report = specialize(p, {'i': -1})
+    assert report.resolved == 3
+    assert evaluate(q) == [3., 2., [2., 3.]]
+    assert x not in list(depth_first_traversal(q))
+    q, report = specialize(p, {'i': 0})
+    assert evaluate(q, x=5.) == [5., 5., [2., 3.]]
+    # Selections by literals are resolved, even with nothing fixed.
+    assert specialize(p, {})[1].resolved == 1
+    assert specialize(seq, {'y': 1})[0] is seq
+    f, report = specialize(choice(i, (0, x)), {'i': 1})
+    assert report.resolved == 0
+    raised = False
+    try:
+        evaluate(f)
+    except KeyError:
+        raised = True
+    assert raised
+    # Any variable name can be fixed, even that of a parameter.
+    root = variable('root', value_type=int)
+    q, report = specialize(as_pp([root, x]), {'root': 2})
+    assert evaluate(q, x=1.) == [2, 1.]
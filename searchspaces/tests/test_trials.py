@@ -0,0 +1,80 @@
+from searchspaces.partialplus import variable
+from searchspaces.conditional import ConditionalIndex
+from searchspaces.trials import canonical_key, TrialCache
+from searchspaces.test_utils import skip_if_no_module, model_space
+
+
+def test_canonical_key():
+    """Test that keys only depend on the active variables."""
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100)
+    p = model_space(c, depth, layers=variable('layers',
+                                              value_type=[[1], [2, 2]]))
+    index = ConditionalIndex(p)
+    key = canonical_key(index, {'kind': 'svm', 'C': 1., 'depth': 3,
+                                'layers': [1]})
+    assert key == canonical_key(p, {'kind': 'svm', 'C': 1., 'depth': 7,
+                                    'layers': [1]})
+    assert key == canonical_key(index, {'kind': 'svm', 'C': 1.,
+                                        'layers': [1]})
+    hash(key)
+    assert key != canonical_key(index, {'kind': 'svm', 'C': 2.,
+                                        'layers': [1]})
+    assert key != canonical_key(index, {'kind': 'tree', 'C': 1., 'depth': 3,
+                                        'layers': [1]})
+    # 1 and 1.0 may give different results.
+    assert (canonical_key(index, {'kind': 'tree', 'depth': 1,
+                                  'layers': [1]}) !=
+            canonical_key(index, {'kind': 'tree', 'depth': 1.,
+                                  'layers': [1]}))
+    raised = False
+    try:
+        canonical_key(index, {'kind': 'tree', 'C': 1., 'layers': [1]})
+    except KeyError:
+        raised = True
+    assert raised
+
+
+@skip_if_no_module('numpy')
+def test_canonical_key_numpy():
+    """Test that NumPy scalars give the same keys as Python scalars."""
+    import numpy
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100)
+    p = model_space(c, depth, layers=variable('layers',
+                                              value_type=[[1], [2, 2]]))
+    index = ConditionalIndex(p)
+    assert (canonical_key(index, {'kind': 'tree', 'depth': numpy.int64(3),
+                                  'layers': [numpy.int64(1)]}) ==
+            canonical_key(index, {'kind': 'tree', 'depth': 3,
+                                  'layers': [1]}))
+
+
+runs = []
+
+
+def objective(value):
+    runs.append(value)
+    return len(runs)
+
+
+def test_trial_cache():
+    """Test that duplicate trials are not run again."""
+    del runs[:]
+    c = variable('C', value_type=float, minimum=1e-3, maximum=1e3)
+    depth = variable('depth', value_type=int, minimum=1, maximum=100)
+    p = model_space(c, depth, layers=variable('layers',
+                                              value_type=[[1], [2, 2]]))
+    cache = TrialCache(p, objective)
+    assert cache({'kind': 'tree', 'depth': 3, 'C': 1., 'layers': [1]}) == 1
+    assert cache({'kind': 'tree', 'depth': 3, 'C': 2., 'layers': [1]}) == 1
+    assert cache({'kind': 'tree', 'depth': 4, 'layers': [1]}) == 2
+    assert {'kind': 'tree', 'depth': 4, 'C': 5., 'layers': [1]} in cache
+    assert {'kind': 'svm', 'depth': 4, 'C': 5., 'layers': [1]} not in cache
+    assert cache.duplicates == 1 and len(cache) == 2
+    assert runs == [{'model': 3, 'layers': [1]}, {'model': 4, 'layers': [1]}]
+    cache.clear()
+    assert cache({'kind': 'tree', 'depth': 3, 'layers': [1]}) == 3
+    plain = TrialCache(p)
+    assert plain({'kind': 'svm', 'C': 2., 'layers': [2, 2]}) == \
+        {'model': 2., 'layers': [2, 2]}
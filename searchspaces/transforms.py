@@ -0,0 +1,569 @@
+"""
+Rewriting passes over `PartialPlus` graphs.
+
+Each pass leaves the graph it is given untouched and returns a new
+root. Subgraphs that a pass does not change are shared between the old
+and the new graph rather than copied.
+"""
+import operator
+
+from .partialplus import (Node, Literal, PartialPlus, topological_sort,
+                          depth_first_traversal, is_variable_node,
+                          is_pos_args_node, is_dict_like_node, is_indexable,
+                          is_list_node, make_tuple,
+                          call_with_list_of_pos_args, choice_node,
+                          _evaluate, _select_branch)
+
+
+# Functions known to have no side effects, and whose results only depend
+# on their arguments. Anything not in here is assumed to be impure.
+# Constructors of mutable containers (`list`, `dict`, `set`, ...) are left
+# out: a folded or merged node hands the same object to every evaluation,
+# so a caller modifying one result would change all the others.
+_PURE_FUNCTIONS = set([
+    make_tuple, call_with_list_of_pos_args, choice_node, tuple, frozenset,
+    int, long, float, complex, bool, str, unicode, oct, hex,
+    abs, divmod, pow, len, min, max, round,
+    operator.add, operator.sub, operator.mul, operator.div,
+    operator.truediv, operator.floordiv, operator.mod, operator.pow,
+    operator.neg, operator.pos, operator.abs, operator.invert,
+    operator.lshift, operator.rshift, operator.and_, operator.or_,
+    operator.xor, operator.lt, operator.le, operator.gt, operator.ge,
+    operator.eq, operator.ne, operator.getitem,
+])
+
+
+def pure(f):
+    """
+    Mark a function as pure, i.e. free of side effects.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    f : callable
+        The same callable, so that this can be used as a decorator.
+
+    Notes
+    -----
+    Rewriting passes may evaluate applications of pure functions
+    ahead of time, or merge identical applications of them, so the
+    result of a pure function should only depend on its arguments.
+    """
+    _PURE_FUNCTIONS.add(f)
+    return f
+
+
+def impure(f):
+    """
+    Mark a function as impure, undoing a previous call to `pure`.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    f : callable
+        The same callable, so that this can be used as a decorator.
+    """
+    _PURE_FUNCTIONS.discard(f)
+    return f
+
+
+def is_pure(f):
+    """
+    Check whether a function has been marked as pure.
+
+    Parameters
+    ----------
+    f : callable
+
+    Returns
+    -------
+    pure : bool
+    """
+    try:
+        return f in _PURE_FUNCTIONS
+    except TypeError:  # Unhashable callable.
+        return False
+
+
+def is_pure_node(node):
+    """
+    Check whether a `PartialPlus` node applies a pure function.
+
+    Parameters
+    ----------
+    node : PartialPlus
+
+    Returns
+    -------
+    pure : bool
+
+    Notes
+    -----
+    `call_with_list_of_pos_args` nodes are only pure if the function
+    they call on their arguments (their first argument, which must be
+    a `Literal`) is.
+    """
+    if not is_pure(node.func):
+        return False
+    if is_pos_args_node(node):
+        return (len(node.args) > 0 and isinstance(node.args[0], Literal) and
+                is_pure(node.args[0].value))
+    return True
+
+
+def _rebuild(node, replacements, keep_pairs=False):
+    """
+    Return `node` with its inputs swapped out as per `replacements`.
+
+    Parameters
+    ----------
+    node : PartialPlus
+    replacements : dict
+        Maps `id()` of original nodes to the nodes replacing them.
+        Inputs not in here are kept as they are.
+    keep_pairs : bool, optional
+        If `True` and `node` is dict-like, its key/value pairs stay
+        tuple nodes (with their elements replaced) even if they are
+        themselves replaced by something else in `replacements`, as
+        lazy indexing relies on them.
+
+    Returns
+    -------
+    node : PartialPlus
+        `node` itself if none of its inputs were replaced, otherwise
+        a new `PartialPlus` applying the same function.
+    """
+    if keep_pairs and is_dict_like_node(node):
+        args = [node.args[0]]
+        for pair in node.args[1:]:
+            if id(pair) in replacements:
+                pair = PartialPlus(make_tuple,
+                                   *[replacements.get(id(e), e)
+                                     for e in pair.args])
+            args.append(pair)
+    else:
+        args = [replacements.get(id(a), a) for a in node.args]
+    kwargs = dict((k, replacements.get(id(v), v))
+                  for k, v in node._keywords.iteritems())
+    if (all(a is b for a, b in zip(args, node.args)) and
+            all(v is node._keywords[k] for k, v in kwargs.iteritems())):
+        return node
+    return PartialPlus(node.func, *args, **kwargs)
+
+
+class TransformReport(object):
+    """
+    Summary of what a rewriting pass did to a graph.
+
+    Attributes
+    ----------
+    nodes_before : int
+        Number of distinct nodes in the original graph.
+    nodes_after : int
+        Number of distinct nodes in the rewritten graph.
+    """
+    # Names of the attributes to show in the repr, in order.
+    _fields = ('nodes_before', 'nodes_after')
+
+    def __init__(self, nodes_before, nodes_after):
+        self.nodes_before = nodes_before
+        self.nodes_after = nodes_after
+
+    @property
+    def eliminated(self):
+        """Number of nodes removed from the graph."""
+        return self.nodes_before - self.nodes_after
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__,
+                           ', '.join('%s=%d' % (f, getattr(self, f))
+                                     for f in self._fields))
+
+
+class FoldReport(TransformReport):
+    """
+    Summary of what `fold_constants` did to a graph.
+
+    Attributes
+    ----------
+    folded : int
+        Number of nodes that were evaluated and replaced by a `Literal`.
+    failed : int
+        Number of constant nodes whose evaluation raised an exception,
+        and which were left as they were.
+    """
+    _fields = TransformReport._fields + ('folded', 'failed')
+
+    def __init__(self, nodes_before, nodes_after, folded, failed):
+        super(FoldReport, self).__init__(nodes_before, nodes_after)
+        self.folded = folded
+        self.failed = failed
+
+
+class MergeReport(TransformReport):
+    """
+    Summary of what `merge_common_subexpressions` did to a graph.
+
+    Attributes
+    ----------
+    merged : int
+        Number of nodes that were replaced by an identical node found
+        elsewhere in the graph.
+    """
+    _fields = TransformReport._fields + ('merged',)
+
+    def __init__(self, nodes_before, nodes_after, merged):
+        super(MergeReport, self).__init__(nodes_before, nodes_after)
+        self.merged = merged
+
+
+def fold_constants(root):
+    """
+    Pre-evaluate subgraphs that do not depend on any variable.
+
+    Parameters
+    ----------
+    root : Node
+
+    Returns
+    -------
+    folded : Node
+        The root of the new graph, in which every maximal subgraph of
+        pure function applications that doesn't depend on a variable
+        has been replaced by a `Literal` holding its value.
+    report : FoldReport
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    Only applications of functions marked with `pure` are folded. If
+    evaluating a constant subgraph raises an exception, that subgraph
+    is left in place, so the error surfaces at evaluation time (if at
+    all, as it may sit on a branch that is never selected).
+
+    Variable nodes are never rewritten, and the key/value pairs of a
+    dict that isn't folded as a whole stay tuple nodes, so that lazy
+    lookups into it keep working.
+
+    Folded values are computed once, so every evaluation of the folded
+    graph returns the very same object for them. Don't mutate them.
+    """
+    assert isinstance(root, Node)
+    nodes = list(topological_sort(root, reverse=True))
+    values = {}
+    constant = set()
+    failed = 0
+    for node in nodes:
+        if isinstance(node, Literal):
+            constant.add(id(node))
+        elif (not is_variable_node(node) and is_pure_node(node) and
+              all(id(c) in constant for c in node.inputs())):
+            try:
+                _evaluate(node, bindings=values)
+            except Exception:
+                failed += 1
+            else:
+                constant.add(id(node))
+    replacements = {}
+    literals = set()
+    for node in nodes:
+        # Variable nodes are left as they are, metadata and all.
+        if isinstance(node, Literal) or is_variable_node(node):
+            continue
+        if id(node) in constant:
+            literal = Literal(values[node])
+            literals.add(id(literal))
+            replacements[id(node)] = literal
+        else:
+            new = _rebuild(node, replacements, keep_pairs=True)
+            if new is not node:
+                replacements[id(node)] = new
+    new_root = replacements.get(id(root), root)
+    new_nodes = list(depth_first_traversal(new_root))
+    # Constants subsumed by a folded parent don't count as folded.
+    folded = sum(1 for n in new_nodes if id(n) in literals)
+    return new_root, FoldReport(len(nodes), len(new_nodes), folded, failed)
+
+
+# Literal values of these types are merged when they are equal (and of
+# the very same type); any other literals only when they hold the same
+# object.
+_ATOMIC_TYPES = (type(None), bool, int, long, str, unicode)
+
+
+def _literal_key(value):
+    """
+    Structural key for the value of a `Literal`.
+
+    Parameters
+    ----------
+    value : object
+
+    Returns
+    -------
+    key : tuple
+        Equal for two values exactly when they can be used
+        interchangeably.
+    """
+    if type(value) in _ATOMIC_TYPES:
+        return (type(value), value)
+    elif type(value) in (float, complex):
+        # repr() tells 0.0 and -0.0 apart, and NaNs compare equal.
+        return (type(value), repr(value))
+    elif type(value) is tuple:
+        return (tuple,) + tuple(_literal_key(v) for v in value)
+    else:
+        return ('id', id(value))
+
+
+def _lookup_tables(root, nodes):
+    """
+    Find the lists and dicts that are only ever indexed into.
+
+    Parameters
+    ----------
+    root : Node
+    nodes : list
+        The nodes of the graph under `root`.
+
+    Returns
+    -------
+    tables : set
+        `id()`s of the list and dict nodes, other than `root`, whose
+        every use is as the container of an indexing node, such as the
+        table of branches of a `choice`, or as the metadata of a
+        variable. Their values never reach the caller, so they can be
+        shared despite being mutable.
+    """
+    tables = set(id(node) for node in nodes
+                 if is_list_node(node) or is_dict_like_node(node))
+    tables.discard(id(root))
+    for node in nodes:
+        if is_variable_node(node):
+            continue
+        inputs = list(node.inputs())
+        if node.func is operator.getitem and is_indexable(node):
+            inputs = inputs[1:]
+        for child in inputs:
+            tables.discard(id(child))
+    return tables
+
+
+def merge_common_subexpressions(root):
+    """
+    Merge structurally identical subgraphs into a single shared node.
+
+    Parameters
+    ----------
+    root : Node
+
+    Returns
+    -------
+    merged : Node
+        The root of the new graph, in which equal literals, and
+        applications of the same pure function to the same inputs,
+        are represented by one node each.
+    report : MergeReport
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    As `evaluate` caches values by node, a merged subgraph is only
+    evaluated once per call. Applications of impure functions are never
+    merged, though their inputs may be. Variable nodes with the same
+    name and metadata are merged, and so are lists and dicts that are
+    only indexed into, like the branches of `choice`s.
+    """
+    assert isinstance(root, Node)
+    nodes = list(topological_sort(root, reverse=True))
+    tables = _lookup_tables(root, nodes)
+    # Maps structural keys to the node that represents them, and `id()`s
+    # of original nodes to the node standing in for them.
+    table = {}
+    replacements = {}
+    merged = 0
+    for node in nodes:
+        if isinstance(node, Literal):
+            key = ('literal', _literal_key(node.value))
+            new = node
+        else:
+            new = _rebuild(node, replacements)
+            if (is_variable_node(new) or is_pure_node(new) or
+                    id(node) in tables):
+                key = (new.func,
+                       tuple(id(a) for a in new.args),
+                       tuple(sorted((k, id(v))
+                                    for k, v in new._keywords.iteritems())))
+            else:
+                key = None
+        try:
+            canonical = (table.setdefault(key, new) if key is not None
+                         else new)
+        except TypeError:  # Unhashable function or literal.
+            canonical = new
+        if canonical is not new:
+            merged += 1
+        if canonical is not node:
+            replacements[id(node)] = canonical
+    new_root = replacements.get(id(root), root)
+    return new_root, MergeReport(len(nodes),
+                                 len(list(depth_first_traversal(new_root))),
+                                 merged)
+
+
+class SpecializeReport(TransformReport):
+    """
+    Summary of what `specialize` did to a graph.
+
+    Attributes
+    ----------
+    substituted : int
+        Number of variable nodes replaced by a `Literal` of their value.
+    resolved : int
+        Number of selections (`choice`s, or indexing of lists, tuples
+        and dicts) whose index became constant, and which were replaced
+        by the branch they select.
+    """
+    _fields = TransformReport._fields + ('substituted', 'resolved')
+
+    def __init__(self, nodes_before, nodes_after, substituted, resolved):
+        super(SpecializeReport, self).__init__(nodes_before, nodes_after)
+        self.substituted = substituted
+        self.resolved = resolved
+
+
+def _selected(node, index_val):
+    """
+    The branch an indexing node selects with a given index.
+
+    Returns
+    -------
+    branch : Node, tuple or None
+        The selected node, a tuple of the selected elements if
+        `index_val` is a slice of a list or tuple, or `None` if the
+        selection can't be made ahead of evaluation (it would fail, or
+        the keys of a dict aren't all literals).
+    """
+    try:
+        return _select_branch(node, index_val)
+    except (IndexError, KeyError, TypeError):
+        return None
+
+
+def specialize(root, bindings):
+    """
+    Fix the values of some variables, and prune what they make
+    unreachable.
+
+    Parameters
+    ----------
+    root : Node
+    bindings : dict
+        Values of (some of) the variables, by name.
+
+    Returns
+    -------
+    specialized : Node
+        The root of the new graph, in which the variables named in
+        `bindings` are replaced by `Literal`s, and selections whose
+        index only depends on them are replaced by the selected
+        branch, leaving out the branches that are not selected.
+    report : SpecializeReport
+
+    Raises
+    ------
+    ValueError
+        If the graph contains a directed cycle.
+
+    Notes
+    -----
+    Evaluating the specialized graph with values for the remaining
+    variables gives the same result as evaluating the original graph
+    with those and `bindings`. Indices computed from fixed
+    variables are evaluated ahead of time if they only apply functions
+    marked with `pure`; selections that would fail are left in place,
+    so that the error surfaces at evaluation time. Other subgraphs are
+    not evaluated, and those not affected by the fixed variables are
+    shared with the original graph.
+    """
+    assert isinstance(root, Node)
+    order = list(topological_sort(root))
+    # Whether a node's value only depends on fixed variables.
+    known = set()
+    for node in reversed(order):
+        if isinstance(node, Literal):
+            known.add(id(node))
+        elif is_variable_node(node):
+            name = node._keywords['name']
+            if isinstance(name, Literal) and name.value in bindings:
+                known.add(id(node))
+        elif is_pure_node(node) and all(id(c) in known
+                                        for c in node.inputs()):
+            known.add(id(node))
+    values = dict(bindings)
+    # Maps `id()` of resolved selections to the branch they select.
+    selections = {}
+    reachable = set([id(root)])
+    for node in order:
+        if id(node) not in reachable or isinstance(node, Literal):
+            continue
+        inputs = node.inputs()
+        if (node.func is operator.getitem and is_indexable(node) and
+                id(node.args[1]) in known):
+            try:
+                branch = _selected(node, _evaluate(node.args[1],
+                                                   bindings=values))
+            except Exception:
+                branch = None
+            if branch is not None:
+                selections[id(node)] = branch
+                inputs = branch if isinstance(branch, tuple) else (branch,)
+        elif is_variable_node(node) and id(node) in known:
+            continue
+        reachable.update(id(c) for c in inputs)
+    replacements = {}
+    literals = {}
+    substituted = 0
+    for node in reversed(order):
+        if id(node) not in reachable or isinstance(node, Literal):
+            continue
+        if is_variable_node(node) and id(node) in known:
+            name = node._keywords['name'].value
+            if name not in literals:
+                literals[name] = Literal(bindings[name])
+            replacements[id(node)] = literals[name]
+            substituted += 1
+        elif id(node) in selections:
+            branch = selections[id(node)]
+            if isinstance(branch, tuple):
+                # A slice: a new list or tuple of the selected elements.
+                new = PartialPlus(node.args[0].func,
+                                  *[replacements.get(id(e), e)
+                                    for e in branch])
+            else:
+                new = replacements.get(id(branch), branch)
+            replacements[id(node)] = new
+        elif node.func is choice_node and id(node.args[0]) in selections:
+            replacements[id(node)] = replacements[id(node.args[0])]
+        else:
+            new = _rebuild(node, replacements, keep_pairs=True)
+            if new is not node:
+                replacements[id(node)] = new
+    new_root = replacements.get(id(root), root)
+    return new_root, SpecializeReport(
+        len(order), len(list(depth_first_traversal(new_root))),
+        substituted, len(selections))
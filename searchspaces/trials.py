@@ -0,0 +1,147 @@
+"""
+Recognizing trials that are bound to give the same result.
+
+Two assignments that agree on every variable the graph actually uses,
+and only differ in variables of branches that aren't selected, evaluate
+to the same object. `canonical_key` reduces an assignment to a key that
+only depends on the active variables, and `TrialCache` uses it to run
+each distinct trial once.
+"""
+from .conditional import ConditionalIndex
+from .partialplus import evaluate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _normalize(value):
+    """A hashable stand-in for a value, equal for equal values of the
+    same type."""
+    if numpy is not None and isinstance(value, numpy.generic):
+        value = value.item()  # The equivalent Python scalar.
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return dict, tuple(sorted((_normalize(k), _normalize(v))
+                                  for k, v in value.iteritems()))
+    if isinstance(value, set):
+        return set, frozenset(_normalize(v) for v in value)
+    if isinstance(value, float) and value != value:
+        return float, 'nan'  # nan != nan, but it is the same trial.
+    hash(value)
+    return type(value), value
+
+
+def canonical_key(space, assignment):
+    """
+    Reduce an assignment to the values of the variables it activates.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+        Pass a `ConditionalIndex` when computing many keys, rather than
+        analysing the graph every time.
+    assignment : dict
+        Values of the variables, by name.
+
+    Returns
+    -------
+    key : tuple
+        Hashable, and the same for assignments that give the same
+        values to the active variables, whatever the values of the
+        others.
+
+    Raises
+    ------
+    KeyError
+        If an active variable is not assigned a value.
+    TypeError
+        If the value of an active variable is neither hashable nor a
+        list, tuple, dict or set of such values.
+
+    Notes
+    -----
+    Values are compared along with their types, so `1`, `1.0` and
+    `True` give different keys, as they may give different results;
+    NumPy scalars are taken to be the equivalent Python scalars.
+    """
+    index = ConditionalIndex.of(space)
+    key = []
+    for name in index.active(assignment):
+        try:
+            value = assignment[name]
+        except KeyError:
+            raise KeyError("variable with name '%s' not bound" % name)
+        key.append((name, _normalize(value)))
+    return tuple(key)
+
+
+class TrialCache(object):
+    """
+    Runs trials, reusing the results of earlier trials with the same
+    `canonical_key`.
+
+    Parameters
+    ----------
+    space : Node, FrozenGraph or ConditionalIndex
+        The graph evaluated with each assignment.
+    objective : callable, optional
+        Called with the value of the graph, to get the result of a
+        trial. By default, the value of the graph itself is the result.
+
+    Attributes
+    ----------
+    duplicates : int
+        The number of trials whose results were reused.
+
+    Notes
+    -----
+    Results are kept, not copies, so callers must not modify them.
+    Trials that raise an exception are not stored, and are run again
+    if proposed again.
+    """
+    def __init__(self, space, objective=None):
+        self.index = ConditionalIndex.of(space)
+        self.root = self.index.graph.root
+        self.objective = objective
+        self.duplicates = 0
+        self._results = {}
+
+    def __len__(self):
+        return len(self._results)
+
+    def __contains__(self, assignment):
+        return canonical_key(self.index, assignment) in self._results
+
+    def __call__(self, assignment):
+        """
+        Get the result of a trial, running it unless it is a duplicate.
+
+        Parameters
+        ----------
+        assignment : dict
+            Values of the variables, by name.
+
+        Returns
+        -------
+        result : object
+        """
+        key = canonical_key(self.index, assignment)
+        try:
+            result = self._results[key]
+        except KeyError:
+            pass
+        else:
+            self.duplicates += 1
+            return result
+        result = evaluate(self.root, **assignment)
+        if self.objective is not None:
+            result = self.objective(result)
+        self._results[key] = result
+        return result
+
+    def clear(self):
+        """Forget all results."""
+        self._results.clear()